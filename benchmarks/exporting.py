@@ -0,0 +1,225 @@
+"""Time of exporting a character's anims end to end, with a fake aseprite.
+
+Generates a folder of synthetic aseprite files, then reads and exports them
+as a run of the assistant would, in several export modes. Aseprite is stood
+in for by benchmarks.fake_aseprite, with a configurable latency, so the
+scheduling, batching and caching of exports can be timed without it.
+Results can be written as JSON, and compared to the JSON of an earlier run.
+
+Usage: python -m benchmarks.exporting [--output results.json]
+    [--baseline earlier.json] [--repeat 3] [--scenario name ...]
+    [--startup SECONDS] [--frame SECONDS]"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict, replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from benchmarks.fake_aseprite import Latency, install_fake_aseprite, read_log
+from benchmarks.reporting import (
+    format_ratio,
+    get_baseline_result,
+    get_environment,
+    read_results,
+    write_results,
+)
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+)
+from rivals_workshop_assistant.aseprite_handling.anims import save_anims
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprites
+from rivals_workshop_assistant.run_context import RunContext
+from tests.aseprite_writer import SyntheticAseprite, save_aseprite
+
+# Attacks, so each also gets a hurtbox.
+ANIM_NAMES = [
+    "jab",
+    "dattack",
+    "nspecial",
+    "fspecial",
+    "uspecial",
+    "dspecial",
+    "ftilt",
+    "utilt",
+    "dtilt",
+    "nair",
+    "fair",
+    "bair",
+]
+ANIM_SPEC = SyntheticAseprite(frames=8, layers=4, anim_tags=0)
+
+
+@dataclass
+class Scenario:
+    config_params: AsepriteConfigParams
+    # Export once untimed, then time exporting again with the export cache.
+    cached: bool = False
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "per_job": Scenario(AsepriteConfigParams(export_parallelism=1)),
+    "per_job_parallel": Scenario(AsepriteConfigParams(export_parallelism=4)),
+    "batched": Scenario(AsepriteConfigParams(batch_exports=True, export_parallelism=1)),
+    "batched_parallel": Scenario(
+        AsepriteConfigParams(batch_exports=True, export_parallelism=4)
+    ),
+    "native": Scenario(AsepriteConfigParams(native_exports=True, export_parallelism=4)),
+    "cached": Scenario(AsepriteConfigParams(export_parallelism=4), cached=True),
+}
+
+
+def make_root_dir(root_dir: Path):
+    for name in ANIM_NAMES:
+        save_aseprite(root_dir / paths.ANIMS_FOLDER / f"{name}.aseprite", ANIM_SPEC)
+
+
+def make_run_context(root_dir: Path) -> RunContext:
+    return RunContext(
+        exe_dir=root_dir,
+        root_dir=root_dir,
+        dotfile={},
+        assistant_config={},
+        character_config={},
+    )
+
+
+async def export_all(
+    run_context: RunContext,
+    aseprite_program_path: Path,
+    config_params: AsepriteConfigParams,
+):
+    """Read and export every aseprite file, like a run of the assistant."""
+    await save_anims(
+        path_params=AsepritePathParams(
+            exe_dir=run_context.exe_dir,
+            root_dir=run_context.root_dir,
+            aseprite_program_path=aseprite_program_path,
+            file_index=run_context.file_index,
+        ),
+        config_params=config_params,
+        aseprites=read_aseprites(run_context),
+        export_cache=run_context.export_cache,
+    )
+
+
+def time_scenario(scenario: Scenario, latency: Latency, repeat: int) -> dict:
+    config_params = replace(scenario.config_params, hurtboxes_enabled=True)
+    times = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            root_dir = Path(tmp)
+            make_root_dir(root_dir)
+            log_path = root_dir / "fake_aseprite_log.txt"
+            aseprite_program_path = install_fake_aseprite(
+                root_dir / "fake_aseprite", latency, log_path=log_path
+            )
+            run_context = make_run_context(root_dir)
+            if scenario.cached:
+                asyncio.run(
+                    export_all(run_context, aseprite_program_path, config_params)
+                )
+                log_path.unlink(missing_ok=True)
+                run_context = replace(
+                    make_run_context(root_dir), export_cache=run_context.export_cache
+                )
+
+            start = time.perf_counter()
+            asyncio.run(export_all(run_context, aseprite_program_path, config_params))
+            times.append(time.perf_counter() - start)
+
+            runs = read_log(log_path)
+            strips = list((root_dir / paths.SPRITES_FOLDER).glob("*_strip*.png"))
+
+    return {
+        "min_seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "aseprite_runs": len(runs),
+        "aseprite_exports": sum(int(run.split()[-1]) for run in runs),
+        "strips": len(strips),
+    }
+
+
+def run_scenarios(scenario_names: List[str], latency: Latency, repeat: int) -> dict:
+    return {
+        **get_environment(),
+        "repeat": repeat,
+        "latency": asdict(latency),
+        "cases": {
+            "export": {
+                "spec": {"anims": len(ANIM_NAMES), **asdict(ANIM_SPEC)},
+                "benchmarks": {
+                    name: time_scenario(SCENARIOS[name], latency, repeat)
+                    for name in scenario_names
+                },
+            }
+        },
+    }
+
+
+def print_results(results: dict, baseline: Optional[dict] = None):
+    print(
+        f"{'scenario':<20}{'min ms':>10}{'median ms':>11}"
+        f"{'runs':>6}{'exports':>9}{'strips':>8}"
+    )
+    for name, result in results["cases"]["export"]["benchmarks"].items():
+        line = (
+            f"{name:<20}"
+            f"{result['min_seconds'] * 1000:>10.1f}"
+            f"{result['median_seconds'] * 1000:>11.1f}"
+            f"{result['aseprite_runs']:>6}"
+            f"{result['aseprite_exports']:>9}"
+            f"{result['strips']:>8}"
+        )
+        baseline_result = get_baseline_result(baseline, "export", name)
+        if baseline_result is not None:
+            line += f"  time {format_ratio(result, baseline_result, 'min_seconds')}"
+        print(line)
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare to the JSON results of another run."
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scenario", dest="scenarios", action="append", choices=sorted(SCENARIOS)
+    )
+    parser.add_argument(
+        "--startup",
+        type=float,
+        default=0.2,
+        help="Seconds the fake aseprite takes to start.",
+    )
+    parser.add_argument(
+        "--frame",
+        type=float,
+        default=0.005,
+        help="Seconds the fake aseprite takes to export each frame.",
+    )
+    args = parser.parse_args(argv)
+
+    # Each export is logged at debug level, which would bury the results.
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    results = run_scenarios(
+        args.scenarios or list(SCENARIOS),
+        latency=Latency(startup_seconds=args.startup, frame_seconds=args.frame),
+        repeat=args.repeat,
+    )
+    print_results(results, read_results(args.baseline))
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
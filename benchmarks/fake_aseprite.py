@@ -0,0 +1,200 @@
+"""Stands in for the aseprite program, so exports can be run and timed without it.
+
+It understands the arguments the assistant gives aseprite: -b, --version,
+-script-param and -script. Rather than running the lua script, it writes a
+transparent placeholder strip to each export's dest, sized from the aseprite
+file's header, after waiting as long as the configured latency. Manifests for
+the export driver script are followed the same way.
+
+install_fake_aseprite writes an executable running it, for an
+AsepritePathParams or the aseprite_program_path in an assistant config.
+
+Usage: python -m benchmarks.fake_aseprite DIRECTORY [--startup SECONDS]
+    [--frame SECONDS] [--log PATH]"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+FAKE_VERSION = "Aseprite 1.3-fake"
+REPO_ROOT = Path(__file__).absolute().parent.parent
+
+# The file size and magic number come before the frame count and canvas size.
+CANVAS_STRUCT = struct.Struct("<6xHHH")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IHDR_STRUCT = struct.Struct(">IIBBBBB")
+PNG_RGBA_COLOR_TYPE = 6
+
+
+@dataclass
+class Latency:
+    startup_seconds: float = 0.0  # Once per process.
+    frame_seconds: float = 0.0  # For each frame exported.
+
+
+class Arguments:
+    def __init__(self, argv: List[str]):
+        self.batch = False
+        self.version = False
+        self.script: Optional[Path] = None
+        self.params = {}
+
+        args = iter(argv)
+        for arg in args:
+            if arg in ("-b", "--batch"):
+                self.batch = True
+            elif arg in ("-v", "--version"):
+                self.version = True
+            elif arg in ("-script-param", "--script-param"):
+                key, value = next(args).split("=", 1)
+                self.params[key] = value
+            elif arg in ("-script", "--script"):
+                self.script = Path(next(args))
+
+
+def main(argv: List[str], latency: Latency, log_path: Path = None) -> int:
+    args = Arguments(argv)
+    if args.version:
+        print(FAKE_VERSION)
+        return 0
+    if not args.batch:
+        print("The fake aseprite only runs in batch mode (-b).", file=sys.stderr)
+        return 1
+    if args.script is None:
+        return 0
+
+    time.sleep(latency.startup_seconds)
+    if "manifest" in args.params:
+        manifest = json.loads(Path(args.params["manifest"]).read_text())
+        exports = [
+            {"filename": file["filename"], **job["params"]}
+            for file in manifest["files"]
+            for job in file["jobs"]
+        ]
+    else:
+        exports = [args.params]
+
+    failures = 0
+    for params in exports:
+        try:
+            export_placeholder(params, latency)
+        except (KeyError, ValueError, OSError) as e:
+            print(f"Failed to export {params.get('dest')}: {e!r}", file=sys.stderr)
+            failures += 1
+
+    if log_path is not None:
+        with open(log_path, "a") as log:
+            log.write(f"{args.script.name} {len(exports)}\n")
+    # The export driver reports failed jobs but carries on, like aseprite.
+    if failures and "manifest" not in args.params:
+        return 1
+    return 0
+
+
+def export_placeholder(params: dict, latency: Latency):
+    with open(params["filename"], "rb") as f:
+        _, width, height = CANVAS_STRUCT.unpack(f.read(CANVAS_STRUCT.size))
+    num_frames = int(params["endFrame"]) - int(params["startFrame"]) + 1
+    scale = int(params.get("scale", 1))
+
+    time.sleep(latency.frame_seconds * num_frames)
+    write_transparent_png(
+        Path(params["dest"]), width=width * scale * num_frames, height=height * scale
+    )
+
+
+def write_transparent_png(path: Path, width: int, height: int):
+    compressor = zlib.compressobj()
+    row = bytes(1 + width * 4)  # Each row starts with its filter type.
+    image_data = b"".join(compressor.compress(row) for _ in range(height))
+    image_data += compressor.flush()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(
+            _make_png_chunk(
+                b"IHDR",
+                PNG_IHDR_STRUCT.pack(width, height, 8, PNG_RGBA_COLOR_TYPE, 0, 0, 0),
+            )
+        )
+        f.write(_make_png_chunk(b"IDAT", image_data))
+        f.write(_make_png_chunk(b"IEND", b""))
+
+
+def _make_png_chunk(chunk_type: bytes, content: bytes) -> bytes:
+    checksum = zlib.crc32(chunk_type + content)
+    return (
+        struct.pack(">I", len(content))
+        + chunk_type
+        + content
+        + struct.pack(">I", checksum)
+    )
+
+
+def install_fake_aseprite(
+    directory: Path, latency: Latency = None, log_path: Path = None
+) -> Path:
+    """Write an executable that runs the fake aseprite with the latency.
+    Each run is logged with its script name and number of exports, if given a
+    log path. Returns the executable's path."""
+    if latency is None:
+        latency = Latency()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    launcher = directory / "fake_aseprite.py"
+    launcher.write_text(
+        f"#!{sys.executable}\n"
+        f"import sys\n"
+        f"sys.path.insert(0, {str(REPO_ROOT)!r})\n"
+        f"from pathlib import Path\n"
+        f"from benchmarks.fake_aseprite import Latency, main\n"
+        f"sys.exit(main(\n"
+        f"    sys.argv[1:],\n"
+        f"    {latency!r},\n"
+        f"    log_path={_repr_path(log_path)},\n"
+        f"))\n"
+    )
+    if sys.platform == "win32":
+        executable = directory / "aseprite.cmd"
+        executable.write_text(f'@"{sys.executable}" "{launcher}" %*\n')
+    else:
+        executable = directory / "aseprite"
+        launcher.rename(executable)
+        executable.chmod(0o755)
+    return executable
+
+
+def read_log(log_path: Path) -> List[str]:
+    """The script run by each run of the fake aseprite, with its export count."""
+    if not log_path.exists():
+        return []
+    return log_path.read_text().splitlines()
+
+
+def _repr_path(path: Optional[Path]) -> str:
+    if path is None:
+        return "None"
+    return f"Path({str(path.absolute())!r})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--startup", type=float, default=0.0)
+    parser.add_argument("--frame", type=float, default=0.0)
+    parser.add_argument("--log", type=Path)
+    cli_args = parser.parse_args()
+    print(
+        install_fake_aseprite(
+            cli_args.directory,
+            Latency(startup_seconds=cli_args.startup, frame_seconds=cli_args.frame),
+            log_path=cli_args.log,
+        )
+    )
@@ -0,0 +1,96 @@
+"""Memory held by parsed aseprite files.
+
+Parses every frame of each file and measures what the parsed chunks hold,
+compared to the same values held in ordinary dict-backed objects.
+
+Usage: python -m benchmarks.memory [aseprite files or folders]
+Defaults to the test sprites."""
+
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import List, Tuple
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.chunks import (
+    Slotted,
+    _get_slot_names,
+)
+
+DEFAULT_PATHS = [Path("tests/assets/sprites")]
+
+
+class DictBacked:
+    """Stands in for a chunk before it had __slots__."""
+
+
+def as_dict_backed(value):
+    if isinstance(value, Slotted):
+        dict_backed = DictBacked()
+        for name in _get_slot_names(type(value)):
+            if hasattr(value, name):
+                setattr(dict_backed, name, as_dict_backed(getattr(value, name)))
+        return dict_backed
+    if isinstance(value, tuple) and hasattr(value, "_asdict"):
+        # Namedtuples used to be dicts with string keys.
+        return {key: as_dict_backed(item) for key, item in value._asdict().items()}
+    if isinstance(value, list):
+        return [as_dict_backed(item) for item in value]
+    return value
+
+
+def measure(make) -> Tuple[int, object]:
+    """Bytes still allocated once make returns, and what it returned."""
+    tracemalloc.start()
+    result = make()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def parse_all_chunks(data: bytes) -> list:
+    file = RawAsepriteFile(data)
+    frames = file.frames_in_range(0, file.get_num_frames() - 1)
+    return [frame.chunks for frame in frames]
+
+
+def find_files(paths: List[Path]) -> List[Path]:
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files += sorted(path.rglob("*.aseprite"))
+        else:
+            files.append(path)
+    return files
+
+
+def main(paths: List[Path]):
+    total_slotted = total_dict_backed = 0
+    print(f"{'file':<45}{'slots':>10}{'dicts':>10}{'saved':>8}")
+    for path in find_files(paths):
+        # Read outside the measurement. Both share views into the file's bytes.
+        data = path.read_bytes()
+        slotted, _ = measure(lambda: parse_all_chunks(data))
+        dict_backed, _ = measure(lambda: as_dict_backed(parse_all_chunks(data)))
+        total_slotted += slotted
+        total_dict_backed += dict_backed
+        print(
+            f"{path.name:<45}{slotted:>10}{dict_backed:>10}"
+            f"{_saved(slotted, dict_backed):>8}"
+        )
+    print(
+        f"{'total':<45}{total_slotted:>10}{total_dict_backed:>10}"
+        f"{_saved(total_slotted, total_dict_backed):>8}"
+    )
+
+
+def _saved(size: int, baseline: int) -> str:
+    if baseline == 0:
+        return "-"
+    return f"{1 - size / baseline:.0%}"
+
+
+if __name__ == "__main__":
+    main([Path(arg) for arg in sys.argv[1:]] or DEFAULT_PATHS)
@@ -0,0 +1,185 @@
+"""Time and peak memory of reading aseprite files.
+
+Generates synthetic files of several shapes, then times each step of reading
+them, from parsing the bytes to hashing each anim's frames. Results can be
+written as JSON, and compared to the JSON of an earlier run.
+
+Usage: python -m benchmarks.parsing [--output results.json]
+    [--baseline earlier.json] [--repeat 5] [--case name ...]"""
+
+import argparse
+import gc
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from benchmarks.reporting import (
+    format_ratio,
+    get_baseline_result,
+    get_environment,
+    read_results,
+    write_results,
+)
+from rivals_workshop_assistant import assistant_config_mod
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
+from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
+from tests.aseprite_writer import SyntheticAseprite, save_aseprite
+
+CASES: Dict[str, SyntheticAseprite] = {
+    "small": SyntheticAseprite(),
+    "many_frames": SyntheticAseprite(frames=240, anim_tags=24),
+    "many_layers": SyntheticAseprite(frames=16, layers=64, groups=8),
+    "large_cels": SyntheticAseprite(frames=16, cel_width=384, cel_height=384),
+    "raw_cels": SyntheticAseprite(frames=32, compression=None),
+    "linked_cels": SyntheticAseprite(frames=64, linked_cels=True),
+}
+
+
+class Benchmark(NamedTuple):
+    """Setup isn't timed. Its result is passed to run, which is."""
+
+    name: str
+    setup: Callable[[Path], object]
+    run: Callable[[object], object]
+
+
+def make_aseprite(path: Path) -> Aseprite:
+    return Aseprite(
+        path=path,
+        anim_tag_colors=assistant_config_mod.get_anim_tag_color({}),
+        window_tag_colors=assistant_config_mod.get_window_tag_color({}),
+        anim_hashes={},
+    )
+
+
+def hash_anims(anims) -> list:
+    return [anim._get_frame_hash() for anim in anims]
+
+
+BENCHMARKS = [
+    Benchmark(
+        name="RawAsepriteFile",
+        setup=lambda path: path.read_bytes(),
+        run=RawAsepriteFile,
+    ),
+    Benchmark(
+        name="AsepriteLayers.from_file",
+        setup=lambda path: RawAsepriteFile(path.read_bytes()),
+        run=AsepriteLayers.from_file,
+    ),
+    Benchmark(
+        name="Aseprite.get_anims",
+        setup=make_aseprite,
+        run=lambda aseprite: aseprite.get_anims(),
+    ),
+    Benchmark(
+        name="Anim._get_frame_hash",
+        # Frame hashes are remembered per file, so each repeat needs new anims.
+        setup=lambda path: make_aseprite(path).get_anims(),
+        run=hash_anims,
+    ),
+]
+
+
+def time_benchmark(benchmark: Benchmark, path: Path, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        state = benchmark.setup(path)
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            benchmark.run(state)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    # Tracing slows everything down, so memory is measured in a separate run.
+    state = benchmark.setup(path)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_case(spec: SyntheticAseprite, path: Path, repeat: int) -> dict:
+    save_aseprite(path, spec)
+    return {
+        "spec": asdict(spec),
+        "file_size": path.stat().st_size,
+        "benchmarks": {
+            benchmark.name: time_benchmark(benchmark, path, repeat)
+            for benchmark in BENCHMARKS
+        },
+    }
+
+
+def run_cases(case_names: List[str], repeat: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = {
+            name: run_case(
+                CASES[name],
+                path=Path(tmp) / "anims" / f"{name}.aseprite",
+                repeat=repeat,
+            )
+            for name in case_names
+        }
+    return {**get_environment(), "repeat": repeat, "cases": cases}
+
+
+def print_results(results: dict, baseline: Optional[dict] = None):
+    print(
+        f"{'case':<14}{'benchmark':<27}{'min ms':>10}{'median ms':>11}{'peak KiB':>10}"
+    )
+    for case_name, case in results["cases"].items():
+        for name, result in case["benchmarks"].items():
+            line = (
+                f"{case_name:<14}{name:<27}"
+                f"{result['min_seconds'] * 1000:>10.3f}"
+                f"{result['median_seconds'] * 1000:>11.3f}"
+                f"{result['peak_memory_bytes'] / 1024:>10.1f}"
+            )
+            baseline_result = get_baseline_result(baseline, case_name, name)
+            if baseline_result is not None:
+                time_ratio = format_ratio(result, baseline_result, "min_seconds")
+                memory_ratio = format_ratio(
+                    result, baseline_result, "peak_memory_bytes"
+                )
+                line += f"  time {time_ratio}  memory {memory_ratio}"
+            print(line)
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    parser.add_argument(
+        "--baseline", type=Path, help="Compare to the JSON results of another run."
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--case", dest="cases", action="append", choices=sorted(CASES))
+    args = parser.parse_args(argv)
+
+    results = run_cases(args.cases or list(CASES), repeat=args.repeat)
+    print_results(results, read_results(args.baseline))
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,55 @@
+"""Shared by the benchmarks, to label their results and compare them to an
+earlier run's."""
+
+import json
+import platform
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+
+def get_environment() -> dict:
+    return {
+        "label": get_git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def get_git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_results(path: Optional[Path]) -> Optional[dict]:
+    if path is None:
+        return None
+    return json.loads(path.read_text())
+
+
+def write_results(path: Optional[Path], results: dict):
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+
+
+def get_baseline_result(
+    baseline: Optional[dict], case_name: str, name: str
+) -> Optional[dict]:
+    if baseline is None:
+        return None
+    return baseline["cases"].get(case_name, {}).get("benchmarks", {}).get(name, None)
+
+
+def format_ratio(result: dict, baseline_result: dict, field: str) -> str:
+    if not baseline_result.get(field):
+        return "-"
+    return f"{result[field] / baseline_result[field]:.2f}x"
@@ -1,5 +1,12 @@
 """https://github.com/Eiyeron/py_aseprite"""
 
+import hashlib
+import mmap
+from pathlib import Path
+from typing import List, Iterable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
 from .headers import Header, Frame
 from .chunks import (
     Chunk,
@@ -8,6 +15,11 @@ from .chunks import (
     LayerChunk,
     LayerGroupChunk,
     CelChunk,
+    CelData,
+    RawCelData,
+    LazyCelData,
+    CelLink,
+    INFLATED_CELS,
     CelExtraChunk,
     MaskChunk,
     FrameTagsChunk,
@@ -15,65 +27,392 @@ from .chunks import (
     PaletteChunk,
     UserDataChunk,
     SliceChunk,
+    ColorProfileChunk,
+    ExternalFilesChunk,
+    TilesetChunk,
+    U16_STRUCT,
+)
+from .chunk_registry import (
+    ParseMode,
+    ParseProfile,
+    get_chunk_parser,
+    get_parse_mode,
+    register_chunk_type,
+    LAYER_CHUNK_TYPE,
+    CEL_CHUNK_TYPE,
+    CEL_EXTRA_CHUNK_TYPE,
+    FRAME_TAGS_CHUNK_TYPE,
+    PALETTE_CHUNK_TYPE,
+    OLD_PALETTE_0x0004_CHUNK_TYPE,
+    OLD_PALETTE_0x0011_CHUNK_TYPE,
+    COLOR_PROFILE_CHUNK_TYPE,
+    USER_DATA_CHUNK_TYPE,
+)
+from .pixels import (
+    decode_pixels,
+    DecodedCelCache,
+    DECODED_CELS,
+    UnsupportedCelError,
+    RGBA_COLOR_DEPTH,
+    GRAYSCALE_COLOR_DEPTH,
+    INDEXED_COLOR_DEPTH,
+)
+from .layer_index import (
+    LayerIndex,
+    IndexedLayer,
+    LayerRole,
+    get_layer_role,
+    aseprite_layer_is_visible,
 )
 from ..tags import AsepriteTag
 
 
-class RawAsepriteFile:
-    def __init__(self, data):
-        self.header, self.frames = parse_data(data)
-        self.build_layer_tree()
+def _close_mmap(data: mmap.mmap):
+    try:
+        data.close()
+    except BufferError:
+        # Something still views it, like pixels from a failed render.
+        # It's unmapped when those are gone.
+        pass
+
 
-    def build_layer_tree(self):
+class RawAsepriteFile:
+    def __init__(self, data, profile: ParseProfile = ParseProfile.RENDERING):
+        """Frames are indexed up front, but their chunks are only parsed when used.
+        The profile decides which chunk types are parsed at all. With the scripts
+        profile, only the chunks needed to read tags and layers are built, and
+        cel pixel data is skipped entirely."""
+        self.data = data
+        self.header, self.frames = index_data(data, profile=profile)
         # Assuming that layers are stored in chunk #0.
         # Warn me if they're stored in another chunk
-        self.layers = [
-            chunk for chunk in self.frames[0].chunks if isinstance(chunk, LayerChunk)
-        ]
-        stack = []
-        self.layer_tree = []
-        for layer in self.layers:
-            while layer.layer_child_level < len(stack):
-                stack.pop()
-
-            if len(stack) > 0:
-                stack[len(stack) - 1].children.append(layer)
-            else:
-                self.layer_tree.append(layer)
+        self.layers = self.frames[0].get_chunks(LAYER_CHUNK_TYPE)
+        self.indexed_layers = LayerIndex(self.layers)
+        self._frame_hashes = {}
+        self._cel_hashes = {}
+        self._cel_pixels_hashes = {}
+        self._palette = None
+        self._tags = None
+        self._structure_hashes = None
+        self._mmap = None
+
+    @classmethod
+    def from_path(cls, path: Path, profile: ParseProfile = ParseProfile.RENDERING):
+        """Memory map the file rather than reading it.
+        Chunks keep memoryviews into the mapping, so nothing is copied until used.
+        Close the file when done with it, as Windows doesn't allow replacing or
+        deleting a mapped file."""
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped. Let the header parsing complain.
+                return cls(memoryview(f.read()), profile=profile)
+        view = memoryview(data)
+        try:
+            file_data = cls(view, profile=profile)
+        except Exception:
+            # Such as a truncated file.
+            view.release()
+            _close_mmap(data)
+            raise
+        file_data._mmap = data
+        return file_data
+
+    def close(self):
+        """Unmap the file. Its frames can't be used after, but what was read out
+        of it, such as its tags, layers and hashes, can."""
+        if self._mmap is None:
+            return
+        self._tags = self.get_tags()
+        self.frames = []
+        # Recently used cels view the mapping too.
+        INFLATED_CELS.evict(self._mmap)
+        DECODED_CELS.evict(self._mmap)
+        self.data.release()
+        _close_mmap(self._mmap)
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-            if isinstance(layer, LayerGroupChunk):
-                stack.append(layer)
+    @property
+    def layer_tree(self) -> Tuple[LayerChunk, ...]:
+        """The top level layers, with group contents from indexed_layers."""
+        return self.indexed_layers.tree
 
     def get_tags(self):
-        if not self.frames:
-            return []
-        frame_0_chunks = self.frames[0].chunks
-        tag_chunks = [
-            chunk for chunk in frame_0_chunks if isinstance(chunk, FrameTagsChunk)
-        ]
+        """Read once, so they're still there once the file is closed."""
+        if self._tags is None:
+            self._tags = self._read_tags()
+        return self._tags
+
+    def _read_tags(self):
+        tag_chunks = self.frames[0].get_chunks(FRAME_TAGS_CHUNK_TYPE)
         if not tag_chunks:
             return []
         if len(tag_chunks) > 1:
             assert False
-        tag_dicts = tag_chunks[0].tags
         tags = [
             AsepriteTag(
-                name=tag_dict["name"],
-                start=tag_dict["from"],
-                end=tag_dict["to"],
-                color=rgb_to_color_name(
-                    r=tag_dict["color"]["red"],
-                    g=tag_dict["color"]["green"],
-                    b=tag_dict["color"]["blue"],
-                ),
+                name=frame_tag.name,
+                start=frame_tag.start,
+                end=frame_tag.end,
+                color=rgb_to_color_name(*frame_tag.color),
             )
-            for tag_dict in tag_dicts
+            for frame_tag in tag_chunks[0].tags
         ]
         return tags
 
     def get_num_frames(self):
         return len(self.frames)
 
+    def frames_in_range(self, start: int, end: int) -> List["IndexedFrame"]:
+        """The frames from start to end, inclusive, with their chunks parsed.
+        Other frames are left unparsed."""
+        frames = self.frames[start : end + 1]
+        for frame in frames:
+            frame.chunks
+        return frames
+
+    def get_cel(self, layer: LayerChunk, frame_index: int) -> Optional[CelChunk]:
+        """The layer's cel in the frame, if it has one. Links aren't followed."""
+        for cel in self.frames[frame_index].get_chunks(CEL_CHUNK_TYPE):
+            if cel.layer_index == layer.layer_index:
+                return cel
+        return None
+
+    def cel_pixels(self, layer: LayerChunk, frame_index: int) -> Optional[np.ndarray]:
+        """The pixels of the layer's cel in the frame, if it has one, as a
+        read-only RGBA array of shape (height, width, 4).
+        The cel's position and opacity are on the cel, from get_cel.
+
+        RGBA pixels are a view of the file's data. Grayscale and indexed pixels
+        are expanded, with the header's transparent index see-through except on
+        the background layer. A linked cel gives the array of the cel it links
+        to, rather than a copy."""
+        cel = self.get_cel(layer, frame_index)
+        if cel is None:
+            return None
+        if cel.cel_type == LINKED_CEL_TYPE:
+            cel = self.get_cel(layer, cel.data.frame_position)
+            if cel is None:
+                raise UnsupportedCelError(f"broken link in frame {frame_index}")
+        if not isinstance(cel.data, CelData):
+            raise UnsupportedCelError(f"cel type {cel.cel_type}")
+
+        transparent_index = None
+        if not layer.flags & BACKGROUND_LAYER_FLAG:
+            transparent_index = self.header.palette_mask
+        return DECODED_CELS.get(
+            cel.data,
+            key=(transparent_index,),
+            decode=lambda: decode_pixels(
+                cel.data,
+                color_depth=self.header.color_depth,
+                palette=self.get_palette(),
+                transparent_index=transparent_index,
+            ),
+        )
+
+    def get_palette(self) -> np.ndarray:
+        """The sprite's colors as an RGBA array of shape (256, 4)."""
+        if self._palette is not None:
+            return self._palette
+
+        palette = np.zeros((256, 4), dtype=np.uint8)
+        palette_chunks = [
+            chunk
+            for frame in self.frames
+            if frame.has_chunk_type(PALETTE_CHUNK_TYPE)
+            for chunk in frame.get_chunks(PALETTE_CHUNK_TYPE)
+        ]
+        for chunk in palette_chunks:
+            for index, color in enumerate(chunk.colors, chunk.first_color_index):
+                if index < len(palette):
+                    palette[index] = (color.red, color.green, color.blue, color.alpha)
+        if not palette_chunks and self.frames:
+            # Old files only have the old palette chunk, without alpha.
+            for old_palette in self.frames[0].get_chunks(OLD_PALETTE_0x0004_CHUNK_TYPE):
+                index = 0
+                for packet in old_palette.packets:
+                    index += packet["previous_packet_skip"]
+                    for rgb in packet["colors"]:
+                        if index < len(palette):
+                            palette[index] = tuple(rgb) + (255,)
+                        index += 1
+        palette.flags.writeable = False
+        self._palette = palette
+        return palette
+
+    def get_frame_bytes(self, frame_index: int) -> memoryview:
+        """The frame's raw bytes as stored in the file, including all its chunks."""
+        frame = self.frames[frame_index]
+        return memoryview(self.data)[frame.offset : frame.offset + frame.size]
+
+    def get_frame_hash(self, frame_index: int) -> bytes:
+        if frame_index not in self._frame_hashes:
+            self._frame_hashes[frame_index] = hashlib.blake2b(
+                self.get_frame_bytes(frame_index), digest_size=16
+            ).digest()
+        return self._frame_hashes[frame_index]
+
+    def get_frames_hash(self, start: int, end: int) -> str:
+        """Hash the raw bytes of the frames from start to end, inclusive.
+        Nothing is decoded, and each frame is only hashed once per file."""
+        return combine_frame_hashes(
+            self.get_frame_hash(frame_index) for frame_index in range(start, end + 1)
+        )
+
+    def get_cel_hashes(self, frame_index: int) -> Dict[int, bytes]:
+        """Hash each of the frame's cels, by their layer index. Nothing is decoded.
+        A cel's hash covers its placement, its extra chunk, and its pixels' bytes.
+        A linked cel uses the pixels of the cel it links to, so it hashes the same
+        as a copy of that cel, and the linked pixels are only hashed once."""
+        if frame_index not in self._cel_hashes:
+            self._hash_cels(frame_index)
+        return self._cel_hashes[frame_index]
+
+    def _get_cel_pixels_hashes(self, frame_index: int) -> Dict[int, bytes]:
+        if frame_index not in self._cel_pixels_hashes:
+            self._hash_cels(frame_index)
+        return self._cel_pixels_hashes[frame_index]
+
+    def _hash_cels(self, frame_index: int):
+        data = memoryview(self.data)
+        cel_hashes = {}
+        pixels_hashes = {}
+        cel_hash = None
+        chunk_table = self.frames[frame_index].chunk_table
+        for chunk_offset, chunk_size, chunk_type in chunk_table:
+            if chunk_type == CEL_CHUNK_TYPE:
+                header_offset = chunk_offset + 6
+                layer_index, _, _, _, cel_type = CEL_STRUCT.unpack_from(
+                    data, header_offset
+                )
+                pixels_offset = header_offset + CEL_STRUCT.size
+                if cel_type == LINKED_CEL_TYPE:
+                    (linked_frame_index,) = LINK_STRUCT.unpack_from(data, pixels_offset)
+                    linked_pixels_hashes = self._get_cel_pixels_hashes(
+                        linked_frame_index
+                    )
+                    pixels_hash = linked_pixels_hashes.get(layer_index, b"")
+                else:
+                    pixels_hash = hashlib.blake2b(
+                        CEL_TYPE_STRUCT.pack(cel_type), digest_size=16
+                    )
+                    pixels_hash.update(data[pixels_offset : chunk_offset + chunk_size])
+                    pixels_hash = pixels_hash.digest()
+                pixels_hashes[layer_index] = pixels_hash
+
+                # Everything in the header but the cel type, which differs for links.
+                cel_hash = hashlib.blake2b(
+                    data[header_offset : header_offset + CEL_TYPE_OFFSET],
+                    digest_size=16,
+                )
+                cel_hash.update(
+                    data[header_offset + CEL_TYPE_OFFSET + 2 : pixels_offset]
+                )
+                cel_hash.update(pixels_hash)
+                cel_hashes[layer_index] = cel_hash
+            elif chunk_type == CEL_EXTRA_CHUNK_TYPE and cel_hash is not None:
+                cel_hash.update(data[chunk_offset : chunk_offset + chunk_size])
+            else:
+                cel_hash = None
+
+        self._cel_pixels_hashes[frame_index] = pixels_hashes
+        self._cel_hashes[frame_index] = {
+            layer_index: cel_hash.digest()
+            for layer_index, cel_hash in cel_hashes.items()
+        }
+
+    def get_layers_hash(self, start: int, end: int, layers: List[LayerChunk]) -> str:
+        """Hash the cels of the layers in the frames from start to end, inclusive."""
+        return combine_cel_hashes(
+            [self.get_cel_hashes(frame_index) for frame_index in range(start, end + 1)],
+            layer_indices=[layer.layer_index for layer in layers],
+        )
+
+    def get_structure_hashes(self) -> Tuple[bytes, List[bytes]]:
+        """Hash what the frames' appearance depends on, besides the frames
+        themselves, in parts, so each export only depends on its own layers.
+        The sprite's hash covers the header (except the file size and frame count)
+        and the palette. Each layer's hash, by layer index, covers its chunk and
+        user data. Tags aren't hashed, so retagging an anim leaves the others be."""
+        if self._structure_hashes is None:
+            data = memoryview(self.data)
+            sprite_hash = hashlib.blake2b(
+                data[HEADER_FRAMES_END : Header.header_size], digest_size=16
+            )
+            layer_hashes = []
+            previous_type = None
+            for chunk_offset, chunk_size, chunk_type in self.frames[0].chunk_table:
+                chunk_bytes = data[chunk_offset : chunk_offset + chunk_size]
+                if chunk_type in SPRITE_CHUNK_TYPES:
+                    sprite_hash.update(chunk_bytes)
+                elif chunk_type == LAYER_CHUNK_TYPE:
+                    layer_hashes.append(hashlib.blake2b(chunk_bytes, digest_size=16))
+                elif (
+                    chunk_type == USER_DATA_CHUNK_TYPE
+                    and previous_type == LAYER_CHUNK_TYPE
+                ):
+                    layer_hashes[-1].update(chunk_bytes)
+                previous_type = chunk_type
+            self._structure_hashes = (
+                sprite_hash.digest(),
+                [layer_hash.digest() for layer_hash in layer_hashes],
+            )
+        return self._structure_hashes
+
+    def get_structure_hash(self, layers: List[LayerChunk]) -> str:
+        """Hash what the layers' appearance depends on, besides their cels."""
+        sprite_hash, layer_hashes = self.get_structure_hashes()
+        return combine_structure_hashes(
+            sprite_hash, layer_hashes, self.indexed_layers, layers
+        )
+
+
+def combine_structure_hashes(
+    sprite_hash: bytes,
+    layer_hashes: List[bytes],
+    indexed_layers: LayerIndex,
+    layers: List[LayerChunk],
+) -> str:
+    """Combine the sprite's hash with those of the layers and their groups."""
+    layer_indices = set()
+    for layer in layers:
+        entry = indexed_layers.get(layer)
+        layer_indices.add(entry.file_index)
+        layer_indices.update(group.layer_index for group in entry.groups)
+
+    structure_hash = hashlib.blake2b(sprite_hash, digest_size=16)
+    for layer_index in sorted(layer_indices):
+        structure_hash.update(layer_hashes[layer_index])
+    return structure_hash.hexdigest()
+
+
+def combine_frame_hashes(frame_hashes: Iterable[bytes]) -> str:
+    frames_hash = hashlib.blake2b(digest_size=16)
+    for frame_hash in frame_hashes:
+        frames_hash.update(frame_hash)
+    return frames_hash.hexdigest()
+
+
+EMPTY_CEL_HASH = bytes(16)
+
+
+def combine_cel_hashes(
+    cel_hashes_by_frame: List[Dict[int, bytes]], layer_indices: List[int]
+) -> str:
+    layers_hash = hashlib.blake2b(digest_size=16)
+    for cel_hashes in cel_hashes_by_frame:
+        for layer_index in sorted(layer_indices):
+            layers_hash.update(cel_hashes.get(layer_index, EMPTY_CEL_HASH))
+    return layers_hash.hexdigest()
+
 
 RGB_TO_COLOR_NAME = {
     (0, 0, 0): "black",
@@ -91,48 +430,133 @@ def rgb_to_color_name(r, g, b) -> str:
     return RGB_TO_COLOR_NAME.get((r, g, b), (r, g, b))
 
 
-def parse_data(data):
+CHUNK_STRUCT = Chunk.chunk_struct
+SPRITE_CHUNK_TYPES = {
+    PALETTE_CHUNK_TYPE,
+    OLD_PALETTE_0x0004_CHUNK_TYPE,
+    OLD_PALETTE_0x0011_CHUNK_TYPE,
+    COLOR_PROFILE_CHUNK_TYPE,
+}
+# The file size, magic number and frame count come first in the header.
+HEADER_FRAMES_END = 8
+CEL_STRUCT = CelChunk.cel_struct
+LINK_STRUCT = U16_STRUCT
+CEL_TYPE_STRUCT = U16_STRUCT
+CEL_TYPE_OFFSET = 7  # In the cel header, after the layer index, position and opacity
+LINKED_CEL_TYPE = 1
+BACKGROUND_LAYER_FLAG = 8
+
+
+class ChunkEntry(NamedTuple):
+    """Where a chunk is in the file, read without decoding it."""
+
+    offset: int
+    size: int
+    chunk_type: int
+
+
+class IndexedFrame(Frame):
+    """A frame whose chunks are parsed according to the profile.
+    Eager chunks are parsed when the frame is indexed, and lazy chunks the first
+    time the frame's chunks are used."""
+
+    def __init__(
+        self, data, data_offset: int, first_layer_index: int, profile: ParseProfile
+    ):
+        Frame.__init__(self, data, data_offset)
+        self.chunk_table = index_chunks(data, self)
+        self.first_layer_index = first_layer_index
+        self._data = data
+        self._profile = profile
+        self._parsed_chunks = {}  # By position in the chunk table
+        self._chunks = None
+        for position, entry in enumerate(self.chunk_table):
+            if get_parse_mode(profile, entry.chunk_type) == ParseMode.EAGER:
+                self._parse_chunk(position)
+
+    @property
+    def chunks(self) -> list:
+        """Every chunk the profile doesn't skip."""
+        if self._chunks is None:
+            self._chunks = [
+                self._parse_chunk(position)
+                for position, entry in enumerate(self.chunk_table)
+                if get_parse_mode(self._profile, entry.chunk_type) != ParseMode.SKIP
+            ]
+        return self._chunks
+
+    @property
+    def is_parsed(self) -> bool:
+        return self._chunks is not None
+
+    def get_chunks(self, chunk_type: int) -> list:
+        """Chunks of the type, parsing only those, even if the profile skips them."""
+        return [
+            self._parse_chunk(position)
+            for position, entry in enumerate(self.chunk_table)
+            if entry.chunk_type == chunk_type and get_chunk_parser(chunk_type)
+        ]
+
+    def has_chunk_type(self, chunk_type: int) -> bool:
+        return any(entry.chunk_type == chunk_type for entry in self.chunk_table)
+
+    def _parse_chunk(self, position: int) -> Chunk:
+        if position in self._parsed_chunks:
+            return self._parsed_chunks[position]
+
+        entry = self.chunk_table[position]
+        chunk = get_chunk_parser(entry.chunk_type)(self._data, entry.offset)
+        if entry.chunk_type == LAYER_CHUNK_TYPE:
+            chunk.layer_index = self.first_layer_index + sum(
+                1
+                for previous in self.chunk_table[:position]
+                if previous.chunk_type == LAYER_CHUNK_TYPE
+            )
+        elif entry.chunk_type == USER_DATA_CHUNK_TYPE:
+            # User data following a layer chunk belongs to that layer.
+            follows_layer = (
+                position > 0
+                and self.chunk_table[position - 1].chunk_type == LAYER_CHUNK_TYPE
+            )
+            if follows_layer and chunk.flags & 1 != 0:
+                self._parse_chunk(position - 1).user_data = chunk.string
+        self._parsed_chunks[position] = chunk
+        return chunk
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_chunks"] = self.chunks
+        del state["_data"]
+        return state
+
+
+def index_chunks(data, frame: Frame) -> List[ChunkEntry]:
+    chunk_table = []
+    chunk_offset = frame.offset + Frame.frame_size
+    for _ in range(frame.num_chunks):
+        chunk_size, chunk_type = CHUNK_STRUCT.unpack_from(data, chunk_offset)
+        chunk_table.append(ChunkEntry(chunk_offset, chunk_size, chunk_type))
+        chunk_offset += chunk_size
+    return chunk_table
+
+
+def index_data(data, profile: ParseProfile = ParseProfile.RENDERING):
+    """Find where each frame and its chunks are, parsing only the eager chunks.
+    Each frame's other chunks are parsed the first time they're used."""
     head = Header(data)
     data_offset = Header.header_size
     frames = []
     layer_index = 0
-    for i in range(head.num_frames):
-        frame = Frame(data, data_offset)
+    for _ in range(head.num_frames):
+        frame = IndexedFrame(
+            data,
+            data_offset,
+            first_layer_index=layer_index,
+            profile=profile,
+        )
         frames.append(frame)
-        frame.chunks = []
-        data_offset += frame.frame_size
-        for c in range(frame.num_chunks):
-            chunk = Chunk(data, data_offset)
-            if chunk.chunk_type == 0x2004:
-                layer = LayerChunk(data, layer_index, data_offset)
-                if layer.layer_type & 1 == 1:
-                    frame.chunks.append(LayerGroupChunk(layer))
-                else:
-                    frame.chunks.append(layer)
-                layer_index += 1
-            elif chunk.chunk_type == 0x2005:
-                frame.chunks.append(CelChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2006:
-                frame.chunks.append(CelExtraChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2016:
-                frame.chunks.append(MaskChunk(data, data_offset))
-            elif chunk.chunk_type == 0x0004:
-                frame.chunks.append(OldPaleteChunk_0x0004(data, data_offset))
-            elif chunk.chunk_type == 0x0011:
-                frame.chunks.append(OldPaleteChunk_0x0011(data, data_offset))
-            elif chunk.chunk_type == 0x2017:
-                frame.chunks.append(PathChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2018:
-                frame.chunks.append(FrameTagsChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2019:
-                frame.chunks.append(PaletteChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2020:
-                frame.chunks.append(UserDataChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2022:
-                frame.chunks.append(SliceChunk(data, data_offset))
-            # else:
-            #     print("Skipped 0x{:04x}".format(chunk.chunk_type))
-
-            data_offset += chunk.chunk_size
-
+        layer_index += sum(
+            1 for entry in frame.chunk_table if entry.chunk_type == LAYER_CHUNK_TYPE
+        )
+        data_offset += frame.size
     return head, frames
@@ -0,0 +1,135 @@
+"""Which parser reads each chunk type, and when each run mode reads it.
+
+Eager chunks are parsed as soon as the file is indexed, lazy chunks when their
+frame is first used, and skipped chunks never. Chunk types without a parser are
+always skipped, but stay in each frame's chunk table."""
+
+from enum import Enum
+from typing import Callable, Dict, Optional
+
+from .chunks import (
+    Chunk,
+    OldPaleteChunk_0x0004,
+    OldPaleteChunk_0x0011,
+    LayerChunk,
+    LayerGroupChunk,
+    CelChunk,
+    CelExtraChunk,
+    ColorProfileChunk,
+    ExternalFilesChunk,
+    MaskChunk,
+    PathChunk,
+    FrameTagsChunk,
+    PaletteChunk,
+    UserDataChunk,
+    SliceChunk,
+    TilesetChunk,
+)
+
+OLD_PALETTE_0x0004_CHUNK_TYPE = 0x0004
+OLD_PALETTE_0x0011_CHUNK_TYPE = 0x0011
+LAYER_CHUNK_TYPE = 0x2004
+CEL_CHUNK_TYPE = 0x2005
+CEL_EXTRA_CHUNK_TYPE = 0x2006
+COLOR_PROFILE_CHUNK_TYPE = 0x2007
+EXTERNAL_FILES_CHUNK_TYPE = 0x2008
+MASK_CHUNK_TYPE = 0x2016
+PATH_CHUNK_TYPE = 0x2017
+FRAME_TAGS_CHUNK_TYPE = 0x2018
+PALETTE_CHUNK_TYPE = 0x2019
+USER_DATA_CHUNK_TYPE = 0x2020
+SLICE_CHUNK_TYPE = 0x2022
+TILESET_CHUNK_TYPE = 0x2023
+
+
+class ParseMode(Enum):
+    EAGER = "eager"
+    LAZY = "lazy"
+    SKIP = "skip"
+
+
+class ParseProfile(Enum):
+    """What a file is being read for."""
+
+    SCRIPTS = "scripts"  # Tags and layers, to decide what to export.
+    HASHING = "hashing"  # Also cel headers, for change detection.
+    RENDERING = "rendering"  # Everything.
+
+
+ChunkParser = Callable[[object, int], Chunk]
+
+
+def parse_layer_chunk(data, data_offset: int) -> LayerChunk:
+    """The layer index is set by the frame, which knows the layers before it."""
+    layer = LayerChunk(data, None, data_offset)
+    if layer.layer_type & 1 == 1:
+        layer = LayerGroupChunk(layer)
+    return layer
+
+
+CHUNK_PARSERS: Dict[int, ChunkParser] = {
+    OLD_PALETTE_0x0004_CHUNK_TYPE: OldPaleteChunk_0x0004,
+    OLD_PALETTE_0x0011_CHUNK_TYPE: OldPaleteChunk_0x0011,
+    LAYER_CHUNK_TYPE: parse_layer_chunk,
+    CEL_CHUNK_TYPE: CelChunk,
+    CEL_EXTRA_CHUNK_TYPE: CelExtraChunk,
+    COLOR_PROFILE_CHUNK_TYPE: ColorProfileChunk,
+    EXTERNAL_FILES_CHUNK_TYPE: ExternalFilesChunk,
+    MASK_CHUNK_TYPE: MaskChunk,
+    PATH_CHUNK_TYPE: PathChunk,
+    FRAME_TAGS_CHUNK_TYPE: FrameTagsChunk,
+    PALETTE_CHUNK_TYPE: PaletteChunk,
+    USER_DATA_CHUNK_TYPE: UserDataChunk,
+    SLICE_CHUNK_TYPE: SliceChunk,
+    TILESET_CHUNK_TYPE: TilesetChunk,
+}
+
+_METADATA_MODES = {
+    LAYER_CHUNK_TYPE: ParseMode.EAGER,
+    FRAME_TAGS_CHUNK_TYPE: ParseMode.EAGER,
+    USER_DATA_CHUNK_TYPE: ParseMode.EAGER,
+}
+
+# Chunk types missing from a profile are skipped.
+PROFILE_MODES: Dict[ParseProfile, Dict[int, ParseMode]] = {
+    ParseProfile.SCRIPTS: dict(_METADATA_MODES),
+    ParseProfile.HASHING: {
+        **_METADATA_MODES,
+        CEL_CHUNK_TYPE: ParseMode.LAZY,
+        CEL_EXTRA_CHUNK_TYPE: ParseMode.LAZY,
+    },
+    ParseProfile.RENDERING: {
+        **_METADATA_MODES,
+        OLD_PALETTE_0x0004_CHUNK_TYPE: ParseMode.EAGER,
+        OLD_PALETTE_0x0011_CHUNK_TYPE: ParseMode.EAGER,
+        PALETTE_CHUNK_TYPE: ParseMode.EAGER,
+        COLOR_PROFILE_CHUNK_TYPE: ParseMode.EAGER,
+        CEL_CHUNK_TYPE: ParseMode.LAZY,
+        CEL_EXTRA_CHUNK_TYPE: ParseMode.LAZY,
+        EXTERNAL_FILES_CHUNK_TYPE: ParseMode.LAZY,
+        MASK_CHUNK_TYPE: ParseMode.LAZY,
+        PATH_CHUNK_TYPE: ParseMode.LAZY,
+        SLICE_CHUNK_TYPE: ParseMode.LAZY,
+        TILESET_CHUNK_TYPE: ParseMode.LAZY,
+    },
+}
+
+
+def get_chunk_parser(chunk_type: int) -> Optional[ChunkParser]:
+    return CHUNK_PARSERS.get(chunk_type, None)
+
+
+def get_parse_mode(profile: ParseProfile, chunk_type: int) -> ParseMode:
+    if chunk_type not in CHUNK_PARSERS:
+        return ParseMode.SKIP
+    return PROFILE_MODES[profile].get(chunk_type, ParseMode.SKIP)
+
+
+def register_chunk_type(
+    chunk_type: int, parser: ChunkParser, modes: Dict[ParseProfile, ParseMode]
+):
+    """Parse chunks of the type with the parser, in the given profiles.
+    Profiles not given skip the type."""
+    CHUNK_PARSERS[chunk_type] = parser
+    for profile, profile_modes in PROFILE_MODES.items():
+        profile_modes[chunk_type] = modes.get(profile, ParseMode.SKIP)
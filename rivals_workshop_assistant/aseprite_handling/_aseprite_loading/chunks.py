@@ -1,34 +1,80 @@
+from collections import OrderedDict
+from collections.abc import Mapping
 from struct import Struct
+from typing import NamedTuple, Optional, Tuple
 import zlib
 import math
 
+# Structs are compiled once here, rather than each time a chunk is read.
+U16_STRUCT = Struct("<H")
+U32_STRUCT = Struct("<I")
+RGB_STRUCT = Struct("<BBB")
+RGBA_STRUCT = Struct("<BBBB")
+SIZE_STRUCT = Struct("<HH")
+PACKET_STRUCT = Struct("<BB")
+
 
 # They're not 0-terminated strings, but they're prefixed with their size
 def parse_string(data, string_offset):
-    (string_length,) = Struct("<H").unpack_from(data, string_offset)
+    (string_length,) = U16_STRUCT.unpack_from(data, string_offset)
+    string_start = string_offset + 2
+    string_name = bytes(data[string_start : string_start + string_length])
+    return string_length + 2, string_name.decode("utf-8")
+
+
+def _copy_views(value):
+    """Replace memoryviews into the file's data with bytes, so they can be pickled."""
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    if isinstance(value, dict):
+        return {key: _copy_views(item) for key, item in value.items()}
+    return value
 
-    (string_name,) = Struct("<{}s".format(string_length)).unpack_from(
-        data, string_offset + 2
+
+def _get_slot_names(cls) -> Tuple[str, ...]:
+    return tuple(
+        name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ())
     )
-    return string_length + 2, string_name.decode("utf-8")
 
 
-class Chunk(object):
+class Slotted:
+    """Pickles the __slots__ of subclasses, which have no __dict__."""
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return {
+            name: _copy_views(getattr(self, name))
+            for name in _get_slot_names(type(self))
+            if hasattr(self, name)
+        }
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class Chunk(Slotted):
+    __slots__ = ("chunk_size", "chunk_type")
     chunk_format = "<IH"
+    chunk_struct = Struct(chunk_format)
 
     def __init__(self, data, data_offset=0):
-        chunk_struct = Struct(Chunk.chunk_format)
-        (self.chunk_size, self.chunk_type) = chunk_struct.unpack_from(data, data_offset)
+        (self.chunk_size, self.chunk_type) = Chunk.chunk_struct.unpack_from(
+            data, data_offset
+        )
 
 
 class OldPaleteChunk_0x0004(Chunk):
+    __slots__ = ("num_packets", "packets")
+
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
 
-        packet_struct = Struct("<BB")
-        color_packet_struct = Struct("<BBB")
+        packet_struct = PACKET_STRUCT
+        color_packet_struct = RGB_STRUCT
 
-        (self.num_packets,) = Struct("<H").unpack_from(data, data_offset + 6)
+        (self.num_packets,) = U16_STRUCT.unpack_from(data, data_offset + 6)
         self.packets = []
 
         packet_offset = data_offset + 8
@@ -39,22 +85,24 @@ class OldPaleteChunk_0x0004(Chunk):
             )
             packet_offset += 2
             for color in range(0, num_colors):
-                (red, blue, green) = color_packet_struct.unpack_from(
+                (red, green, blue) = color_packet_struct.unpack_from(
                     data, packet_offset
                 )
-                packet["colors"].append([red, blue, green])
+                packet["colors"].append([red, green, blue])
                 packet_offset += 3
 
             self.packets.append(packet)
 
 
 class OldPaleteChunk_0x0011(Chunk):
+    __slots__ = ("num_packets", "packets")
+
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
 
-        packet_struct = Struct("<BB")
-        color_packet_struct = Struct("<BBB")
-        self.num_packets = Struct("<H").unpack_from(data, data_offset)
+        packet_struct = PACKET_STRUCT
+        color_packet_struct = RGB_STRUCT
+        self.num_packets = U16_STRUCT.unpack_from(data, data_offset)
         self.packets = []
 
         packet_offset = data_offset + 6
@@ -65,21 +113,34 @@ class OldPaleteChunk_0x0011(Chunk):
             )
             packet_offset += 2
             for color in range(0, num_colors):
-                (red, blue, green) = color_packet_struct.unpack_from(
+                (red, green, blue) = color_packet_struct.unpack_from(
                     data, packet_offset
                 )
-                packet["colors"].append([red, blue, green])
+                packet["colors"].append([red, green, blue])
                 packet_offset += 3
 
             self.packets.append(packet)
 
 
 class LayerChunk(Chunk):
+    __slots__ = (
+        "flags",
+        "layer_type",
+        "layer_child_level",
+        "default_width",
+        "default_height",
+        "blend_mode",
+        "opacity",
+        "name",
+        "layer_index",
+        "user_data",
+    )
     layer_format = "<HHHHHHB3x"
+    layer_struct = Struct(layer_format)
 
     def __init__(self, data, layer_index, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        layer_struct = Struct(LayerChunk.layer_format)
+        layer_struct = LayerChunk.layer_struct
         (
             self.flags,
             self.layer_type,
@@ -91,12 +152,15 @@ class LayerChunk(Chunk):
         ) = layer_struct.unpack_from(data, data_offset + 6)
         _, self.name = parse_string(data, data_offset + 6 + layer_struct.size)
         self.layer_index = layer_index
+        self.user_data = ""  # Set from the user data chunk that follows, if any.
 
     def __str__(self):
         return self.name
 
 
 class LayerGroupChunk(LayerChunk):
+    __slots__ = ()
+
     def __init__(self, base_layer: LayerChunk):
         """Constructed from its base version"""
         self.flags = base_layer.flags
@@ -108,16 +172,154 @@ class LayerGroupChunk(LayerChunk):
         self.opacity = base_layer.opacity
         self.name = base_layer.name
         self.layer_index = base_layer.layer_index
-        self.children = []
+        self.user_data = base_layer.user_data
+
+
+class InflatedCelCache:
+    """Remembers the pixels of the most recently inflated cels,
+    so reading the same cel repeatedly doesn't inflate it each time."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, cel_data: "LazyCelData") -> bytes:
+        # Entries hold a reference to their cel data, so its id can't be reused.
+        key = id(cel_data)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+        pixels = zlib.decompress(cel_data.compressed)
+        if self.max_size > 0:
+            self._entries[key] = (cel_data, pixels)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return pixels
+
+    def clear(self):
+        self._entries.clear()
+
+    def evict(self, source):
+        """Forget the cels read from source, such as a file being closed."""
+        for key, (cel_data, _) in list(self._entries.items()):
+            if cel_data.is_from(source):
+                del self._entries[key]
+
+
+INFLATED_CELS = InflatedCelCache(max_size=16)
+
+
+class CelData(Mapping, Slotted):
+    """The contents of a cel with pixels.
+    Can also be read as a mapping of "width", "height" and "data"."""
+
+    __slots__ = ("width", "height")
+
+    @property
+    def pixels(self):
+        raise NotImplementedError
+
+    @property
+    def _buffer(self):
+        raise NotImplementedError
+
+    def is_from(self, source) -> bool:
+        """If the cel's data is a view of source, such as a file's mapping."""
+        return getattr(self._buffer, "obj", None) is source
+
+    def __getitem__(self, key):
+        if key == "width":
+            return self.width
+        elif key == "height":
+            return self.height
+        elif key == "data":
+            return self.pixels
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("width", "height", "data"))
+
+    def __len__(self):
+        return 3
+
+
+class RawCelData(CelData):
+    """The contents of an uncompressed cel."""
+
+    __slots__ = ("raw_pixels",)
+
+    def __init__(self, width: int, height: int, raw_pixels):
+        self.width = width
+        self.height = height
+        self.raw_pixels = raw_pixels
+
+    @property
+    def pixels(self):
+        return self.raw_pixels
+
+    @property
+    def _buffer(self):
+        return self.raw_pixels
+
+
+class LazyCelData(CelData):
+    """The contents of a compressed cel.
+    Its pixels are only inflated when read."""
+
+    __slots__ = ("compressed",)
+
+    def __init__(self, width: int, height: int, compressed):
+        self.width = width
+        self.height = height
+        self.compressed = compressed
+
+    @property
+    def pixels(self):
+        return INFLATED_CELS.get(self)
+
+    @property
+    def _buffer(self):
+        return self.compressed
+
+    def __getstate__(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "compressed": bytes(self.compressed),
+        }
+
+
+class CelLink(Mapping, Slotted):
+    """A linked cel's reference to the frame holding its pixels.
+    Can also be read as a mapping of "link" to a 1-tuple of the frame."""
+
+    __slots__ = ("frame_position",)
+
+    def __init__(self, frame_position: int):
+        self.frame_position = frame_position
+
+    def __getitem__(self, key):
+        if key == "link":
+            return (self.frame_position,)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(("link",))
+
+    def __len__(self):
+        return 1
 
 
 class CelChunk(Chunk):
+    __slots__ = ("layer_index", "x_pos", "y_pos", "opacity", "cel_type", "data")
     cel_format = "<HhhBH7x"
+    cel_struct = Struct(cel_format)
     cel_type_format = "<HH"
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        cel_struct = Struct(CelChunk.cel_format)
+        cel_struct = CelChunk.cel_struct
         (
             self.layer_index,
             self.x_pos,
@@ -126,33 +328,36 @@ class CelChunk(Chunk):
             self.cel_type,
         ) = cel_struct.unpack_from(data, data_offset + 6)
         cel_offset = data_offset + cel_struct.size + 6
-        cel_struct = Struct(CelChunk.cel_type_format)
+        self.data = None
         if self.cel_type == 0:
-            self.data = {}
-            (self.data["width"], self.data["height"]) = cel_struct.unpack_from(
-                data, cel_offset
-            )
-            start_range = cel_offset + cel_struct.size
+            (width, height) = SIZE_STRUCT.unpack_from(data, cel_offset)
+            start_range = cel_offset + SIZE_STRUCT.size
             end_range = data_offset + self.chunk_size
-            self.data["data"] = data[start_range:end_range]
+            self.data = RawCelData(width, height, data[start_range:end_range])
         elif self.cel_type == 1:
-            self.data = {"link": Struct("<H").unpack_from(data, cel_offset)}
+            (frame_position,) = U16_STRUCT.unpack_from(data, cel_offset)
+            self.data = CelLink(frame_position)
         elif self.cel_type == 2:
-            self.data = {}
-            (self.data["width"], self.data["height"]) = cel_struct.unpack_from(
-                data, cel_offset
-            )
-            start_range = cel_offset + cel_struct.size
+            (width, height) = SIZE_STRUCT.unpack_from(data, cel_offset)
+            start_range = cel_offset + SIZE_STRUCT.size
             end_range = data_offset + self.chunk_size
-            self.data["data"] = zlib.decompress(data[start_range:end_range])
+            self.data = LazyCelData(width, height, data[start_range:end_range])
 
 
 class CelExtraChunk(Chunk):
+    __slots__ = (
+        "flags",
+        "precise_x_pos",
+        "precise_y_pos",
+        "cel_width",
+        "cel_height",
+    )
     celextra_format = "<HLLLL16x"
+    celextra_struct = Struct(celextra_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        cel_struct = Struct(CelExtraChunk.celextra_format)
+        cel_struct = CelExtraChunk.celextra_struct
         (
             self.flags,
             self.precise_x_pos,
@@ -163,11 +368,13 @@ class CelExtraChunk(Chunk):
 
 
 class MaskChunk(Chunk):
+    __slots__ = ("x_pos", "y_pos", "width", "height", "name", "bitmap")
     mask_format = "<hhHH8x"
+    mask_struct = Struct(mask_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        mask_struct = Struct(MaskChunk.mask_format)
+        mask_struct = MaskChunk.mask_struct
         (self.x_pos, self.y_pos, self.width, self.height) = mask_struct.unpack_from(
             data, data_offset + 6
         )
@@ -181,97 +388,239 @@ class MaskChunk(Chunk):
 
 
 class PathChunk(Chunk):
-    pass
+    __slots__ = ()
+
+
+class FrameTag(NamedTuple):
+    name: str
+    start: int
+    end: int
+    loop: int
+    color: Tuple[int, int, int]
 
 
 class FrameTagsChunk(Chunk):
+    __slots__ = ("tags",)
     frametag_head_format = "<H8x"
+    frametag_head_struct = Struct(frametag_head_format)
     frametag_format = "<HHB8x3Bx"
+    frametag_struct = Struct(frametag_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        palette_struct = Struct(FrameTagsChunk.frametag_head_format)
-        (num_tags,) = palette_struct.unpack_from(data, data_offset + 6)
+        head_struct = FrameTagsChunk.frametag_head_struct
+        (num_tags,) = head_struct.unpack_from(data, data_offset + 6)
 
         self.tags = []
-        tag_offset = data_offset + palette_struct.size + 6
+        tag_offset = data_offset + head_struct.size + 6
 
-        palette_tag_struct = Struct(FrameTagsChunk.frametag_format)
+        tag_struct = FrameTagsChunk.frametag_struct
         for index in range(num_tags):
-            tag = {"color": {}}
-            (
-                tag["from"],
-                tag["to"],
-                tag["loop"],
-                tag["color"]["red"],
-                tag["color"]["green"],
-                tag["color"]["blue"],
-            ) = palette_tag_struct.unpack_from(data, tag_offset)
-            self.tags.append(tag)
-            tag_offset += palette_tag_struct.size
-            string_size, tag["name"] = parse_string(data, tag_offset)
+            (start, end, loop, red, green, blue) = tag_struct.unpack_from(
+                data, tag_offset
+            )
+            tag_offset += tag_struct.size
+            string_size, name = parse_string(data, tag_offset)
             tag_offset += string_size
+            self.tags.append(
+                FrameTag(
+                    name=name, start=start, end=end, loop=loop, color=(red, green, blue)
+                )
+            )
+
+
+class PaletteColor(NamedTuple):
+    flags: int
+    red: int
+    green: int
+    blue: int
+    alpha: int
+    name: Optional[str] = None
 
 
 class PaletteChunk(Chunk):
+    __slots__ = ("palette_size", "first_color_index", "last_color_index", "colors")
     palette_format = "<III8x"
+    palette_struct = Struct(palette_format)
+    color_struct = Struct("<HBBBB")
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        palette_struct = Struct(PaletteChunk.palette_format)
+        palette_struct = PaletteChunk.palette_struct
         (
             self.palette_size,
             self.first_color_index,
             self.last_color_index,
         ) = palette_struct.unpack_from(data, data_offset + 6)
-        color_struct = Struct("<HBBBB")
+        color_struct = PaletteChunk.color_struct
         self.colors = []
 
         color_offset = data_offset + 6 + palette_struct.size
         for index in range(self.first_color_index, self.last_color_index + 1):
-            color = {"name": None}
-            (
-                color["flags"],
-                color["red"],
-                color["blue"],
-                color["green"],
-                color["alpha"],
-            ) = color_struct.unpack_from(data, color_offset)
+            (flags, red, green, blue, alpha) = color_struct.unpack_from(
+                data, color_offset
+            )
             color_offset += color_struct.size
-            if color["flags"] & 1 != 0:
-                string_size, color["name"] = parse_string(data, color_offset)
+            name = None
+            if flags & 1 != 0:
+                string_size, name = parse_string(data, color_offset)
                 color_offset += string_size
 
-            self.colors.append(color)
+            self.colors.append(PaletteColor(flags, red, green, blue, alpha, name))
 
 
 class UserDataChunk(Chunk):
+    __slots__ = ("flags", "string", "red", "green", "blue", "alpha")
+
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
         userdata_offset = data_offset + 6
-        (self.flags,) = Struct("<I").unpack_from(data, userdata_offset)
+        (self.flags,) = U32_STRUCT.unpack_from(data, userdata_offset)
         userdata_offset += 4
         if self.flags & 1 != 0:
             string_size, self.string = parse_string(data, userdata_offset)
             userdata_offset += string_size
         if self.flags & 2 != 0:
-            (self.red, self.green, self.blue, self.alpha) = Struct("<BBBB").unpack_from(
+            (self.red, self.green, self.blue, self.alpha) = RGBA_STRUCT.unpack_from(
                 data, userdata_offset
             )
 
 
+class ColorProfileChunk(Chunk):
+    __slots__ = ("profile_type", "flags", "gamma", "icc_data")
+    color_profile_format = "<HHI8x"
+    color_profile_struct = Struct(color_profile_format)
+
+    def __init__(self, data, data_offset=0):
+        Chunk.__init__(self, data, data_offset)
+        profile_struct = ColorProfileChunk.color_profile_struct
+        (self.profile_type, self.flags, self.gamma) = profile_struct.unpack_from(
+            data, data_offset + 6
+        )
+        self.icc_data = None
+        if self.profile_type == 2:  # Embedded ICC profile
+            icc_offset = data_offset + 6 + profile_struct.size
+            (icc_size,) = U32_STRUCT.unpack_from(data, icc_offset)
+            icc_offset += U32_STRUCT.size
+            self.icc_data = data[icc_offset : icc_offset + icc_size]
+
+
+class ExternalFile(NamedTuple):
+    entry_id: int
+    file_type: int
+    name: str
+
+
+class ExternalFilesChunk(Chunk):
+    __slots__ = ("files",)
+    external_files_head_format = "<I8x"
+    external_files_head_struct = Struct(external_files_head_format)
+    external_file_format = "<IB7x"
+    external_file_struct = Struct(external_file_format)
+
+    def __init__(self, data, data_offset=0):
+        Chunk.__init__(self, data, data_offset)
+        head_struct = ExternalFilesChunk.external_files_head_struct
+        (num_files,) = head_struct.unpack_from(data, data_offset + 6)
+        file_offset = data_offset + 6 + head_struct.size
+
+        file_struct = ExternalFilesChunk.external_file_struct
+        self.files = []
+        for index in range(num_files):
+            (entry_id, file_type) = file_struct.unpack_from(data, file_offset)
+            file_offset += file_struct.size
+            string_size, name = parse_string(data, file_offset)
+            file_offset += string_size
+            self.files.append(ExternalFile(entry_id, file_type, name))
+
+
+class TilesetChunk(Chunk):
+    __slots__ = (
+        "tileset_id",
+        "flags",
+        "num_tiles",
+        "tile_width",
+        "tile_height",
+        "base_index",
+        "name",
+        "external_file_id",
+        "external_tileset_id",
+        "compressed",
+    )
+    tileset_format = "<IIIHHh14x"
+    tileset_struct = Struct(tileset_format)
+    external_tileset_struct = Struct("<II")
+
+    def __init__(self, data, data_offset=0):
+        Chunk.__init__(self, data, data_offset)
+        tileset_struct = TilesetChunk.tileset_struct
+        (
+            self.tileset_id,
+            self.flags,
+            self.num_tiles,
+            self.tile_width,
+            self.tile_height,
+            self.base_index,
+        ) = tileset_struct.unpack_from(data, data_offset + 6)
+        tileset_offset = data_offset + 6 + tileset_struct.size
+        string_size, self.name = parse_string(data, tileset_offset)
+        tileset_offset += string_size
+
+        self.external_file_id = self.external_tileset_id = None
+        if self.flags & 1 != 0:
+            external_struct = TilesetChunk.external_tileset_struct
+            (
+                self.external_file_id,
+                self.external_tileset_id,
+            ) = external_struct.unpack_from(data, tileset_offset)
+            tileset_offset += external_struct.size
+
+        # Tiles are kept compressed, like cels, until something needs them.
+        self.compressed = None
+        if self.flags & 2 != 0:
+            (compressed_size,) = U32_STRUCT.unpack_from(data, tileset_offset)
+            tileset_offset += U32_STRUCT.size
+            self.compressed = data[tileset_offset : tileset_offset + compressed_size]
+
+
+class SliceCenter(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+class SlicePivot(NamedTuple):
+    x: int
+    y: int
+
+
+class SliceKey(NamedTuple):
+    start_frame: int
+    x: int
+    y: int
+    width: int
+    height: int
+    center: Optional[SliceCenter] = None
+    pivot: Optional[SlicePivot] = None
+
+
 class SliceChunk(Chunk):
+    __slots__ = ("flags", "reserved", "name", "slices")
     slice_chunk_format = "<III"
+    slice_chunk_struct = Struct(slice_chunk_format)
     slice_format = "<IiiII"
-    slice_key_format = "<IiiII"
+    slice_struct = Struct(slice_format)
     slice_bit_1_format = "<iiII"
+    slice_bit_1_struct = Struct(slice_bit_1_format)
     slice_bit_2_format = "<ii"
+    slice_bit_2_struct = Struct(slice_bit_2_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
         slice_offset = data_offset + 6
 
-        slice_chunk_struct = Struct(SliceChunk.slice_chunk_format)
+        slice_chunk_struct = SliceChunk.slice_chunk_struct
         num_slices, self.flags, self.reserved = slice_chunk_struct.unpack_from(
             data, slice_offset
         )
@@ -283,32 +632,23 @@ class SliceChunk(Chunk):
         self.slices = []
 
         for i in range(num_slices):
-            slice_struct = Struct(SliceChunk.slice_format)
-            slice = {}
-            (
-                slice["start_frame"],
-                slice["x"],
-                slice["y"],
-                slice["width"],
-                slice["height"],
-            ) = slice_struct.unpack_from(data, slice_offset)
+            slice_struct = SliceChunk.slice_struct
+            start_frame, x, y, width, height = slice_struct.unpack_from(
+                data, slice_offset
+            )
             slice_offset += slice_struct.size
+            center = None
             if self.flags & 1 != 0:
-                slice_bit_1_struct = Struct(SliceChunk.slice_bit_1_format)
-                slice["center"] = {}
-                (
-                    slice["center"]["x"],
-                    slice["center"]["y"],
-                    slice["center"]["width"],
-                    slice["center"]["height"],
-                ) = slice_bit_1_struct.unpack_from(data, slice_offset)
+                slice_bit_1_struct = SliceChunk.slice_bit_1_struct
+                center = SliceCenter(
+                    *slice_bit_1_struct.unpack_from(data, slice_offset)
+                )
                 slice_offset += slice_bit_1_struct.size
+            pivot = None
             if self.flags & 2 != 0:
-                slice_bit_2_struct = Struct(SliceChunk.slice_bit_2_format)
-                slice["pivot"] = {}
-                (
-                    slice["pivot"]["x"],
-                    slice["pivot"]["y"],
-                ) = slice_bit_2_struct.unpack_from(data, slice_offset)
+                slice_bit_2_struct = SliceChunk.slice_bit_2_struct
+                pivot = SlicePivot(*slice_bit_2_struct.unpack_from(data, slice_offset))
                 slice_offset += slice_bit_2_struct.size
-            self.slices.append(slice)
+            self.slices.append(
+                SliceKey(start_frame, x, y, width, height, center=center, pivot=pivot)
+            )
@@ -31,6 +31,7 @@ class Frame(object):
 
     def __init__(self, data, data_offset = 0):
         frame_struct = Struct(Frame.frame_format)
+        self.offset = data_offset
         (
             self.size,
             self.magic_number,
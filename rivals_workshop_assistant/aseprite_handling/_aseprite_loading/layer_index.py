@@ -0,0 +1,155 @@
+"""What the assistant needs to know about each layer of a file, worked out in one
+pass when the file is read. Nothing here changes the layers themselves."""
+
+from enum import Enum
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .chunks import LayerChunk
+
+SPLIT = "SPLIT"
+OPT = "OPT"
+HURTBOX = "HURTBOX"
+HURTMASK = "HURTMASK"
+NOHURT = "NOHURT"
+
+NORMAL_LAYER_TYPE = 0
+GROUP_LAYER_TYPE = 1
+
+
+class LayerRole(Enum):
+    GROUP = "group"
+    OTHER = "other"  # Layers that aren't exported, like tilemaps.
+    NORMAL = "normal"
+    SPLIT = "split"
+    OPT = "opt"
+    HURTBOX = "hurtbox"
+    HURTMASK = "hurtmask"
+    NOHURT = "nohurt"
+
+
+def aseprite_layer_is_visible(layer: LayerChunk) -> bool:
+    #  See visibility flag
+    #  https://github.com/aseprite/aseprite/blob/main/docs/ase-file-specs.md#layer-chunk-0x2004
+    return layer.flags % 2 == 1
+
+
+def get_layer_role(layer: LayerChunk) -> Tuple[LayerRole, Optional[str]]:
+    """The layer's role, and the name inside SPLIT(name) or OPT(name)."""
+    name: str = layer.name
+    if layer.layer_type == GROUP_LAYER_TYPE:
+        return LayerRole.GROUP, None
+    if layer.layer_type != NORMAL_LAYER_TYPE:
+        return LayerRole.OTHER, None
+    if name.startswith(f"{SPLIT}("):
+        return LayerRole.SPLIT, name.split(f"{SPLIT}(")[1].split(")")[0]
+    if name.startswith(f"{OPT}("):
+        return LayerRole.OPT, name.split(f"{OPT}(")[1].split(")")[0]
+    if name == HURTBOX:
+        return LayerRole.HURTBOX, None
+    if name == HURTMASK:
+        return LayerRole.HURTMASK, None
+    if name.startswith(NOHURT) or NOHURT in layer.user_data:
+        return LayerRole.NOHURT, None
+    return LayerRole.NORMAL, None
+
+
+class IndexedLayer(NamedTuple):
+    layer: LayerChunk
+    file_index: int  # Among all layers, groups included, as cels count them.
+    # Among the layers that aren't groups, from 1, as the lua scripts count them.
+    # None for groups.
+    lua_index: Optional[int]
+    groups: Tuple[LayerChunk, ...]  # The groups containing it, outermost first.
+    is_visible: bool  # Its own visibility, ignoring its groups'.
+    role: LayerRole
+    role_name: Optional[str]
+
+    @property
+    def group_path(self) -> Tuple[str, ...]:
+        return tuple(group.name for group in self.groups)
+
+    @property
+    def is_hidden_by_group(self) -> bool:
+        return not all(aseprite_layer_is_visible(group) for group in self.groups)
+
+
+class LayerIndex:
+    """Every layer of a file, in file order. Layers are looked up by their
+    layer_index, the file index they're parsed with, so layers of another read
+    of the same file are found too."""
+
+    def __init__(self, layers: List[LayerChunk]):
+        entries = []
+        tree = []
+        children: Dict[int, List[LayerChunk]] = {}
+        groups: List[LayerChunk] = []
+        lua_index = 0
+        for file_index, layer in enumerate(layers):
+            while layer.layer_child_level < len(groups):
+                groups.pop()
+            if groups:
+                children[groups[-1].layer_index].append(layer)
+            else:
+                tree.append(layer)
+
+            role, role_name = get_layer_role(layer)
+            if role == LayerRole.GROUP:
+                layer_lua_index = None
+            else:
+                lua_index += 1
+                layer_lua_index = lua_index
+            entries.append(
+                IndexedLayer(
+                    layer=layer,
+                    file_index=file_index,
+                    lua_index=layer_lua_index,
+                    groups=tuple(groups),
+                    is_visible=aseprite_layer_is_visible(layer),
+                    role=role,
+                    role_name=role_name,
+                )
+            )
+
+            if role == LayerRole.GROUP:
+                groups.append(layer)
+                children[layer.layer_index] = []
+
+        self.entries: Tuple[IndexedLayer, ...] = tuple(entries)
+        self.tree: Tuple[LayerChunk, ...] = tuple(tree)
+        self._children = {
+            file_index: tuple(group_children)
+            for file_index, group_children in children.items()
+        }
+        self._by_lua_index = {
+            entry.lua_index: entry for entry in entries if entry.lua_index is not None
+        }
+
+    def __iter__(self) -> Iterator[IndexedLayer]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, layer: LayerChunk) -> IndexedLayer:
+        return self.entries[layer.layer_index]
+
+    def get_children(self, group: LayerChunk) -> Tuple[LayerChunk, ...]:
+        return self._children.get(group.layer_index, ())
+
+    def get_lua_index(self, layer: Optional[LayerChunk]) -> Optional[int]:
+        if layer is None:
+            return None
+        return self.get(layer).lua_index
+
+    def get_lua_indices(self, layers: Iterable[LayerChunk]) -> List[int]:
+        return [self.get(layer).lua_index for layer in layers]
+
+    def from_lua_indices(self, lua_indices: Iterable[int]) -> List[LayerChunk]:
+        return [self._by_lua_index[lua_index].layer for lua_index in lua_indices]
+
+    def get_last_with_role(self, role: LayerRole) -> Optional[LayerChunk]:
+        """Like the lua scripts, the last layer wins if there are several."""
+        for entry in reversed(self.entries):
+            if entry.role == role:
+                return entry.layer
+        return None
@@ -0,0 +1,82 @@
+"""Decoding cel pixels into NumPy arrays."""
+
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from .chunks import CelData
+
+RGBA_COLOR_DEPTH = 32
+GRAYSCALE_COLOR_DEPTH = 16
+INDEXED_COLOR_DEPTH = 8
+
+
+class UnsupportedCelError(ValueError):
+    """The cel's pixels can't be decoded, such as a tilemap cel."""
+
+
+def decode_pixels(
+    cel_data: CelData,
+    color_depth: int,
+    palette: Optional[np.ndarray] = None,
+    transparent_index: Optional[int] = None,
+) -> np.ndarray:
+    """The cel's pixels as a read-only RGBA array of shape (height, width, 4).
+    RGBA pixels are a view of the cel's data, without copying it.
+    Grayscale pixels are expanded, and indexed pixels are looked up in the
+    palette, an RGBA array of shape (256, 4)."""
+    shape = (cel_data.height, cel_data.width)
+    pixels = np.frombuffer(cel_data.pixels, dtype=np.uint8)
+    if color_depth == RGBA_COLOR_DEPTH:
+        return pixels.reshape(shape + (4,))
+
+    if color_depth == GRAYSCALE_COLOR_DEPTH:
+        value_alpha = pixels.reshape(shape + (2,))
+        rgba = np.empty(shape + (4,), dtype=np.uint8)
+        rgba[:, :, :3] = value_alpha[:, :, :1]
+        rgba[:, :, 3] = value_alpha[:, :, 1]
+    elif color_depth == INDEXED_COLOR_DEPTH:
+        if transparent_index is not None:
+            palette = palette.copy()
+            palette[transparent_index] = 0
+        rgba = palette[pixels.reshape(shape)]
+    else:
+        raise UnsupportedCelError(f"color depth {color_depth}")
+    rgba.flags.writeable = False
+    return rgba
+
+
+class DecodedCelCache:
+    """Remembers the pixels of the most recently decoded cels, so cels linked to
+    the same source share one array instead of each decoding their own."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, cel_data: CelData, key: tuple, decode) -> np.ndarray:
+        # Entries hold a reference to their cel data, so its id can't be reused.
+        key = (id(cel_data),) + key
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+        pixels = decode()
+        if self.max_size > 0:
+            self._entries[key] = (cel_data, pixels)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return pixels
+
+    def clear(self):
+        self._entries.clear()
+
+    def evict(self, source):
+        """Forget the cels read from source, such as a file being closed."""
+        for key, (cel_data, _) in list(self._entries.items()):
+            if cel_data.is_from(source):
+                del self._entries[key]
+
+
+DECODED_CELS = DecodedCelCache(max_size=16)
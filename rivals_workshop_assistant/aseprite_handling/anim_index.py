@@ -0,0 +1,291 @@
+import json
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, List, TYPE_CHECKING, Optional
+
+from loguru import logger
+
+from rivals_workshop_assistant.aseprite_handling.tag_objects import TagObject
+from rivals_workshop_assistant.aseprite_handling.windows import Window
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling.anims import Anim
+    from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
+    from rivals_workshop_assistant.aseprite_handling.tags import TagColor
+
+FILENAME = ".anim_index"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increment when the stored anims change shape, to discard old indexes.
+CACHE_VERSION = 2
+
+
+class AnimRecord(TagObject):
+    """What scripts need to know about an anim, without its aseprite file."""
+
+    __slots__ = ("windows", "frame_hash", "is_fresh", "aseprite_path")
+
+    def __init__(
+        self,
+        name: str,
+        start: int,
+        end: int,
+        windows: List[Window],
+        frame_hash: str,
+        is_fresh: bool,
+        aseprite_path: Path,
+    ):
+        super().__init__(name, start, end)
+        self.windows = windows
+        self.frame_hash = frame_hash
+        self.is_fresh = is_fresh
+        self.aseprite_path = aseprite_path
+
+    @property
+    def num_frames(self):
+        return self.end - self.start + 1
+
+    @classmethod
+    def from_anim(cls, anim: "Anim", aseprite_path: Path):
+        return cls(
+            name=anim.name,
+            start=anim.start,
+            end=anim.end,
+            windows=anim.windows,
+            frame_hash=anim.frame_hash,
+            is_fresh=anim.is_fresh,
+            aseprite_path=aseprite_path,
+        )
+
+    def __str__(self):
+        return self.name
+
+
+def _get_colors_key(colors: List["TagColor"]) -> list:
+    """The colors as they'd be read back from json, so they can be compared."""
+    return json.loads(json.dumps(list(colors)))
+
+
+def _anim_to_dict(anim: "Anim") -> dict:
+    return {
+        "name": anim.name,
+        "start": anim.start,
+        "end": anim.end,
+        "frame_hash": anim.frame_hash,
+        "windows": [[window.name, window.start, window.end] for window in anim.windows],
+    }
+
+
+def get_script_name(anim_name: str) -> str:
+    """The name of the attack script an anim is for.
+    HURTBOX only marks that the anim gets a hurtbox."""
+    return anim_name.replace("HURTBOX", "").strip()
+
+
+class AnimIndex:
+    """The anims of previously read aseprite files, with their windows.
+    An entry is used only while the file's size and modified time, and the tag
+    colors it was read with, are unchanged, so scripts can be updated without
+    opening unchanged aseprite files.
+    Anims are also indexed by the script name they're for, to find the one file
+    an attack script needs."""
+
+    def __init__(self, entries: Dict[str, dict] = None, names: Dict[str, dict] = None):
+        if entries is None:
+            entries = {}
+        self.entries = entries
+
+        if names is None:
+            names = _get_names(entries)
+        self.names = names
+
+    def _get_entry(self, aseprite: "Aseprite") -> Optional[dict]:
+        stat = _get_stat(aseprite)
+        entry = self.entries.get(aseprite.path.as_posix(), None)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+            or entry["anim_tag_colors"] != _get_colors_key(aseprite.anim_tag_colors)
+            or entry["window_tag_colors"] != _get_colors_key(aseprite.window_tag_colors)
+        ):
+            return None
+        return entry
+
+    def has(self, aseprite: "Aseprite") -> bool:
+        return self._get_entry(aseprite) is not None
+
+    def put(self, aseprite: "Aseprite"):
+        """Record the aseprite's anims. This reads the file if it wasn't yet."""
+        self._put_entry(aseprite)
+        self.names = _get_names(self.entries)
+
+    def _put_entry(self, aseprite: "Aseprite"):
+        stat = _get_stat(aseprite)
+        key = aseprite.path.as_posix()
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "anim_tag_colors": _get_colors_key(aseprite.anim_tag_colors),
+            "window_tag_colors": _get_colors_key(aseprite.window_tag_colors),
+            "anims": [_anim_to_dict(anim) for anim in aseprite.anims],
+        }
+        self.entries[key] = entry
+
+    def update(self, aseprites: List["Aseprite"]):
+        """Record the aseprites that are missing from the index, or changed since
+        they were recorded. Only those files are read."""
+        for aseprite in aseprites:
+            if not self.has(aseprite):
+                self._put_entry(aseprite)
+
+        # Keep the files in the order they're read in, so the same file's anim
+        # wins a script name whatever order the files were recorded in.
+        keys = [aseprite.path.as_posix() for aseprite in aseprites]
+        self.entries = {
+            **{key: self.entries[key] for key in keys if key in self.entries},
+            **self.entries,
+        }
+        self.names = _get_names(self.entries)
+
+    def record_loaded(self, aseprites: List["Aseprite"]):
+        """Record the anims of the aseprites that were read during the run."""
+        for aseprite in aseprites:
+            if aseprite.anims_are_loaded and not self.has(aseprite):
+                self.put(aseprite)
+
+    def get_anims(self, aseprites: List["Aseprite"]) -> List[AnimRecord]:
+        """The anims of every aseprite. Only files missing from the index, or
+        changed since they were recorded, are read."""
+        self.update(aseprites)
+        return [
+            self._get_record(aseprite, anim_dict)
+            for aseprite in aseprites
+            for anim_dict in self.entries[aseprite.path.as_posix()]["anims"]
+        ]
+
+    def get_script_anims(self, aseprites: List["Aseprite"]) -> "AnimsByScriptName":
+        """The anims of every aseprite, by the script name they're for.
+        Only files missing from the index, or changed since they were recorded,
+        are read."""
+        self.update(aseprites)
+        return AnimsByScriptName(self, aseprites)
+
+    def _get_record(self, aseprite: "Aseprite", anim_dict: dict) -> AnimRecord:
+        if aseprite.anims_are_loaded:
+            # The anims already worked out their freshness, before saving their
+            # hashes, so theirs is used.
+            for anim in aseprite.anims:
+                if anim.name == anim_dict["name"]:
+                    return AnimRecord.from_anim(anim, aseprite.path)
+        return self._make_record(aseprite, anim_dict)
+
+    @staticmethod
+    def _make_record(aseprite: "Aseprite", anim_dict: dict) -> AnimRecord:
+        name = anim_dict["name"]
+        frame_hash = anim_dict["frame_hash"]
+        # Freshness as Anim decides it, from the hash recorded with the file.
+        # The hash isn't saved to anim_hashes, so exporting still sees the change.
+        is_fresh = False
+        if aseprite.is_fresh:
+            anim_hashes = aseprite.anim_hashes
+            if anim_hashes is None:
+                anim_hashes = {}
+            is_fresh = frame_hash != anim_hashes.get(name, None)
+        return AnimRecord(
+            name=name,
+            start=anim_dict["start"],
+            end=anim_dict["end"],
+            windows=[
+                Window(name=window_name, start=start, end=end)
+                for window_name, start, end in anim_dict["windows"]
+            ],
+            frame_hash=frame_hash,
+            is_fresh=is_fresh,
+            aseprite_path=aseprite.path,
+        )
+
+    def prune(self, keep: List[Path]):
+        """Forget files that aren't in keep, such as deleted files."""
+        keep_keys = {path.as_posix() for path in keep}
+        self.entries = {
+            key: entry for key, entry in self.entries.items() if key in keep_keys
+        }
+        self.names = _get_names(self.entries)
+
+
+class AnimsByScriptName(Mapping):
+    """The anims in an anim index, looked up by the script name they're for.
+    Only the anim that's looked up is made."""
+
+    def __init__(self, index: AnimIndex, aseprites: List["Aseprite"]):
+        self.index = index
+        self._aseprites = {aseprite.path.as_posix(): aseprite for aseprite in aseprites}
+
+    def __getitem__(self, script_name: str) -> AnimRecord:
+        location = self.index.names[script_name]
+        aseprite = self._aseprites[location["path"]]
+        for anim_dict in self.index.entries[location["path"]]["anims"]:
+            if anim_dict["name"] == location["name"]:
+                return self.index._get_record(aseprite, anim_dict)
+        raise KeyError(script_name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index.names)
+
+    def __len__(self) -> int:
+        return len(self.index.names)
+
+
+def _get_names(entries: Dict[str, dict]) -> Dict[str, dict]:
+    """Where the anim for each script name is.
+    Made from every file, so when a file loses an anim, another file's anim for
+    the same script name takes its place."""
+    names = {}
+    for key, entry in entries.items():
+        for anim_dict in entry["anims"]:
+            # Like looking through the anims in order, the first anim for a name
+            # wins.
+            names.setdefault(
+                get_script_name(anim_dict["name"]),
+                {
+                    "path": key,
+                    "name": anim_dict["name"],
+                    "start": anim_dict["start"],
+                    "end": anim_dict["end"],
+                },
+            )
+    return names
+
+
+def _get_stat(aseprite: "Aseprite") -> os.stat_result:
+    if aseprite.stat is None:
+        aseprite.stat = aseprite.path.stat()
+    return aseprite.stat
+
+
+def read_index(root_dir: Path) -> AnimIndex:
+    """Controller"""
+    try:
+        index_dict = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return AnimIndex()
+    except ValueError:
+        logger.warning(f"Anim index is malformed and being ignored: {PATH}")
+        return AnimIndex()
+
+    if index_dict.get("version", None) != CACHE_VERSION:
+        return AnimIndex()
+    return AnimIndex(entries=index_dict["files"], names=index_dict["names"])
+
+
+def save_index(root_dir: Path, index: AnimIndex):
+    """Controller"""
+    (root_dir / PATH).parent.mkdir(parents=True, exist_ok=True)
+    (root_dir / PATH).write_text(
+        json.dumps(
+            {"version": CACHE_VERSION, "files": index.entries, "names": index.names}
+        )
+    )
@@ -1,8 +1,4 @@
-import asyncio
-import hashlib
 import itertools
-import os
-import pickle
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, TYPE_CHECKING, Dict
@@ -19,20 +15,24 @@ from rivals_workshop_assistant.aseprite_handling._aseprite_loading.chunks import
 from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
     EXPORT_ASEPRITE_LUA_PATH,
     CREATE_HURTBOX_LUA_PATH,
-    supply_lua_script,
+)
+from rivals_workshop_assistant.aseprite_handling.exporting import (
+    ExportJob,
+    run_export_jobs,
 )
 from rivals_workshop_assistant.aseprite_handling.constants import (
     ANIMS_WHICH_CARE_ABOUT_SMALL_SPRITES,
     does_anim_get_a_hurtbox,
 )
 from rivals_workshop_assistant.aseprite_handling.tag_objects import TagObject
-from rivals_workshop_assistant.paths import ASEPRITE_LUA_SCRIPTS_FOLDER
+from rivals_workshop_assistant.aseprite_handling.layers import LayerRole
 
 if TYPE_CHECKING:
     from rivals_workshop_assistant.aseprite_handling.aseprites import (
         AsepriteFileContent,
         Aseprite,
     )
+    from rivals_workshop_assistant.aseprite_handling.export_cache import ExportCache
     from rivals_workshop_assistant.aseprite_handling.params import (
         AsepritePathParams,
         AsepriteConfigParams,
@@ -40,6 +40,15 @@ if TYPE_CHECKING:
 
 
 class Anim(TagObject):
+    __slots__ = (
+        "content",
+        "windows",
+        "anim_hashes",
+        "file_is_fresh",
+        "_frame_hash",
+        "is_fresh",
+    )
+
     def __init__(
         self,
         name: str,
@@ -65,11 +74,15 @@ class Anim(TagObject):
         self.file_is_fresh = file_is_fresh
 
         self._frame_hash = frame_hash
-        if self._frame_hash is None:
-            self._frame_hash = self._get_frame_hash()
         self.is_fresh = self._get_is_fresh()
         self._save_hash()
 
+    @property
+    def frame_hash(self):
+        if self._frame_hash is None:
+            self._frame_hash = self._get_frame_hash()
+        return self._frame_hash
+
     @property
     def num_frames(self):
         return self.end - self.start + 1
@@ -97,6 +110,18 @@ class Anim(TagObject):
         config_params: "AsepriteConfigParams",
         aseprite_file_path: Path,
     ):
+        await run_export_jobs(
+            self.get_export_jobs(path_params, config_params, aseprite_file_path),
+            path_params=path_params,
+            config_params=config_params,
+        )
+
+    def get_export_jobs(
+        self,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+        aseprite_file_path: Path,
+    ) -> List[ExportJob]:
         root_name = get_anim_file_name_root(
             path_params.root_dir, aseprite_file_path, self.save_name.lower()
         )
@@ -127,105 +152,56 @@ class Anim(TagObject):
         ]
         all_run_params = normal_run_params + splits_run_params + opts_run_params
 
-        coroutines = []
+        indexed_layers = self.content.layers.indexed_layers
+        # Found by name, like the hurtbox script does.
+        hurtbox_layers = [
+            entry.layer
+            for entry in indexed_layers
+            if entry.role in (LayerRole.HURTBOX, LayerRole.HURTMASK)
+        ]
 
+        jobs = []
         for run_params in all_run_params:
-            target_layers = _get_layer_indices(run_params.target_layers)
-            coroutines.append(
-                self._run_lua_export(
-                    path_params=path_params,
+            target_layers = indexed_layers.get_lua_indices(run_params.target_layers)
+            jobs.append(
+                ExportJob(
                     aseprite_file_path=aseprite_file_path,
                     base_name=run_params.name,
+                    start=self.start,
+                    end=self.end,
                     script_name=EXPORT_ASEPRITE_LUA_PATH,
                     lua_params={
                         "scale": scale_param,
                         "targetLayers": target_layers,
                     },
+                    content=self.content,
+                    layers=run_params.target_layers,
                 )
             )
 
             if config_params.hurtboxes_enabled and self.gets_a_hurtbox():
-                coroutines.append(
-                    self._run_lua_export(
-                        path_params=path_params,
+                jobs.append(
+                    ExportJob(
                         aseprite_file_path=aseprite_file_path,
                         base_name=f"{run_params.name}_hurt",
+                        start=self.start,
+                        end=self.end,
                         script_name=CREATE_HURTBOX_LUA_PATH,
                         lua_params={
                             "scale": hurtbox_scale_param,
                             "targetLayers": target_layers,
-                            "hurtboxLayer": self.content.layers.hurtbox,
-                            "hurtmaskLayer": self.content.layers.hurtmask,
+                            "hurtboxLayer": indexed_layers.get_lua_index(
+                                self.content.layers.hurtbox
+                            ),
+                            "hurtmaskLayer": indexed_layers.get_lua_index(
+                                self.content.layers.hurtmask
+                            ),
                         },
+                        content=self.content,
+                        layers=run_params.target_layers + hurtbox_layers,
                     )
                 )
-        await asyncio.gather(*coroutines)
-
-    async def _run_lua_export(
-        self,
-        path_params: "AsepritePathParams",
-        aseprite_file_path: Path,
-        base_name: str,
-        script_name: str,
-        lua_params: dict = None,
-    ):
-        full_script_path = (
-            path_params.exe_dir / ASEPRITE_LUA_SCRIPTS_FOLDER / script_name
-        ).absolute()
-        supply_lua_script(
-            path=full_script_path,
-        )
-
-        if lua_params is None:
-            lua_params = {}
-
-        _delete_paths_from_glob(
-            path_params.root_dir,
-            f"{base_name}_strip*.png",
-        )
-
-        dest_name = f"{base_name}_strip{self.num_frames}.png"
-        dest = path_params.root_dir / paths.SPRITES_FOLDER / dest_name
-        dest.parent.mkdir(parents=True, exist_ok=True)
-
-        command_parts = (
-            [
-                f'"{path_params.aseprite_program_path}"',
-                "-b",
-                _format_param("filename", aseprite_file_path),
-                _format_param("dest", dest),
-                _format_param("startFrame", self.start + 1),
-                _format_param("endFrame", self.end + 1),
-            ]
-            + [_format_param(key, value) for key, value in lua_params.items()]
-            + [
-                f'-script "{full_script_path}"',
-            ]
-        )
-        export_command = " ".join(command_parts)
-        try:
-            proc = await asyncio.create_subprocess_shell(
-                export_command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            stdout, stderr = await proc.communicate()
-            logger.debug(f"Ran lua script: {export_command}")
-            if stdout:
-                logger.debug(f"[stdout] {stdout}")
-            if proc.returncode != 0:
-                logger.error(f"Lua script command failed.")
-                if stderr:
-                    logger.error(f"[stderr] {stderr.decode()}")
-            elif not aseprite_file_path.exists():
-                logger.error(
-                    f"Exported aseprite file {aseprite_file_path} not found, "
-                    f"although no error from aseprite."
-                )
-        except FileNotFoundError:
-            logger.error(f"Aseprite not found at {path_params.aseprite_program_path}")
-        except PermissionError as e:
-            logger.error(repr(e))
+        return jobs
 
     def gets_a_hurtbox(self):
         return does_anim_get_a_hurtbox(self.name)
@@ -235,16 +211,15 @@ class Anim(TagObject):
 
     def _get_is_fresh(self):
         if not self.file_is_fresh:
+            # The file hasn't changed, so neither have its frames. Skip hashing.
             return False
 
         anim_hash_from_previous_run = self.anim_hashes.get(self.name, None)
-        return self._frame_hash != anim_hash_from_previous_run
+        return self.frame_hash != anim_hash_from_previous_run
 
     def _get_frame_hash(self):
         try:
-            return hashlib.md5(
-                pickle.dumps(self.content.file_data.frames[self.start : self.end + 1])
-            ).hexdigest()
+            return self.content.file_data.get_frames_hash(self.start, self.end)
         except AttributeError:
             logger.error(
                 f"Could not make checksum for "
@@ -253,31 +228,13 @@ class Anim(TagObject):
             return 0
 
     def _save_hash(self):
-        self.anim_hashes[self.name] = self._frame_hash
+        if self._frame_hash is not None:
+            self.anim_hashes[self.name] = self._frame_hash
 
     def __str__(self):
         return self.name
 
 
-def _get_layer_indices(layers: List[LayerChunk]) -> List[int]:
-    # change to 1-indexing
-    return [layer.layer_index + 1 for layer in layers]
-
-
-def _format_param(param_name, value):
-    if isinstance(value, list):
-        # Format list as `a,b,c` instead of `[a, b, c]` for easier parsing.
-        value = ",".join(str(item) for item in value)
-    return f'-script-param {param_name}="{value}"'
-
-
-def _delete_paths_from_glob(root_dir: Path, paths_glob: str):
-    """Delete paths matching the glob"""
-    old_paths = (root_dir / paths.SPRITES_FOLDER).glob(paths_glob)
-    for old_path in old_paths:
-        os.remove(old_path)
-
-
 def get_anim_file_name_root(root_dir: Path, aseprite_file_path: Path, name: str) -> str:
     """Return the anim's name, prefixed with any subfolders the anim is in.
     anims/vfx/hitfx/star.aseprite -> 'vfx_hitfx_star'"""
@@ -307,7 +264,11 @@ async def save_anims(
     path_params: "AsepritePathParams",
     config_params: "AsepriteConfigParams",
     aseprites: List["Aseprite"],
+    export_cache: "ExportCache" = None,
 ):
+    """Export the changed anims.
+    With an export cache, every anim is checked against the cache instead,
+    so spritesheets that are missing or made differently are exported too."""
     if not path_params.aseprite_program_path:
         logger.warning(
             "Not saving anims, because no aseprite path has been supplied.\n"
@@ -315,10 +276,34 @@ async def save_anims(
             "process aseprite files."
         )
         return
-    coroutines = []
-    for aseprite in aseprites:
-        if aseprite.is_fresh:
-            coroutines.append(
-                aseprite.save(path_params=path_params, config_params=config_params)
+    if export_cache is None:
+        jobs = [
+            job
+            for aseprite in aseprites
+            if aseprite.is_fresh
+            for job in aseprite.get_export_jobs(
+                path_params=path_params, config_params=config_params
             )
-    await asyncio.gather(*coroutines)
+        ]
+    else:
+        jobs = [
+            job
+            for aseprite in aseprites
+            for job in aseprite.get_export_jobs(
+                path_params=path_params,
+                config_params=config_params,
+                include_unchanged=True,
+            )
+        ]
+        export_cache.prune(keep=jobs)
+    try:
+        await run_export_jobs(
+            jobs,
+            path_params=path_params,
+            config_params=config_params,
+            export_cache=export_cache,
+        )
+    finally:
+        for aseprite in aseprites:
+            if aseprite.content_is_loaded:
+                aseprite.content.close()
@@ -12,6 +12,11 @@ from rivals_workshop_assistant.assistant_config_mod import (
     get_aseprite_program_path,
     get_hurtboxes_enabled,
     get_is_ssl,
+    get_native_exports,
+    get_batch_exports,
+    get_export_parallelism,
+    get_export_timeout,
+    get_export_retries,
 )
 from rivals_workshop_assistant.character_config_mod import get_has_small_sprites
 from rivals_workshop_assistant.run_context import RunContext
@@ -35,6 +40,7 @@ async def update_anims(
                 exe_dir=run_context.exe_dir,
                 root_dir=run_context.root_dir,
                 aseprite_program_path=aseprite_program_path,
+                file_index=run_context.file_index,
             ),
             config_params=AsepriteConfigParams(
                 has_small_sprites=get_has_small_sprites(
@@ -44,6 +50,23 @@ async def update_anims(
                     assistant_config=run_context.assistant_config
                 ),
                 is_ssl=get_is_ssl(assistant_config=run_context.assistant_config),
+                native_exports=get_native_exports(
+                    assistant_config=run_context.assistant_config
+                ),
+                batch_exports=get_batch_exports(
+                    assistant_config=run_context.assistant_config
+                ),
+                export_parallelism=get_export_parallelism(
+                    assistant_config=run_context.assistant_config
+                ),
+                export_timeout=get_export_timeout(
+                    assistant_config=run_context.assistant_config
+                ),
+                export_retries=get_export_retries(
+                    assistant_config=run_context.assistant_config
+                ),
             ),
             aseprites=aseprites,
+            export_cache=run_context.export_cache,
         )
+    run_context.anim_index.record_loaded(aseprites)
@@ -1,18 +1,25 @@
-import asyncio
-import itertools
+import os
 from datetime import datetime
 from pathlib import Path
-from typing import List, TYPE_CHECKING, Iterable, Dict
+from typing import List, TYPE_CHECKING, Dict
 
-from rivals_workshop_assistant import assistant_config_mod
+from rivals_workshop_assistant import assistant_config_mod, paths
 from rivals_workshop_assistant.aseprite_handling.anims import Anim
+from rivals_workshop_assistant.aseprite_handling.exporting import (
+    ExportJob,
+    run_export_jobs,
+)
 from rivals_workshop_assistant.aseprite_handling.windows import Window
-from rivals_workshop_assistant.dotfile_mod import get_script_processed_time
-from rivals_workshop_assistant.file_handling import File, _get_modified_time
+from rivals_workshop_assistant.file_handling import File
+from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
 from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
     RawAsepriteFile,
 )
-from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
+from rivals_workshop_assistant.aseprite_handling.metadata import (
+    AsepriteMetadata,
+    AsepriteMetadataCache,
+    read_metadata,
+)
 from rivals_workshop_assistant.run_context import RunContext
 
 if TYPE_CHECKING:
@@ -30,17 +37,21 @@ class AsepriteFileContent:
         self,
         anim_tag_colors: List["TagColor"],
         window_tag_colors: List["TagColor"],
-        file_data: "RawAsepriteFile",
+        file_data: "AsepriteMetadata",
         is_fresh: bool = False,
         layers: "AsepriteLayers" = None,  # just so it can be mocked
+        path: Path = None,
     ):
         self.file_data = file_data
+        self.path = path
+        self._file_with_pixels = None
         self.anim_tag_colors = anim_tag_colors
         self.window_tag_colors = window_tag_colors
         self.is_fresh = is_fresh
 
         if layers is None and file_data is not None:
-            self.layers = AsepriteLayers.from_file(self.file_data)
+            layers = AsepriteLayers.from_file(self.file_data)
+        self.layers = layers
 
     @property
     def num_frames(self):
@@ -50,6 +61,20 @@ class AsepriteFileContent:
     def tags(self):
         return self.file_data.get_tags()
 
+    @property
+    def file_with_pixels(self) -> RawAsepriteFile:
+        """The fully parsed file, for drawing it. Only read when first needed."""
+        if self._file_with_pixels is None:
+            self._file_with_pixels = RawAsepriteFile.from_path(self.path)
+        return self._file_with_pixels
+
+    def close(self):
+        """Close the fully parsed file, if it was read, so it's not kept open
+        after drawing. It's read again if needed."""
+        if self._file_with_pixels is not None:
+            self._file_with_pixels.close()
+            self._file_with_pixels = None
+
     @classmethod
     def from_path(
         cls,
@@ -57,15 +82,19 @@ class AsepriteFileContent:
         anim_tag_colors: List["TagColor"],
         window_tag_colors: List["TagColor"],
         is_fresh: bool,
+        metadata_cache: AsepriteMetadataCache = None,
+        stat: os.stat_result = None,
     ):
-        with open(path, "rb") as f:
-            contents = f.read()
-            raw_aseprite_file = RawAsepriteFile(contents)
+        if metadata_cache is None:
+            metadata = read_metadata(path)
+        else:
+            metadata = metadata_cache.load(path, stat)
         return cls(
-            file_data=raw_aseprite_file,
+            file_data=metadata,
             anim_tag_colors=anim_tag_colors,
             window_tag_colors=window_tag_colors,
             is_fresh=is_fresh,
+            path=path,
         )
 
 
@@ -80,8 +109,13 @@ class Aseprite(File):
         content=None,
         anims: Anim = None,
         anim_hashes: Dict[str, str] = None,  # None for testing only
+        metadata_cache: AsepriteMetadataCache = None,
+        stat: os.stat_result = None,
+        is_fresh: bool = None,
     ):
-        super().__init__(path, modified_time, processed_time)
+        super().__init__(path, modified_time, processed_time, is_fresh)
+        self.metadata_cache = metadata_cache
+        self.stat = stat
         self.anim_tag_colors = anim_tag_colors
         self.window_tag_colors = window_tag_colors
         self.anim_hashes = anim_hashes
@@ -96,6 +130,8 @@ class Aseprite(File):
                 anim_tag_colors=self.anim_tag_colors,
                 window_tag_colors=self.window_tag_colors,
                 is_fresh=self.is_fresh,
+                metadata_cache=self.metadata_cache,
+                stat=self.stat,
             )
         return self._content
 
@@ -109,18 +145,41 @@ class Aseprite(File):
             self._anims = self.get_anims()
         return self._anims
 
+    @property
+    def anims_are_loaded(self) -> bool:
+        return self._anims is not None
+
+    @property
+    def content_is_loaded(self) -> bool:
+        return self._content is not None
+
     async def save(
         self,
         path_params: "AsepritePathParams",
         config_params: "AsepriteConfigParams",
     ):
-        coroutines = []
-        for anim in self.anims:
-            if anim.is_fresh:
-                coroutines.append(
-                    anim.save(path_params, config_params, aseprite_file_path=self.path)
-                )
-        await asyncio.gather(*coroutines)
+        await run_export_jobs(
+            self.get_export_jobs(path_params, config_params),
+            path_params=path_params,
+            config_params=config_params,
+        )
+
+    def get_export_jobs(
+        self,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+        include_unchanged: bool = False,
+    ) -> List[ExportJob]:
+        """If include_unchanged, the jobs of anims that haven't changed since the
+        last run are included too, so an export cache can check their outputs."""
+        return [
+            job
+            for anim in self.anims
+            if anim.is_fresh or include_unchanged
+            for job in anim.get_export_jobs(
+                path_params, config_params, aseprite_file_path=self.path
+            )
+        ]
 
     def get_anims(self):
         tag_anims = [
@@ -187,34 +246,41 @@ class Aseprite(File):
 
 
 def read_aseprites(run_context: RunContext) -> List[Aseprite]:
-    ase_paths: Iterable[Path] = itertools.chain(
-        *[
-            list((run_context.root_dir / "anims").rglob(f"*.{filetype}"))
-            for filetype in ("ase", "aseprite")
-        ]
+    ase_paths = [
+        path
+        for extension in (".ase", ".aseprite")
+        for path in run_context.file_index.get_paths(paths.ANIMS_FOLDER, extension)
+    ]
+    stats = [run_context.file_index.stat(path) for path in ase_paths]
+    run_context.aseprite_cache.prune(keep=ase_paths)
+    run_context.anim_index.prune(keep=ase_paths)
+    run_context.aseprite_cache.preload(
+        paths=ase_paths,
+        stats=stats,
+        workers=assistant_config_mod.get_aseprite_parse_workers(
+            run_context.assistant_config
+        ),
     )
-    processed_time = get_script_processed_time(dotfile=run_context.dotfile)
+
     aseprites = []
-    for path in ase_paths:
-        aseprite = read_aseprite(
-            run_context=run_context,
-            path=path,
-            processed_time=processed_time,
-        )
+    for path, stat in zip(ase_paths, stats):
+        aseprite = read_aseprite(run_context=run_context, path=path, stat=stat)
         aseprites.append(aseprite)
     return aseprites
 
 
 def read_aseprite(
-    run_context: RunContext, path: Path, processed_time: datetime = None
+    run_context: RunContext,
+    path: Path,
+    stat: os.stat_result = None,
 ) -> Aseprite:
-    if processed_time is None:
-        processed_time = get_script_processed_time(dotfile=run_context.dotfile)
+    if stat is None:
+        stat = run_context.file_index.stat(path)
 
     aseprite = Aseprite(
         path=path,
-        modified_time=_get_modified_time(path),
-        processed_time=processed_time,
+        modified_time=datetime.fromtimestamp(stat.st_mtime),
+        is_fresh=run_context.file_manifest.is_changed(path, stat),
         anim_tag_colors=assistant_config_mod.get_anim_tag_color(
             run_context.assistant_config
         ),
@@ -224,5 +290,7 @@ def read_aseprite(
         anim_hashes=run_context.dotfile.setdefault("anim_hashes", {}).setdefault(
             path.stem, {}
         ),
+        metadata_cache=run_context.aseprite_cache,
+        stat=stat,
     )
     return aseprite
@@ -0,0 +1,124 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from loguru import logger
+
+from rivals_workshop_assistant.aseprite_handling.exporting import ExportJob
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    get_lua_script_version,
+)
+from rivals_workshop_assistant.aseprite_handling.scheduling import format_param_value
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+FILENAME = ".export_cache"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increment when exports change without their inputs changing, such as when
+# native rendering changes, to redo every export.
+CACHE_VERSION = 1
+
+
+def get_export_key(job: ExportJob, native_exports: bool) -> str:
+    """Hash everything the job's spritesheet is made from, including whether it
+    could be drawn natively rather than by aseprite.
+    Only the cels and layer chunks of the job's layers count, so changing one
+    layer only redoes the spritesheets using it."""
+    file_data = job.content.file_data
+    if job.layers:
+        pixels_hash = file_data.get_layers_hash(job.start, job.end, job.layers)
+        structure_hash = file_data.get_structure_hash(job.layers)
+    else:
+        pixels_hash = file_data.get_frames_hash(job.start, job.end)
+        structure_hash = file_data.get_structure_hash(file_data.layers)
+    key_parts = [
+        pixels_hash,
+        structure_hash,
+        job.script_name,
+        get_lua_script_version(job.script_name),
+        native_exports,
+        sorted(
+            (key, format_param_value(value)) for key, value in job.lua_params.items()
+        ),
+    ]
+    return hashlib.blake2b(json.dumps(key_parts).encode(), digest_size=16).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+class ExportCache:
+    """What each exported spritesheet was made from, and what it was.
+    An export is skipped while its inputs are unchanged and its spritesheet is
+    still on disk, unmodified."""
+
+    def __init__(self, entries: Dict[str, dict] = None):
+        if entries is None:
+            entries = {}
+        self.entries = entries
+
+    def is_current(self, job: ExportJob, root_dir: Path, native_exports: bool) -> bool:
+        entry = self.entries.get(job.dest_name, None)
+        if entry is None or entry["key"] != get_export_key(job, native_exports):
+            return False
+
+        dest = job.get_dest(root_dir)
+        try:
+            stat = dest.stat()
+        except FileNotFoundError:
+            return False
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+
+        # Touched, maybe by a fresh checkout. Check if the content changed.
+        if hash_file(dest) != entry["output_hash"]:
+            return False
+        entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        return True
+
+    def record(self, job: ExportJob, root_dir: Path, native_exports: bool):
+        """Remember the job's spritesheet, if it was made."""
+        dest = job.get_dest(root_dir)
+        try:
+            stat = dest.stat()
+        except FileNotFoundError:
+            self.entries.pop(job.dest_name, None)
+            return
+        self.entries[job.dest_name] = {
+            "key": get_export_key(job, native_exports),
+            "output_hash": hash_file(dest),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def prune(self, keep: List[ExportJob]):
+        """Forget spritesheets that aren't made by any of the jobs anymore."""
+        keep_names = {job.dest_name for job in keep}
+        self.entries = {
+            name: entry for name, entry in self.entries.items() if name in keep_names
+        }
+
+
+def read_cache(root_dir: Path) -> ExportCache:
+    """Controller"""
+    try:
+        cache_dict = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return ExportCache()
+    except ValueError:
+        logger.warning(f"Export cache is malformed and being ignored: {PATH}")
+        return ExportCache()
+
+    if cache_dict.get("version", None) != CACHE_VERSION:
+        return ExportCache()
+    return ExportCache(entries=cache_dict["exports"])
+
+
+def save_cache(root_dir: Path, cache: ExportCache):
+    """Controller"""
+    (root_dir / PATH).parent.mkdir(parents=True, exist_ok=True)
+    (root_dir / PATH).write_text(
+        json.dumps({"version": CACHE_VERSION, "exports": cache.entries})
+    )
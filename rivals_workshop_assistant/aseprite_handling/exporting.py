@@ -0,0 +1,255 @@
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Dict
+
+from loguru import logger
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.file_index import FileIndex
+from rivals_workshop_assistant.aseprite_handling import native_rendering
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    supply_lua_script,
+    EXPORT_DRIVER_LUA_PATH,
+)
+from rivals_workshop_assistant.aseprite_handling.scheduling import (
+    ExportScheduler,
+    ScriptRun,
+    format_param_value,
+)
+from rivals_workshop_assistant.paths import ASEPRITE_LUA_SCRIPTS_FOLDER
+
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+        LayerChunk,
+    )
+    from rivals_workshop_assistant.aseprite_handling.aseprites import (
+        AsepriteFileContent,
+    )
+    from rivals_workshop_assistant.aseprite_handling.export_cache import ExportCache
+    from rivals_workshop_assistant.aseprite_handling.params import (
+        AsepritePathParams,
+        AsepriteConfigParams,
+    )
+
+
+@dataclass
+class ExportJob:
+    """A single spritesheet to export from a range of an aseprite file's frames."""
+
+    aseprite_file_path: Path
+    base_name: str
+    start: int
+    end: int
+    script_name: str
+    lua_params: dict = field(default_factory=dict)
+    content: "AsepriteFileContent" = field(default=None, repr=False, compare=False)
+    # Every layer the spritesheet is made from, to tell when it needs exporting.
+    layers: List["LayerChunk"] = field(default_factory=list, repr=False, compare=False)
+
+    @property
+    def num_frames(self):
+        return self.end - self.start + 1
+
+    @property
+    def dest_name(self):
+        return f"{self.base_name}_strip{self.num_frames}.png"
+
+    def get_dest(self, root_dir: Path) -> Path:
+        return root_dir / paths.SPRITES_FOLDER / self.dest_name
+
+
+async def run_export_jobs(
+    jobs: List[ExportJob],
+    path_params: "AsepritePathParams",
+    config_params: "AsepriteConfigParams",
+    export_cache: "ExportCache" = None,
+):
+    """Export every job, drawing natively what can be, and using aseprite for
+    the rest. With an export cache, jobs whose spritesheets are current are
+    skipped."""
+    if export_cache is not None:
+        jobs = [
+            job
+            for job in jobs
+            if not export_cache.is_current(
+                job, path_params.root_dir, config_params.native_exports
+            )
+        ]
+
+    aseprite_jobs = []
+    for job in jobs:
+        if not _run_native_export(job, path_params, config_params):
+            aseprite_jobs.append(job)
+
+    if aseprite_jobs:
+        scheduler = ExportScheduler.from_params(path_params, config_params)
+        if config_params.batch_exports:
+            await _run_export_manifest(aseprite_jobs, path_params, scheduler)
+        else:
+            await _run_lua_exports(aseprite_jobs, path_params, scheduler)
+        for job in aseprite_jobs:
+            dest = job.get_dest(path_params.root_dir)
+            if dest.exists():
+                path_params.file_index.add(dest)
+
+    if export_cache is not None:
+        for job in jobs:
+            export_cache.record(job, path_params.root_dir, config_params.native_exports)
+
+
+def _run_native_export(
+    job: ExportJob,
+    path_params: "AsepritePathParams",
+    config_params: "AsepriteConfigParams",
+) -> bool:
+    """Clear the job's old spritesheets and draw it natively if possible.
+    Returns if it was drawn."""
+    _delete_paths_from_glob(
+        path_params.file_index,
+        f"{job.base_name}_strip*.png",
+    )
+    dest = job.get_dest(path_params.root_dir)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    if not config_params.native_exports:
+        return False
+    try:
+        native_rendering.render_export_job(job, job.content.file_with_pixels).save(dest)
+        path_params.file_index.add(dest)
+        logger.debug(f"Rendered {dest.name} natively")
+        return True
+    except native_rendering.UnsupportedByNativeRenderer as e:
+        logger.debug(f"Using aseprite for {dest.name}: {e}")
+        return False
+
+
+def make_manifest(jobs: List[ExportJob], path_params: "AsepritePathParams") -> dict:
+    """The jobs for the export driver, grouped by aseprite file,
+    so each file is only opened once."""
+    jobs_by_file: Dict[Path, List[ExportJob]] = {}
+    for job in jobs:
+        jobs_by_file.setdefault(job.aseprite_file_path, []).append(job)
+
+    return {
+        "files": [
+            {
+                "filename": str(path),
+                "jobs": [
+                    {
+                        "script": str(_get_script_path(path_params, job.script_name)),
+                        "params": {
+                            key: format_param_value(value)
+                            for key, value in _get_lua_params(
+                                job, job.get_dest(path_params.root_dir)
+                            ).items()
+                        },
+                    }
+                    for job in file_jobs
+                ],
+            }
+            for path, file_jobs in jobs_by_file.items()
+        ]
+    }
+
+
+def shard_jobs(jobs: List[ExportJob], num_shards: int) -> List[List[ExportJob]]:
+    """Split the jobs into at most num_shards groups of similar total frames,
+    keeping each aseprite file's jobs together."""
+    jobs_by_file: Dict[Path, List[ExportJob]] = {}
+    for job in jobs:
+        jobs_by_file.setdefault(job.aseprite_file_path, []).append(job)
+
+    shards = [[] for _ in range(min(num_shards, len(jobs_by_file)))]
+    shard_sizes = [0 for _ in shards]
+    for file_jobs in sorted(jobs_by_file.values(), key=_get_total_frames, reverse=True):
+        smallest = shard_sizes.index(min(shard_sizes))
+        shards[smallest].extend(file_jobs)
+        shard_sizes[smallest] += _get_total_frames(file_jobs)
+    return shards
+
+
+def _get_total_frames(jobs: List[ExportJob]) -> int:
+    return sum(job.num_frames for job in jobs)
+
+
+async def _run_export_manifest(
+    jobs: List[ExportJob],
+    path_params: "AsepritePathParams",
+    scheduler: ExportScheduler,
+):
+    """Run the jobs in a few long-lived aseprite processes, one per parallel
+    export allowed, rather than starting aseprite for every job."""
+    for script_name in {job.script_name for job in jobs} | {EXPORT_DRIVER_LUA_PATH}:
+        supply_lua_script(path=_get_script_path(path_params, script_name))
+
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        runs = []
+        for i, shard in enumerate(shard_jobs(jobs, scheduler.max_parallel)):
+            manifest_path = Path(manifest_dir) / f"manifest{i}.json"
+            manifest_path.write_text(json.dumps(make_manifest(shard, path_params)))
+            runs.append(
+                ScriptRun(
+                    script_path=_get_script_path(path_params, EXPORT_DRIVER_LUA_PATH),
+                    description=f"export manifest {i}",
+                    lua_params={"manifest": manifest_path.absolute()},
+                    size=_get_total_frames(shard),
+                    num_jobs=len(shard),
+                )
+            )
+        await scheduler.run_all(runs)
+
+    for job in jobs:
+        if not job.get_dest(path_params.root_dir).exists():
+            logger.error(f"Export of {job.dest_name} failed.")
+
+
+async def _run_lua_exports(
+    jobs: List[ExportJob],
+    path_params: "AsepritePathParams",
+    scheduler: ExportScheduler,
+):
+    """Run each job in its own aseprite process."""
+    for script_name in {job.script_name for job in jobs}:
+        supply_lua_script(path=_get_script_path(path_params, script_name))
+
+    results = await scheduler.run_all(
+        [
+            ScriptRun(
+                script_path=_get_script_path(path_params, job.script_name),
+                description=job.dest_name,
+                lua_params=_get_lua_params(job, job.get_dest(path_params.root_dir)),
+                size=job.num_frames,
+            )
+            for job in jobs
+        ]
+    )
+    for job, succeeded in zip(jobs, results):
+        if succeeded and not job.get_dest(path_params.root_dir).exists():
+            logger.error(
+                f"Exported spritesheet {job.dest_name} not found, "
+                f"although no error from aseprite."
+            )
+
+
+def _get_lua_params(job: ExportJob, dest: Path) -> dict:
+    return {
+        "filename": job.aseprite_file_path,
+        "dest": dest,
+        "startFrame": job.start + 1,
+        "endFrame": job.end + 1,
+        **job.lua_params,
+    }
+
+
+def _get_script_path(path_params: "AsepritePathParams", script_name: str) -> Path:
+    return (path_params.exe_dir / ASEPRITE_LUA_SCRIPTS_FOLDER / script_name).absolute()
+
+
+def _delete_paths_from_glob(file_index: FileIndex, paths_glob: str):
+    """Delete paths matching the glob"""
+    old_paths = file_index.glob(paths.SPRITES_FOLDER, paths_glob)
+    for old_path in old_paths:
+        file_index.delete(old_path)
@@ -1,31 +1,39 @@
 from collections import defaultdict
-from typing import List
+from typing import List, Union, TYPE_CHECKING
 
-from rivals_workshop_assistant.aseprite_handling import LayerChunk
 from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
     RawAsepriteFile,
 )
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.layer_index import (
+    LayerIndex,
+    LayerRole,
+    SPLIT,
+    OPT,
+    HURTBOX,
+    HURTMASK,
+    NOHURT,
+    NORMAL_LAYER_TYPE,
+    GROUP_LAYER_TYPE,
+    aseprite_layer_is_visible,
+)
 
-SPLIT = "SPLIT"
-OPT = "OPT"
-HURTBOX = "HURTBOX"
-HURTMASK = "HURTMASK"
-
-NORMAL_LAYER_TYPE = 0
-GROUP_LAYER_TYPE = 1
-
-
-def aseprite_layer_is_visible(layer: LayerChunk) -> bool:
-    #  See visibility flag
-    #  https://github.com/aseprite/aseprite/blob/main/docs/ase-file-specs.md#layer-chunk-0x2004
-    return layer.flags % 2 == 1
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling.metadata import (
+        AsepriteMetadata,
+    )
 
 
 class AsepriteLayers:
     """Groups types of layers in assistant aseprite files"""
 
     def __init__(
-        self, normals: List = None, hurtbox=None, hurtmask=None, splits=None, opts=None
+        self,
+        normals: List = None,
+        hurtbox=None,
+        hurtmask=None,
+        splits=None,
+        opts=None,
+        indexed_layers: LayerIndex = None,
     ):
         if normals is None:
             normals = []
@@ -41,41 +49,40 @@ class AsepriteLayers:
             opts = []
         self.opts = opts
 
+        # Shared with the file, for the lua indices of the layers.
+        self.indexed_layers = indexed_layers
+
     @classmethod
-    def from_file(cls, file_data: RawAsepriteFile):
+    def from_file(cls, file_data: Union[RawAsepriteFile, "AsepriteMetadata"]):
+        return cls.from_indexed_layers(file_data.indexed_layers)
+
+    @classmethod
+    def from_indexed_layers(cls, indexed_layers: LayerIndex):
         normals = []
         hurtbox = None
         hurtmask = None
         splits = defaultdict(list)
         opts = defaultdict(list)
 
-        layers = [
-            layer for layer in file_data.layers if layer.layer_type == NORMAL_LAYER_TYPE
-        ]
-        for (i, layer) in enumerate(layers):
-            layer.layer_index = i  # remove the layer groups from the ordering.
-
-        layers = [layer for layer in layers if aseprite_layer_is_visible(layer)]
-
-        for layer in layers:
-            name: str = layer.name
-            if name.startswith(f"{SPLIT}("):
-                split_name = name.split(f"{SPLIT}(")[1].split(")")[0]
-                splits[split_name].append(layer)
-            elif name.startswith(f"{OPT}("):
-                opt_name = name.split(f"{OPT}(")[1].split(")")[0]
-                opts[opt_name].append(layer)
-            elif name == HURTBOX:
-                hurtbox = layer
-            elif name == HURTMASK:
-                hurtmask = layer
+        for entry in indexed_layers:
+            if entry.role in (LayerRole.GROUP, LayerRole.OTHER) or not entry.is_visible:
+                continue
+            if entry.role == LayerRole.SPLIT:
+                splits[entry.role_name].append(entry.layer)
+            elif entry.role == LayerRole.OPT:
+                opts[entry.role_name].append(entry.layer)
+            elif entry.role == LayerRole.HURTBOX:
+                hurtbox = entry.layer
+            elif entry.role == LayerRole.HURTMASK:
+                hurtmask = entry.layer
             # todo add optional and either here as elifs
             else:
-                normals.append(layer)
+                normals.append(entry.layer)
         return cls(
             normals=normals,
             hurtbox=hurtbox,
             hurtmask=hurtmask,
             splits=splits,
             opts=opts,
+            indexed_layers=indexed_layers,
         )
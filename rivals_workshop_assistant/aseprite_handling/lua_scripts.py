@@ -1,3 +1,4 @@
+import hashlib
 from pathlib import Path
 
 from rivals_workshop_assistant import paths
@@ -5,11 +6,14 @@ from rivals_workshop_assistant.file_handling import create_file
 
 #  language=lua
 EXPORT_ASEPRITE = """\
-local sprite = app.open(app.params["filename"])
+-- The export driver passes the job's params and a copy of the already open sprite.
+local params = JOB_PARAMS or app.params
+local sprite = JOB_SPRITE or app.open(params["filename"])
+app.activeSprite = sprite
     
-local startFrame = tonumber(app.params["startFrame"])
-local endFrame = tonumber(app.params["endFrame"])
-local scale = tonumber(app.params["scale"])
+local startFrame = tonumber(params["startFrame"])
+local endFrame = tonumber(params["endFrame"])
+local scale = tonumber(params["scale"])
 
 local function splitInts(string, delimiter)
     local result = {}
@@ -48,7 +52,7 @@ local function getLayers()
     return flattenLayers(sprite.layers)
 end
 
-local targetLayerIndices = splitInts(app.params["targetLayers"], ",")
+local targetLayerIndices = splitInts(params["targetLayers"], ",")
 
 
 for layerIndex, layer in ipairs(getLayers()) do
@@ -84,14 +88,17 @@ app.command.ExportSpriteSheet {
     ui=false,
     askOverwrite=false,
     type=SpriteSheetType.HORIZONTAL,
-    textureFilename=app.params["dest"],
+    textureFilename=params["dest"],
 }
 """
 
 #  language=lua
 CREATE_HURTBOX = """\
-local sprite = app.open(app.params["filename"])
-local scale = tonumber(app.params["scale"])
+-- The export driver passes the job's params and a copy of the already open sprite.
+local params = JOB_PARAMS or app.params
+local sprite = JOB_SPRITE or app.open(params["filename"])
+app.activeSprite = sprite
+local scale = tonumber(params["scale"])
 
 app.command.ChangePixelFormat{ui=false, format="rgb", dithering="none"}
 
@@ -170,12 +177,12 @@ local function convertLayerToSelections(layer)
     return selections
 end
 
-local targetLayerIndices = splitInts(app.params["targetLayers"], ",")
-local hurtboxLayerIndex = tonumber(app.params["hurtboxLayer"])
-local hurtmaskLayerIndex = tonumber(app.params["hurtmaskLayer"])
+local targetLayerIndices = splitInts(params["targetLayers"], ",")
+local hurtboxLayerIndex = tonumber(params["hurtboxLayer"])
+local hurtmaskLayerIndex = tonumber(params["hurtmaskLayer"])
 
-local startFrame = tonumber(app.params["startFrame"])
-local endFrame = tonumber(app.params["endFrame"])
+local startFrame = tonumber(params["startFrame"])
+local endFrame = tonumber(params["endFrame"])
 
 -- Deletes frames that aren't in the given range.
 local _irrelevantFrames = {}
@@ -317,13 +324,40 @@ app.command.ExportSpriteSheet {
     ui=false,
     askOverwrite=false,
     type=SpriteSheetType.HORIZONTAL,
-    textureFilename=app.params["dest"],
+    textureFilename=params["dest"],
 }
 """
 
+#  language=lua
+EXPORT_DRIVER = """\
+-- Runs every job in a manifest, opening each aseprite file only once.
+local manifestFile = io.open(app.params["manifest"], "r")
+local manifest = json.decode(manifestFile:read("a"))
+manifestFile:close()
+
+for _, asepriteFile in ipairs(manifest.files) do
+    local source = app.open(asepriteFile.filename)
+    if source == nil then
+        print("Could not open " .. asepriteFile.filename)
+    else
+        for _, job in ipairs(asepriteFile.jobs) do
+            JOB_PARAMS = job.params
+            JOB_SPRITE = Sprite(source)
+            local succeeded, err = pcall(dofile, job.script)
+            if not succeeded then
+                print("Failed to export " .. job.params["dest"] .. ": " .. tostring(err))
+            end
+            JOB_SPRITE:close()
+        end
+        source:close()
+    end
+end
+"""
+
 LUA_SCRIPTS = {
     "export_aseprite": EXPORT_ASEPRITE,
     "create_hurtbox": CREATE_HURTBOX,
+    "export_driver": EXPORT_DRIVER,
 }
 
 
@@ -333,6 +367,12 @@ def delete_lua_scripts(exe_dir: Path):
         path.unlink()
 
 
+def get_lua_script_version(script_name: str) -> str:
+    """Changes whenever the script does."""
+    script_content = LUA_SCRIPTS[Path(script_name).stem]
+    return hashlib.blake2b(script_content.encode(), digest_size=8).hexdigest()
+
+
 def supply_lua_script(path: Path):
     script_name = path.stem
     script_content = LUA_SCRIPTS[script_name]
@@ -341,3 +381,4 @@ def supply_lua_script(path: Path):
 
 EXPORT_ASEPRITE_LUA_PATH = "export_aseprite.lua"
 CREATE_HURTBOX_LUA_PATH = "create_hurtbox.lua"
+EXPORT_DRIVER_LUA_PATH = "export_driver.lua"
@@ -0,0 +1,267 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple, Dict, Optional
+
+from loguru import logger
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+    LayerChunk,
+    LayerGroupChunk,
+    LayerIndex,
+    combine_frame_hashes,
+    combine_cel_hashes,
+    combine_structure_hashes,
+    ParseProfile,
+)
+from rivals_workshop_assistant.aseprite_handling.tags import AsepriteTag
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+LAYER_FIELDS = (
+    "flags",
+    "layer_type",
+    "layer_child_level",
+    "default_width",
+    "default_height",
+    "blend_mode",
+    "opacity",
+    "name",
+    "layer_index",
+    "user_data",
+)
+
+
+def _layer_to_dict(layer: LayerChunk) -> dict:
+    return {field: getattr(layer, field) for field in LAYER_FIELDS}
+
+
+def _layer_from_dict(layer_dict: dict) -> LayerChunk:
+    layer = LayerChunk.__new__(LayerChunk)
+    for field in LAYER_FIELDS:
+        setattr(layer, field, layer_dict[field])
+    if layer.layer_type & 1 == 1:
+        return LayerGroupChunk(layer)
+    return layer
+
+
+class AsepriteMetadata:
+    """Everything the assistant reads from an aseprite file, without its pixels.
+    Stands in for a RawAsepriteFile, and is small enough to cache between runs."""
+
+    def __init__(
+        self,
+        num_frames: int,
+        tags: List[AsepriteTag],
+        layers: List[LayerChunk],
+        frame_offsets: List[Tuple[int, int]],
+        frame_hashes: List[bytes],
+        sprite_hash: bytes,
+        layer_hashes: List[bytes],
+        cel_hashes: List[Dict[int, bytes]],
+    ):
+        self.num_frames = num_frames
+        self.tags = tags
+        self.layers = layers
+        self.indexed_layers = LayerIndex(layers)
+        self.frame_offsets = frame_offsets
+        self.frame_hashes = frame_hashes
+        self.sprite_hash = sprite_hash
+        self.layer_hashes = layer_hashes
+        self.cel_hashes = cel_hashes
+
+    @classmethod
+    def from_file(cls, file_data: RawAsepriteFile):
+        num_frames = file_data.get_num_frames()
+        sprite_hash, layer_hashes = file_data.get_structure_hashes()
+        return cls(
+            num_frames=num_frames,
+            tags=file_data.get_tags(),
+            layers=file_data.layers,
+            frame_offsets=[(frame.offset, frame.size) for frame in file_data.frames],
+            frame_hashes=[file_data.get_frame_hash(i) for i in range(num_frames)],
+            sprite_hash=sprite_hash,
+            layer_hashes=layer_hashes,
+            cel_hashes=[file_data.get_cel_hashes(i) for i in range(num_frames)],
+        )
+
+    @property
+    def layer_tree(self) -> Tuple[LayerChunk, ...]:
+        return self.indexed_layers.tree
+
+    def get_tags(self) -> List[AsepriteTag]:
+        return self.tags
+
+    def get_num_frames(self) -> int:
+        return self.num_frames
+
+    def get_frames_hash(self, start: int, end: int) -> str:
+        return combine_frame_hashes(self.frame_hashes[start : end + 1])
+
+    def get_layers_hash(self, start: int, end: int, layers: List[LayerChunk]) -> str:
+        return combine_cel_hashes(
+            self.cel_hashes[start : end + 1],
+            layer_indices=[layer.layer_index for layer in layers],
+        )
+
+    def get_structure_hash(self, layers: List[LayerChunk]) -> str:
+        return combine_structure_hashes(
+            self.sprite_hash, self.layer_hashes, self.indexed_layers, layers
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "num_frames": self.num_frames,
+            "tags": [[tag.name, tag.start, tag.end, tag.color] for tag in self.tags],
+            "layers": [_layer_to_dict(layer) for layer in self.layers],
+            "frame_offsets": self.frame_offsets,
+            "frame_hashes": [frame_hash.hex() for frame_hash in self.frame_hashes],
+            "sprite_hash": self.sprite_hash.hex(),
+            "layer_hashes": [layer_hash.hex() for layer_hash in self.layer_hashes],
+            "cel_hashes": [
+                {layer_index: cel_hash.hex() for layer_index, cel_hash in cels.items()}
+                for cels in self.cel_hashes
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, metadata_dict: dict):
+        return cls(
+            num_frames=metadata_dict["num_frames"],
+            tags=[
+                AsepriteTag(
+                    name=name,
+                    start=start,
+                    end=end,
+                    # Unnamed colors are stored as [r, g, b]
+                    color=color if isinstance(color, str) else tuple(color),
+                )
+                for name, start, end, color in metadata_dict["tags"]
+            ],
+            layers=[_layer_from_dict(layer) for layer in metadata_dict["layers"]],
+            frame_offsets=[tuple(offset) for offset in metadata_dict["frame_offsets"]],
+            frame_hashes=[
+                bytes.fromhex(frame_hash)
+                for frame_hash in metadata_dict["frame_hashes"]
+            ],
+            sprite_hash=bytes.fromhex(metadata_dict["sprite_hash"]),
+            layer_hashes=[
+                bytes.fromhex(layer_hash)
+                for layer_hash in metadata_dict["layer_hashes"]
+            ],
+            cel_hashes=[
+                # JSON keys are always strings
+                {
+                    int(layer_index): bytes.fromhex(cel_hash)
+                    for layer_index, cel_hash in cels.items()
+                }
+                for cels in metadata_dict["cel_hashes"]
+            ],
+        )
+
+
+def read_metadata(path: Path) -> AsepriteMetadata:
+    with RawAsepriteFile.from_path(path, profile=ParseProfile.SCRIPTS) as file_data:
+        return AsepriteMetadata.from_file(file_data)
+
+
+FILENAME = ".aseprite_cache"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increment when the stored metadata changes shape, to discard old caches.
+CACHE_VERSION = 7
+
+
+class AsepriteMetadataCache:
+    """Metadata of previously read aseprite files.
+    An entry is used only while the file's size and modified time are unchanged,
+    so unchanged files never need to be opened."""
+
+    def __init__(self, entries: Dict[str, dict] = None):
+        if entries is None:
+            entries = {}
+        self.entries = entries
+
+    def has(self, path: Path, stat: os.stat_result) -> bool:
+        entry = self.entries.get(path.as_posix(), None)
+        return (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        )
+
+    def get(self, path: Path, stat: os.stat_result) -> Optional[AsepriteMetadata]:
+        if not self.has(path, stat):
+            return None
+        return AsepriteMetadata.from_dict(self.entries[path.as_posix()]["metadata"])
+
+    def put(self, path: Path, stat: os.stat_result, metadata: AsepriteMetadata):
+        self.entries[path.as_posix()] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "metadata": metadata.to_dict(),
+        }
+
+    def load(self, path: Path, stat: os.stat_result = None) -> AsepriteMetadata:
+        """Get the file's metadata from the cache, reading the file if needed."""
+        if stat is None:
+            stat = path.stat()
+        metadata = self.get(path, stat)
+        if metadata is None:
+            metadata = read_metadata(path)
+            self.put(path, stat, metadata)
+        return metadata
+
+    def preload(self, paths: List[Path], stats: List[os.stat_result], workers: int):
+        """Read the metadata of every uncached file, using a pool of processes."""
+        missing = [
+            (path, stat)
+            for path, stat in zip(paths, stats)
+            if not self.has(path, stat)
+        ]
+        workers = min(workers, len(missing))
+        if workers <= 1:
+            return  # Not worth starting processes. Files are read when needed.
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (path, stat, executor.submit(read_metadata, path))
+                for path, stat in missing
+            ]
+            for path, stat, future in futures:
+                try:
+                    self.put(path, stat, future.result())
+                except Exception as e:
+                    # Leave it uncached, so it fails where it's used if it's broken.
+                    logger.warning(f"Could not read aseprite {path} in parallel: {e}")
+
+    def prune(self, keep: List[Path]):
+        """Forget files that aren't in keep, such as deleted files."""
+        keep_keys = {path.as_posix() for path in keep}
+        self.entries = {
+            key: entry for key, entry in self.entries.items() if key in keep_keys
+        }
+
+
+def read_cache(root_dir: Path) -> AsepriteMetadataCache:
+    """Controller"""
+    try:
+        cache_dict = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return AsepriteMetadataCache()
+    except ValueError:
+        logger.warning(f"Aseprite cache is malformed and being ignored: {PATH}")
+        return AsepriteMetadataCache()
+
+    if cache_dict.get("version", None) != CACHE_VERSION:
+        return AsepriteMetadataCache()
+    return AsepriteMetadataCache(entries=cache_dict["files"])
+
+
+def save_cache(root_dir: Path, cache: AsepriteMetadataCache):
+    """Controller"""
+    (root_dir / PATH).parent.mkdir(parents=True, exist_ok=True)
+    (root_dir / PATH).write_text(
+        json.dumps({"version": CACHE_VERSION, "files": cache.entries})
+    )
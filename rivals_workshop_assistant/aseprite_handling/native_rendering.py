@@ -0,0 +1,301 @@
+"""Renders spritesheets straight from parsed aseprite files, without launching
+aseprite. Anything it can't reproduce exactly raises UnsupportedByNativeRenderer,
+so the caller can fall back to aseprite."""
+
+from typing import List, TYPE_CHECKING, Tuple, Optional
+
+import numpy as np
+from PIL import Image
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+    CelChunk,
+    LayerChunk,
+    LayerGroupChunk,
+    UnsupportedCelError,
+    RGBA_COLOR_DEPTH,
+)
+from rivals_workshop_assistant.aseprite_handling.layers import (
+    LayerRole,
+    NORMAL_LAYER_TYPE,
+    HURTBOX,
+    HURTMASK,
+    NOHURT,
+)
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    EXPORT_ASEPRITE_LUA_PATH,
+    CREATE_HURTBOX_LUA_PATH,
+)
+
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling.exporting import ExportJob
+
+NORMAL_BLEND_MODE = 0
+REFERENCE_LAYER_FLAG = 64
+LAYER_OPACITY_IS_VALID_FLAG = 1
+
+HURTBOX_COLOR = (0, 255, 0, 255)
+
+
+class UnsupportedByNativeRenderer(Exception):
+    """The file uses a feature that only aseprite can render."""
+
+
+def render_export_job(job: "ExportJob", file_data: RawAsepriteFile) -> Image.Image:
+    if job.script_name == EXPORT_ASEPRITE_LUA_PATH:
+        render = render_strip
+    elif job.script_name == CREATE_HURTBOX_LUA_PATH:
+        render = render_hurtbox_strip
+    else:
+        raise UnsupportedByNativeRenderer(f"{job.script_name} has no native version")
+    return render(
+        file_data=file_data,
+        start=job.start,
+        end=job.end,
+        target_layers=get_layers_from_lua_indices(
+            file_data, job.lua_params["targetLayers"]
+        ),
+        scale=job.lua_params["scale"],
+    )
+
+
+def get_layers_from_lua_indices(
+    file_data: RawAsepriteFile, lua_indices: List[int]
+) -> List[LayerChunk]:
+    """Lua indices count only non-group layers, starting from 1."""
+    return file_data.indexed_layers.from_lua_indices(lua_indices)
+
+
+def render_strip(
+    file_data: RawAsepriteFile,
+    start: int,
+    end: int,
+    target_layers: List[LayerChunk],
+    scale: int,
+) -> Image.Image:
+    """Render frames start to end (inclusive) side by side,
+    drawing only the target layers, then scale with nearest neighbour."""
+    if file_data.header.color_depth != RGBA_COLOR_DEPTH:
+        raise UnsupportedByNativeRenderer(f"color depth {file_data.header.color_depth}")
+    width, height = file_data.header.width, file_data.header.height
+    drawn_layers = _get_drawn_layers(file_data, target_layers)
+
+    strip = Image.new("RGBA", (width * (end - start + 1), height))
+    rendered_frames = {}
+    for strip_index, frame_index in enumerate(range(start, end + 1)):
+        frame_key = _get_frame_key(file_data, frame_index, drawn_layers)
+        if frame_key not in rendered_frames:
+            rendered_frames[frame_key] = render_frame(
+                file_data, frame_index, drawn_layers
+            )
+        strip.paste(rendered_frames[frame_key], (strip_index * width, 0))
+
+    if scale != 1:
+        strip = strip.resize((strip.width * scale, strip.height * scale), Image.NEAREST)
+    return strip
+
+
+def render_hurtbox_strip(
+    file_data: RawAsepriteFile,
+    start: int,
+    end: int,
+    target_layers: List[LayerChunk],
+    scale: int,
+) -> Image.Image:
+    """Render the hurtbox of frames start to end (inclusive) side by side.
+    A hurtbox is green wherever the target layers have pixels, except:
+    - NOHURT layers are left out.
+    - A HURTBOX layer's pixels replace the hurtbox in frames it has a cel in.
+    - A HURTMASK layer's pixels are removed from the hurtbox."""
+    width, height = file_data.header.width, file_data.header.height
+    # Found by name, like the hurtbox script does.
+    hurtbox_layer = file_data.indexed_layers.get_last_with_role(LayerRole.HURTBOX)
+    hurtmask_layer = file_data.indexed_layers.get_last_with_role(LayerRole.HURTMASK)
+    content_layers = [
+        layer
+        for layer, _ in _get_visible_target_layers(
+            file_data,
+            [
+                layer
+                for layer in target_layers
+                if layer.name not in (HURTBOX, HURTMASK) and not _is_nohurt(layer)
+            ],
+        )
+        if _get_layer_opacity(file_data, layer) > 0
+    ]
+
+    key_layers = content_layers + [
+        layer for layer in (hurtbox_layer, hurtmask_layer) if layer is not None
+    ]
+    masks = []
+    masks_by_key = {}
+    for frame_index in range(start, end + 1):
+        frame_key = _get_frame_key(file_data, frame_index, key_layers)
+        if frame_key in masks_by_key:
+            masks.append(masks_by_key[frame_key])
+            continue
+
+        mask = np.zeros((height, width), dtype=bool)
+        for layer in content_layers:
+            cel = file_data.get_cel(layer, frame_index)
+            if cel is not None and cel.opacity > 0:
+                _add_cel_mask(file_data, mask, layer, frame_index)
+
+        if _get_layer_cel(file_data, hurtbox_layer, frame_index) is not None:
+            mask[:] = False
+            _add_cel_mask(file_data, mask, hurtbox_layer, frame_index)
+
+        if _get_layer_cel(file_data, hurtmask_layer, frame_index) is not None:
+            hurtmask = np.zeros_like(mask)
+            _add_cel_mask(file_data, hurtmask, hurtmask_layer, frame_index)
+            mask &= ~hurtmask
+        masks.append(mask)
+        masks_by_key[frame_key] = mask
+
+    strip_mask = np.concatenate(masks, axis=1)
+    strip_mask = strip_mask.repeat(scale, axis=0).repeat(scale, axis=1)
+    strip = np.zeros(strip_mask.shape + (4,), dtype=np.uint8)
+    strip[strip_mask] = HURTBOX_COLOR
+    return Image.fromarray(strip, "RGBA")
+
+
+def render_frame(
+    file_data: RawAsepriteFile, frame_index: int, drawn_layers: List[LayerChunk]
+) -> Image.Image:
+    canvas = Image.new("RGBA", (file_data.header.width, file_data.header.height))
+    for layer in drawn_layers:
+        cel = file_data.get_cel(layer, frame_index)
+        if cel is None or _get_opacity(file_data, layer, cel) == 0:
+            continue
+        _composite(
+            canvas,
+            image=Image.fromarray(
+                _get_cel_pixels(file_data, layer, frame_index), "RGBA"
+            ),
+            x=cel.x_pos,
+            y=cel.y_pos,
+        )
+    return canvas
+
+
+def _get_frame_key(
+    file_data: RawAsepriteFile, frame_index: int, layers: List[LayerChunk]
+) -> tuple:
+    """Frames with the same key have the same cels on the layers, such as when
+    they're linked, so they only need to be drawn once."""
+    cel_hashes = file_data.get_cel_hashes(frame_index)
+    return tuple(cel_hashes.get(layer.layer_index) for layer in layers)
+
+
+def _get_drawn_layers(
+    file_data: RawAsepriteFile, target_layers: List[LayerChunk]
+) -> List[LayerChunk]:
+    """The target layers that aseprite would draw, bottom to top."""
+    drawn_layers = []
+    for layer, groups in _get_visible_target_layers(file_data, target_layers):
+        for group in groups:
+            if group.blend_mode != NORMAL_BLEND_MODE or _has_group_opacity(group):
+                raise UnsupportedByNativeRenderer(f"group {group.name} blending")
+        if layer.blend_mode != NORMAL_BLEND_MODE:
+            raise UnsupportedByNativeRenderer(f"blend mode {layer.blend_mode}")
+        drawn_layers.append(layer)
+    return drawn_layers
+
+
+def _get_visible_target_layers(
+    file_data: RawAsepriteFile, target_layers: List[LayerChunk]
+) -> List[Tuple[LayerChunk, List[LayerGroupChunk]]]:
+    """The target layers that aren't in hidden groups, bottom to top,
+    with the groups containing them."""
+    target_indices = {layer.layer_index for layer in target_layers}
+    visible_layers = []
+    for entry in file_data.indexed_layers:
+        if entry.role == LayerRole.GROUP or entry.file_index not in target_indices:
+            continue
+        if entry.is_hidden_by_group:
+            continue  # Hidden groups hide their contents.
+
+        layer = entry.layer
+        if layer.layer_type != NORMAL_LAYER_TYPE:
+            raise UnsupportedByNativeRenderer(f"layer type {layer.layer_type}")
+        if layer.flags & REFERENCE_LAYER_FLAG:
+            raise UnsupportedByNativeRenderer(f"reference layer {layer.name}")
+        visible_layers.append((layer, list(entry.groups)))
+    return visible_layers
+
+
+def _is_nohurt(layer: LayerChunk) -> bool:
+    return layer.name.startswith(NOHURT) or NOHURT in layer.user_data
+
+
+def _get_layer_cel(
+    file_data: RawAsepriteFile, layer: Optional[LayerChunk], frame_index: int
+) -> Optional[CelChunk]:
+    if layer is None:
+        return None
+    return file_data.get_cel(layer, frame_index)
+
+
+def _get_cel_pixels(
+    file_data: RawAsepriteFile, layer: LayerChunk, frame_index: int
+) -> np.ndarray:
+    try:
+        return file_data.cel_pixels(layer, frame_index)
+    except UnsupportedCelError as e:
+        raise UnsupportedByNativeRenderer(str(e))
+
+
+def _add_cel_mask(
+    file_data: RawAsepriteFile,
+    mask: np.ndarray,
+    layer: LayerChunk,
+    frame_index: int,
+):
+    """Mark the cel's non-transparent pixels in the mask, clipping it to the mask."""
+    cel = file_data.get_cel(layer, frame_index)
+    alpha = _get_cel_pixels(file_data, layer, frame_index)[:, :, 3]
+    cel_height, cel_width = alpha.shape
+
+    x, y = cel.x_pos, cel.y_pos
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + cel_width, mask.shape[1])
+    bottom = min(y + cel_height, mask.shape[0])
+    if right <= left or bottom <= top:
+        return
+    mask[top:bottom, left:right] |= (
+        alpha[top - y : bottom - y, left - x : right - x] > 0
+    )
+
+
+def _has_group_opacity(group: LayerGroupChunk) -> bool:
+    # Older aseprite versions save groups with an opacity of 0, and ignore it.
+    return group.opacity not in (0, 255)
+
+
+def _get_layer_opacity(file_data: RawAsepriteFile, layer: LayerChunk):
+    if file_data.header.flags & LAYER_OPACITY_IS_VALID_FLAG:
+        return layer.opacity
+    return 255
+
+
+def _get_opacity(file_data: RawAsepriteFile, layer: LayerChunk, cel: CelChunk):
+    """Either 0 or 255. Aseprite rounds partial opacity differently from PIL's
+    blending, so it's left to aseprite."""
+    opacities = (cel.opacity, _get_layer_opacity(file_data, layer))
+    if 0 in opacities:
+        return 0
+    if opacities != (255, 255):
+        raise UnsupportedByNativeRenderer(f"partial opacity on {layer.name}")
+    return 255
+
+
+def _composite(canvas: Image.Image, image: Image.Image, x: int, y: int):
+    """Alpha composite the image onto the canvas, clipping it to the canvas."""
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + image.width, canvas.width)
+    bottom = min(y + image.height, canvas.height)
+    if right <= left or bottom <= top:
+        return
+    canvas.alpha_composite(
+        image, dest=(left, top), source=(left - x, top - y, right - x, bottom - y)
+    )
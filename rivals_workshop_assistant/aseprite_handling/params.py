@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
+
+from rivals_workshop_assistant.file_index import FileIndex
 
 
 @dataclass
@@ -7,6 +10,11 @@ class AsepritePathParams:
     exe_dir: Path
     root_dir: Path
     aseprite_program_path: Path
+    file_index: Optional[FileIndex] = None  # Made from the root dir if not given.
+
+    def __post_init__(self):
+        if self.file_index is None:
+            self.file_index = FileIndex(self.root_dir)
 
 
 @dataclass
@@ -14,3 +22,8 @@ class AsepriteConfigParams:
     has_small_sprites: bool = False
     hurtboxes_enabled: bool = False
     is_ssl: bool = False
+    native_exports: bool = False
+    batch_exports: bool = False
+    export_parallelism: int = 0  # 0 for the number of CPU cores
+    export_timeout: float = 120
+    export_retries: int = 1
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, TYPE_CHECKING
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling.params import (
+        AsepritePathParams,
+        AsepriteConfigParams,
+    )
+
+
+@dataclass
+class ScriptRun:
+    """A single run of aseprite with a lua script."""
+
+    script_path: Path
+    description: str
+    lua_params: dict = field(default_factory=dict)
+    size: int = 1  # Relative cost, so bigger runs can be started first.
+    num_jobs: int = 1  # Spritesheets made by the run, to scale the timeout.
+
+
+class _TransientFailure(Exception):
+    """A failure that might not happen again, so is worth retrying."""
+
+
+class ExportScheduler:
+    """Runs aseprite scripts, with a limit on how many run at once.
+    Hung aseprite processes are stopped after a timeout,
+    and transient failures are retried."""
+
+    def __init__(
+        self,
+        aseprite_program_path: Path,
+        max_parallel: int,
+        timeout: float,
+        retries: int,
+    ):
+        self.aseprite_program_path = aseprite_program_path
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+        self.retries = retries
+        self._semaphore = asyncio.Semaphore(max_parallel)
+
+    @classmethod
+    def from_params(
+        cls,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+    ):
+        """Must be made inside the running event loop."""
+        max_parallel = config_params.export_parallelism
+        if max_parallel <= 0:
+            max_parallel = os.cpu_count() or 1
+        return cls(
+            aseprite_program_path=path_params.aseprite_program_path,
+            max_parallel=max_parallel,
+            timeout=config_params.export_timeout,
+            retries=config_params.export_retries,
+        )
+
+    async def run_all(self, runs: List[ScriptRun]) -> List[bool]:
+        """Run all, largest first so the last to finish are the quick ones.
+        Returns if each run succeeded, in the order given."""
+        largest_first = sorted(runs, key=lambda run: run.size, reverse=True)
+        results = await asyncio.gather(*[self.run(run) for run in largest_first])
+        succeeded = {id(run): result for run, result in zip(largest_first, results)}
+        return [succeeded[id(run)] for run in runs]
+
+    async def run(self, run: ScriptRun) -> bool:
+        """Returns if aseprite ran the script without error."""
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await self._run_once(run)
+                except _TransientFailure as e:
+                    logger.warning(f"{run.description}: {e}")
+                    if attempt < self.retries:
+                        logger.warning(f"Retrying {run.description}")
+            logger.error(f"Gave up on {run.description}")
+            return False
+
+    async def _run_once(self, run: ScriptRun) -> bool:
+        args = get_aseprite_args(self.aseprite_program_path, run)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            logger.error(f"Aseprite not found at {self.aseprite_program_path}")
+            return False
+        except PermissionError as e:
+            logger.error(repr(e))
+            return False
+        except OSError as e:
+            # Such as too many processes already running.
+            raise _TransientFailure(f"Could not start aseprite. {e!r}")
+
+        timeout = self.timeout * run.num_jobs
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise _TransientFailure(f"Aseprite stopped after hanging for {timeout}s")
+
+        logger.debug(f"Ran lua script: {args}")
+        if stdout:
+            logger.debug(f"[stdout] {stdout}")
+        if proc.returncode < 0:
+            # Killed by a signal, such as from running out of memory.
+            raise _TransientFailure(f"Aseprite was killed ({proc.returncode})")
+        if proc.returncode != 0:
+            logger.error(f"Lua script command failed.")
+            if stderr:
+                logger.error(f"[stderr] {stderr.decode()}")
+            return False
+        return True
+
+
+def get_aseprite_args(aseprite_program_path: Path, run: ScriptRun) -> List[str]:
+    """Arguments to run aseprite with. No shell is used, so nothing is quoted."""
+    args = [str(aseprite_program_path), "-b"]
+    for key, value in run.lua_params.items():
+        args += ["-script-param", f"{key}={format_param_value(value)}"]
+    args += ["-script", str(run.script_path)]
+    return args
+
+
+def format_param_value(value) -> str:
+    if isinstance(value, list):
+        # Format list as `a,b,c` instead of `[a, b, c]` for easier parsing.
+        return ",".join(str(item) for item in value)
+    return str(value)
@@ -1,4 +1,6 @@
 class TagObject:
+    __slots__ = ("name", "start", "end")
+
     def __init__(self, name: str, start: int, end: int):
         self.name = name
         self.start = start
@@ -1,11 +1,10 @@
-from typing import Union, Tuple
+from typing import Union, Tuple, NamedTuple
 
 TagColor = Union[str, Tuple[int, int, int]]
 
 
-class AsepriteTag:
-    def __init__(self, name: str, start: int, end: int, color: TagColor):
-        self.name = name
-        self.start = start
-        self.end = end
-        self.color = color
+class AsepriteTag(NamedTuple):
+    name: str
+    start: int
+    end: int
+    color: TagColor
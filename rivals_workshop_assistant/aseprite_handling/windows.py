@@ -5,6 +5,8 @@ class Window(TagObject):
     """An attack window in an anim.
     Start and end are relative to the anim, not the aseprite file."""
 
+    __slots__ = ("gml",)
+
     def __init__(self, name: str, start: int, end: int):
         super().__init__(name, start, end)
         self.gml = self._make_gml()
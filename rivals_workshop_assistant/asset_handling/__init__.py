@@ -1,6 +1,7 @@
 import asyncio
 from pathlib import Path
 
+from rivals_workshop_assistant.file_index import FileIndex
 from rivals_workshop_assistant.script_handling.script_mod import Script
 from .asset_types import Asset, ASSET_TYPES
 from typing import List, Set
@@ -25,6 +26,8 @@ def _get_required_assets_for_script(script: Script) -> Set[Asset]:
     return assets
 
 
-async def save_assets(root_dir: Path, assets: Set[Asset]):
+async def save_assets(root_dir: Path, assets: Set[Asset], file_index: FileIndex = None):
     """Controller"""
-    await asyncio.gather(*[asset.supply(root_dir) for asset in assets])
+    if file_index is None:
+        file_index = FileIndex(root_dir)
+    await asyncio.gather(*[asset.supply(root_dir, file_index) for asset in assets])
@@ -4,6 +4,7 @@ import abc
 from typing import Set
 
 from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.file_index import FileIndex
 from .sprite_generation import generate_sprite_for_file_name
 
 
@@ -15,7 +16,7 @@ class Asset(abc.ABC):
     def get_from_text(cls, text) -> Set["Asset"]:
         raise NotImplementedError
 
-    async def supply(self, root_dir: Path) -> None:
+    async def supply(self, root_dir: Path, file_index: FileIndex = None) -> None:
         raise NotImplementedError
 
     def __eq__(self, other):
@@ -33,16 +34,19 @@ class Sprite(Asset):
         asset_strings = set(re.findall(pattern=cls._pattern, string=text))
         return set(Sprite(string) for string in asset_strings)
 
-    async def supply(self, root_dir: Path):
+    async def supply(self, root_dir: Path, file_index: FileIndex = None):
+        if file_index is None:
+            file_index = FileIndex(root_dir)
         file_name = self.asset_string
         if not file_name.endswith(".png"):
             file_name = file_name + ".png"
         path = root_dir / paths.SPRITES_FOLDER / file_name
-        if not path.exists():
+        if not file_index.exists(path):
             sprite = generate_sprite_for_file_name(file_name)
             if sprite:
                 path.parent.mkdir(parents=True, exist_ok=True)
                 sprite.save(path.as_posix())
+                file_index.add(path)
 
 
 ASSET_TYPES = [Sprite]
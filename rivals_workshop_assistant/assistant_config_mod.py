@@ -117,6 +117,56 @@ def get_is_ssl(assistant_config: dict):
     return assistant_config.get(IS_SSL_FIELD, IS_SSL_DEFAULT)
 
 
+ASEPRITE_PARSE_WORKERS_FIELD = "aseprite_parse_workers"
+ASEPRITE_PARSE_WORKERS_DEFAULT = 1
+
+
+def get_aseprite_parse_workers(assistant_config: dict) -> int:
+    return assistant_config.get(
+        ASEPRITE_PARSE_WORKERS_FIELD, ASEPRITE_PARSE_WORKERS_DEFAULT
+    )
+
+
+NATIVE_EXPORTS_FIELD = "native_exports"
+NATIVE_EXPORTS_DEFAULT = False
+
+
+def get_native_exports(assistant_config: dict) -> bool:
+    return assistant_config.get(NATIVE_EXPORTS_FIELD, NATIVE_EXPORTS_DEFAULT)
+
+
+BATCH_EXPORTS_FIELD = "batch_exports"
+BATCH_EXPORTS_DEFAULT = False
+
+
+def get_batch_exports(assistant_config: dict) -> bool:
+    return assistant_config.get(BATCH_EXPORTS_FIELD, BATCH_EXPORTS_DEFAULT)
+
+
+EXPORT_PARALLELISM_FIELD = "aseprite_export_parallelism"
+EXPORT_PARALLELISM_DEFAULT = 0
+
+
+def get_export_parallelism(assistant_config: dict) -> int:
+    return assistant_config.get(EXPORT_PARALLELISM_FIELD, EXPORT_PARALLELISM_DEFAULT)
+
+
+EXPORT_TIMEOUT_FIELD = "aseprite_export_timeout"
+EXPORT_TIMEOUT_DEFAULT = 120
+
+
+def get_export_timeout(assistant_config: dict) -> float:
+    return assistant_config.get(EXPORT_TIMEOUT_FIELD, EXPORT_TIMEOUT_DEFAULT)
+
+
+EXPORT_RETRIES_FIELD = "aseprite_export_retries"
+EXPORT_RETRIES_DEFAULT = 1
+
+
+def get_export_retries(assistant_config: dict) -> int:
+    return assistant_config.get(EXPORT_RETRIES_FIELD, EXPORT_RETRIES_DEFAULT)
+
+
 DEFAULT_CONFIG = f"""\
 # Format is <key name>: <value> (with a space after the : )
 # For example
@@ -178,6 +228,31 @@ DEFAULT_CONFIG = f"""\
     
 {IS_SSL_FIELD}: {IS_SSL_DEFAULT}
     # If the character is for SSL mode (doubles sprite size)
+
+{ASEPRITE_PARSE_WORKERS_FIELD}: {ASEPRITE_PARSE_WORKERS_DEFAULT}
+    # How many processes to use when reading changed aseprite files.
+    # Raising this to your number of CPU cores speeds up runs where many
+    # aseprite files changed, like after switching branches.
+
+{NATIVE_EXPORTS_FIELD}: {NATIVE_EXPORTS_DEFAULT}
+    # If spritesheets should be drawn without opening aseprite, when possible.
+    # Much faster, but experimental. Files using features it can't draw,
+    # like blend modes, are still exported by aseprite.
+
+{BATCH_EXPORTS_FIELD}: {BATCH_EXPORTS_DEFAULT}
+    # If aseprite exports should share a few aseprite processes, one per CPU core,
+    # instead of starting aseprite for every spritesheet. Needs aseprite 1.3 or newer.
+
+{EXPORT_PARALLELISM_FIELD}: {EXPORT_PARALLELISM_DEFAULT}
+    # How many aseprite processes may export at once. 0 means one per CPU core.
+    # Lower this if exporting many anims uses too much memory.
+
+{EXPORT_TIMEOUT_FIELD}: {EXPORT_TIMEOUT_DEFAULT}
+    # Seconds aseprite may take per spritesheet before it's assumed to be stuck
+    # and is stopped.
+
+{EXPORT_RETRIES_FIELD}: {EXPORT_RETRIES_DEFAULT}
+    # How many times to retry an export that got stuck or crashed.
 """
 
 
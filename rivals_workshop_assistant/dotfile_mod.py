@@ -5,9 +5,9 @@ from pathlib import Path
 import rivals_workshop_assistant.info_files as info_files
 from rivals_workshop_assistant.modes import Mode
 from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
-from rivals_workshop_assistant.run_context import RunContext
 
 if typing.TYPE_CHECKING:
+    from rivals_workshop_assistant.run_context import RunContext
     from rivals_workshop_assistant.script_handling.script_mod import Script
     from rivals_workshop_assistant.script_handling.injection import GmlInjection
 
@@ -40,9 +40,10 @@ async def read(root_dir: Path) -> dict:
     return info_files.read(root_dir / PATH)
 
 
-def save_dotfile(run_context: RunContext):
+def save_dotfile(run_context: "RunContext"):
     """Controller"""
     info_files.save(path=run_context.root_dir / PATH, content=run_context.dotfile)
+    run_context.file_index.add(run_context.root_dir / PATH)
 
 
 def update_dotfile_after_saving(dotfile: dict, now: datetime, mode: Mode):
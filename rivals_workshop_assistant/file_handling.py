@@ -27,12 +27,17 @@ class File:
         path: Path,
         modified_time: datetime = None,
         processed_time: datetime = None,
+        is_fresh: bool = None,
     ):
-        if modified_time is None:
-            modified_time = _get_modified_time(path)
+        """If is_fresh isn't given, the file is fresh if it was modified after
+        processed_time."""
+        if is_fresh is None:
+            if modified_time is None:
+                modified_time = _get_modified_time(path)
+            is_fresh = _get_is_fresh(processed_time, modified_time)
 
         self.path = path
-        self.is_fresh = _get_is_fresh(processed_time, modified_time)
+        self.is_fresh = is_fresh
 
 
 def _get_modified_time(path: Path) -> datetime:
@@ -0,0 +1,111 @@
+import fnmatch
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+
+class _Listing(NamedTuple):
+    files: Dict[str, List[Path]]  # By extension, as os.path.normcase gives it.
+    folders: List[Path]
+
+
+def _get_extension(name: str) -> str:
+    return os.path.splitext(os.path.normcase(name))[1]
+
+
+class FileIndex:
+    """The files under the root dir, with their stats, shared by everything that
+    reads the tree during a run.
+    Each folder is listed with a single os.scandir the first time it's needed,
+    and stats come from its entries, so no file is statted twice.
+    The index is the tree as it was when first listed, plus the changes made
+    through it. Files that other programs write during the run, like aseprite
+    exports, aren't seen until they're added.
+    The files the run wrote or deleted through it are kept in written."""
+
+    def __init__(self, root_dir: Path):
+        self.root_dir = root_dir
+        self._listings: Dict[Path, _Listing] = {}
+        self._entries: Dict[Path, Optional[os.DirEntry]] = {}
+        self._stats: Dict[Path, os.stat_result] = {}
+        self.written: Set[Path] = set()
+
+    def _list(self, folder: Path) -> _Listing:
+        listing = self._listings.get(folder, None)
+        if listing is not None:
+            return listing
+
+        listing = _Listing(files={}, folders=[])
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    path = folder / entry.name
+                    if entry.is_dir():
+                        # Like Path.rglob, symlinked folders aren't followed.
+                        if not entry.is_symlink():
+                            listing.folders.append(path)
+                    else:
+                        extension = _get_extension(entry.name)
+                        listing.files.setdefault(extension, []).append(path)
+                        self._entries[path] = entry
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        self._listings[folder] = listing
+        return listing
+
+    def get_paths(self, folder: Path, extension: str) -> List[Path]:
+        """The files with the extension in the folder and its subfolders,
+        in the order Path.rglob finds them.
+        The folder is relative to the root dir."""
+        paths = []
+        self._add_paths(paths, self.root_dir / folder, os.path.normcase(extension))
+        return paths
+
+    def _add_paths(self, paths: List[Path], folder: Path, extension: str):
+        listing = self._list(folder)
+        paths.extend(listing.files.get(extension, []))
+        for subfolder in listing.folders:
+            self._add_paths(paths, subfolder, extension)
+
+    def glob(self, folder: Path, pattern: str) -> List[Path]:
+        """The files directly in the folder matching the pattern.
+        The folder is relative to the root dir."""
+        listing = self._list(self.root_dir / folder)
+        return [
+            path
+            for extension_paths in listing.files.values()
+            for path in extension_paths
+            if fnmatch.fnmatch(path.name, pattern)
+        ]
+
+    def exists(self, path: Path) -> bool:
+        self._list(path.parent)
+        return path in self._entries
+
+    def stat(self, path: Path) -> os.stat_result:
+        stat = self._stats.get(path, None)
+        if stat is None:
+            entry = self._entries.get(path, None)
+            if entry is None:
+                stat = path.stat()
+            else:
+                stat = entry.stat()
+            self._stats[path] = stat
+        return stat
+
+    def add(self, path: Path):
+        """Index a file the run wrote."""
+        listing = self._list(path.parent)
+        if path not in self._entries:
+            listing.files.setdefault(_get_extension(path.name), []).append(path)
+        self._entries[path] = None
+        self._stats.pop(path, None)
+        self.written.add(path)
+
+    def delete(self, path: Path):
+        os.remove(path)
+        listing = self._list(path.parent)
+        listing.files[_get_extension(path.name)].remove(path)
+        self._entries.pop(path, None)
+        self._stats.pop(path, None)
+        self.written.add(path)
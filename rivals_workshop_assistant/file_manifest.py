@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Iterable, Optional
+
+from loguru import logger
+
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+FILENAME = ".file_manifest"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increment when the stored entries change shape, to discard old manifests.
+CACHE_VERSION = 1
+
+
+def hash_file(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+class FileManifest:
+    """The size, modified time and content hash of each file when it was last
+    processed. A file is fresh if it changed since then. Its modified time
+    alone isn't trusted, so touching a file, or restoring an old one, is
+    handled by comparing its content.
+    Files are recorded as they were when the run read them, so a file edited
+    while the run processes it is still fresh next run."""
+
+    def __init__(self, entries: Dict[str, dict] = None):
+        if entries is None:
+            entries = {}
+        self.entries = entries
+        self._read_entries: Dict[str, Optional[dict]] = {}
+
+    def is_changed(self, path: Path, stat: os.stat_result = None) -> bool:
+        """If the file changed since it was last processed.
+        Its state now is remembered, to record it as processed after the run."""
+        key = path.as_posix()
+        entry = self.entries.get(key, None)
+        if stat is None:
+            stat = path.stat()
+        if entry is not None and entry["size"] == stat.st_size:
+            if entry["mtime_ns"] == stat.st_mtime_ns:
+                self._read_entries[key] = entry
+                return False
+
+            # Only touched, if the content is the same.
+            file_hash = hash_file(path)
+            if file_hash == entry["hash"]:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                self._read_entries[key] = entry
+                return False
+        else:
+            file_hash = hash_file(path)
+
+        self._read_entries[key] = _make_entry(path, stat, file_hash)
+        return True
+
+    def put(self, path: Path, stat: os.stat_result = None):
+        """Record the file as it is now, as processed."""
+        if stat is None:
+            stat = path.stat()
+        key = path.as_posix()
+        entry = self.entries.get(key, None)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return  # Unchanged, so no need to hash it again.
+        self.entries[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": hash_file(path),
+        }
+
+    def record(self, paths: List[Path], written: Iterable[Path] = ()):
+        """Record the files as processed, and forget any others, such as
+        deleted files.
+        Files are recorded as they were read, except those the run wrote,
+        which are recorded as they are now."""
+        written = set(written)
+        keep_keys = {path.as_posix() for path in paths}
+        self.entries = {
+            key: entry for key, entry in self.entries.items() if key in keep_keys
+        }
+        for path in paths:
+            key = path.as_posix()
+            read_entry = self._read_entries.get(key, None)
+            try:
+                if path in written:
+                    self.put(path)
+                elif read_entry is not None:
+                    self.entries[key] = read_entry
+                else:
+                    # Not read, or changed while read. It'll be new next run.
+                    self.entries.pop(key, None)
+            except FileNotFoundError:
+                # Deleted during the run. It'll be new if it comes back.
+                self.entries.pop(key, None)
+
+
+def _make_entry(path: Path, stat: os.stat_result, file_hash: str) -> Optional[dict]:
+    """The entry for the file as statted and hashed, or None if it changed
+    between the two."""
+    try:
+        stat_after = path.stat()
+    except FileNotFoundError:
+        return None
+    if (stat_after.st_size, stat_after.st_mtime_ns) != (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": file_hash}
+
+
+def read_manifest(root_dir: Path) -> FileManifest:
+    """Controller"""
+    try:
+        manifest_dict = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return FileManifest()
+    except ValueError:
+        logger.warning(f"File manifest is malformed and being ignored: {PATH}")
+        return FileManifest()
+
+    if manifest_dict.get("version", None) != CACHE_VERSION:
+        return FileManifest()
+    return FileManifest(entries=manifest_dict["files"])
+
+
+def save_manifest(root_dir: Path, manifest: FileManifest):
+    """Controller"""
+    (root_dir / PATH).parent.mkdir(parents=True, exist_ok=True)
+    (root_dir / PATH).write_text(
+        json.dumps({"version": CACHE_VERSION, "files": manifest.entries})
+    )
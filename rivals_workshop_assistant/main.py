@@ -1,21 +1,19 @@
 import asyncio
 import datetime
+import multiprocessing
 import sys
 from pathlib import Path
 
-import notifiers
 from loguru import logger
 
-from rivals_workshop_assistant.aseprite_handling.aseprite_updating import update_anims
+# Only light modules are imported here, so a run that finds nothing changed
+# stops quickly. The rest are imported once the run goes ahead.
 from rivals_workshop_assistant.filelock import FileLock
 from rivals_workshop_assistant import (
-    updating,
-    dotfile_mod,
+    tree_snapshot,
+    custom_logging,
     paths,
 )
-from rivals_workshop_assistant.dotfile_mod import (
-    update_dotfile_after_saving,
-)
 from rivals_workshop_assistant.custom_logging import (
     log_lines,
     has_encountered_error,
@@ -23,26 +21,6 @@ from rivals_workshop_assistant.custom_logging import (
     log_startup_context,
 )
 from rivals_workshop_assistant.modes import Mode
-from rivals_workshop_assistant.run_context import (
-    make_run_context_from_paths,
-)
-from rivals_workshop_assistant.script_handling.script_mod import (
-    read_scripts,
-    read_user_inject,
-    read_lib_inject,
-)
-from rivals_workshop_assistant.script_handling.script_updating import update_scripts
-from rivals_workshop_assistant.aseprite_handling.aseprites import (
-    read_aseprites,
-)
-from rivals_workshop_assistant.asset_handling import get_required_assets, save_assets
-from rivals_workshop_assistant.setup import (
-    make_basic_folder_structure,
-    get_assistant_folder_exists,
-)
-from rivals_workshop_assistant.script_handling.injection import (
-    freshen_scripts_that_have_modified_dependencies,
-)
 
 __version__ = "1.3.2"
 
@@ -75,6 +53,7 @@ def run_as_file():
     finally:
         if has_encountered_error:
             log = "".join(log_lines)
+            import notifiers
 
             try:
                 from rivals_workshop_assistant.secrets import SLACK_WEBHOOK
@@ -119,6 +98,19 @@ async def main(
     else:
         root_dir = get_root_dir(given_dir)
 
+    # Before anything is read, since runs are started on every save.
+    # There's no snapshot before the first run.
+    if tree_snapshot.get_is_unchanged(
+        root_dir, assistant_version=__version__, mode=mode
+    ):
+        logger.info("Nothing changed since the last run.")
+        return
+
+    from rivals_workshop_assistant.setup import (
+        make_basic_folder_structure,
+        get_assistant_folder_exists,
+    )
+
     is_first_run = not get_assistant_folder_exists(root_dir)
     make_basic_folder_structure(exe_dir, root_dir)
     if is_first_run:
@@ -170,7 +162,46 @@ Next time, the assistant will run normally.
 
 async def update_files(exe_dir: Path, root_dir: Path, mode: Mode.ALL):
     """Perform all the assistant's processing and save the resulting files"""
+    from rivals_workshop_assistant.aseprite_handling.aseprite_updating import (
+        update_anims,
+    )
+    from rivals_workshop_assistant import (
+        updating,
+        dotfile_mod,
+        file_manifest,
+    )
+    from rivals_workshop_assistant.dotfile_mod import (
+        update_dotfile_after_saving,
+    )
+    from rivals_workshop_assistant.run_context import (
+        make_run_context_from_paths,
+    )
+    from rivals_workshop_assistant.script_handling.script_mod import (
+        read_scripts,
+        read_user_inject,
+        read_lib_inject,
+    )
+    from rivals_workshop_assistant.script_handling.script_updating import (
+        update_scripts,
+    )
+    from rivals_workshop_assistant.aseprite_handling.aseprites import (
+        read_aseprites,
+    )
+    from rivals_workshop_assistant.aseprite_handling import (
+        metadata,
+        export_cache,
+        anim_index,
+    )
+    from rivals_workshop_assistant.asset_handling import (
+        get_required_assets,
+        save_assets,
+    )
+    from rivals_workshop_assistant.script_handling.injection import (
+        freshen_scripts_that_have_modified_dependencies,
+    )
 
+    # Before anything is written, to tell the run's writes from other edits.
+    start_files = tree_snapshot.get_file_stats(root_dir)
     run_context = await make_run_context_from_paths(exe_dir=exe_dir, root_dir=root_dir)
 
     await updating.update(run_context)
@@ -204,12 +235,39 @@ async def update_files(exe_dir: Path, root_dir: Path, mode: Mode.ALL):
     update_dotfile_after_saving(
         now=datetime.datetime.now(), dotfile=run_context.dotfile, mode=mode
     )
+    if mode in (mode.ALL, mode.SCRIPTS):
+        # After the scripts are saved, so injecting into them isn't a change.
+        processed_files = scripts + user_inject_scripts + lib_inject_scripts + aseprites
+        run_context.file_manifest.record(
+            [file.path for file in processed_files],
+            written=run_context.file_index.written,
+        )
 
     assets = get_required_assets(scripts)
-    await save_assets(run_context.root_dir, assets)
+    await save_assets(run_context.root_dir, assets, run_context.file_index)
 
     dotfile_mod.save_dotfile(run_context)
+    metadata.save_cache(root_dir=run_context.root_dir, cache=run_context.aseprite_cache)
+    export_cache.save_cache(root_dir=run_context.root_dir, cache=run_context.export_cache)
+    anim_index.save_index(root_dir=run_context.root_dir, index=run_context.anim_index)
+    file_manifest.save_manifest(
+        root_dir=run_context.root_dir, manifest=run_context.file_manifest
+    )
+    if not custom_logging.has_encountered_error:
+        # Last, so it includes every file the run wrote.
+        tree_snapshot.save_snapshot(
+            root_dir=run_context.root_dir,
+            snapshot=tree_snapshot.make_snapshot(
+                run_context.root_dir,
+                assistant_version=__version__,
+                mode=mode,
+                start_files=start_files,
+                written=run_context.file_index.written,
+            ),
+        )
 
 
 if __name__ == "__main__":
+    # Needed for process pools to work in the frozen exe.
+    multiprocessing.freeze_support()
     run_as_file()
@@ -1,5 +1,5 @@
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List
 
@@ -10,6 +10,11 @@ from rivals_workshop_assistant import (
     assistant_config_mod,
     character_config_mod,
 )
+from rivals_workshop_assistant import file_manifest as file_manifest_mod
+from rivals_workshop_assistant.file_index import FileIndex
+from rivals_workshop_assistant.aseprite_handling import metadata
+from rivals_workshop_assistant.aseprite_handling import anim_index as anim_index_mod
+from rivals_workshop_assistant.aseprite_handling import export_cache as export_cache_mod
 
 
 @dataclass
@@ -19,6 +24,24 @@ class RunContext:
     dotfile: dict
     assistant_config: dict
     character_config: dict
+    aseprite_cache: metadata.AsepriteMetadataCache = field(
+        default_factory=metadata.AsepriteMetadataCache
+    )
+    export_cache: export_cache_mod.ExportCache = field(
+        default_factory=export_cache_mod.ExportCache
+    )
+    anim_index: anim_index_mod.AnimIndex = field(
+        default_factory=anim_index_mod.AnimIndex
+    )
+    file_manifest: file_manifest_mod.FileManifest = field(
+        default_factory=file_manifest_mod.FileManifest
+    )
+    # Made from the root dir if not given.
+    file_index: FileIndex = None
+
+    def __post_init__(self):
+        if self.file_index is None:
+            self.file_index = FileIndex(self.root_dir)
 
 
 async def make_run_context_from_paths(exe_dir: Path, root_dir: Path) -> RunContext:
@@ -29,6 +52,10 @@ async def make_run_context_from_paths(exe_dir: Path, root_dir: Path) -> RunConte
         dotfile=dotfile,
         assistant_config=assistant_config,
         character_config=character_config,
+        aseprite_cache=metadata.read_cache(root_dir),
+        export_cache=export_cache_mod.read_cache(root_dir),
+        anim_index=anim_index_mod.read_index(root_dir),
+        file_manifest=file_manifest_mod.read_manifest(root_dir),
     )
     logger.info(f"Dotfile is {dotfile}")
     logger.info(f"assistant config is {assistant_config}")
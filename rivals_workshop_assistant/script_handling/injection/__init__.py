@@ -1,10 +1,10 @@
 import typing
-from typing import List
+from typing import Mapping
 
 from .application import apply_injection
 from .library import read_injection_library
 
-from rivals_workshop_assistant.aseprite_handling import Anim
+from rivals_workshop_assistant.aseprite_handling.anim_index import AnimRecord
 from rivals_workshop_assistant.dotfile_mod import get_clients_for_injection
 from rivals_workshop_assistant.run_context import RunContext
 
@@ -13,10 +13,14 @@ if typing.TYPE_CHECKING:
 
 
 def handle_injection(
-    run_context: RunContext, scripts: list["Script"], anims: List[Anim]
+    run_context: RunContext,
+    scripts: list["Script"],
+    anims: Mapping[str, AnimRecord],
 ):
     """Controller"""
-    injection_library = read_injection_library(run_context.root_dir)
+    injection_library = read_injection_library(
+        run_context.root_dir, file_index=run_context.file_index
+    )
     apply_injection(
         scripts=scripts,
         injection_library=injection_library,
@@ -1,10 +1,10 @@
 import re
 import typing
-from typing import List
+from typing import List, Mapping
 
 from .dependency_handling import GmlInjection
 from rivals_workshop_assistant.dotfile_mod import update_all_dotfile_injection_clients
-from rivals_workshop_assistant.aseprite_handling import Anim
+from rivals_workshop_assistant.aseprite_handling.anim_index import AnimRecord
 
 if typing.TYPE_CHECKING:
     from rivals_workshop_assistant.script_handling.script_mod import Script
@@ -31,10 +31,11 @@ INJECTION_END_HEADER = (
 def apply_injection(
     scripts: List["Script"],
     injection_library: List[GmlInjection],
-    anims: List[Anim],
+    anims: Mapping[str, AnimRecord],
     dotfile: dict = None,
 ):
-    """Updates scripts with supplied dependencies."""
+    """Updates scripts with supplied dependencies.
+    Anims are looked up by the name of the attack script they're for."""
     for script in scripts:
         anim = _get_anim_for_script(script, anims)
         if script.is_fresh or (anim is not None and anim.is_fresh):
@@ -44,7 +45,7 @@ def apply_injection(
 def _apply_injection_to_script(
     script: "Script",
     injection_library: List[GmlInjection],
-    anim: Anim,
+    anim: AnimRecord,
     dotfile: dict = None,
 ):
     """Updates the dependencies supplied to the script."""
@@ -73,23 +74,19 @@ def _should_inject(script: str):
     return "NO-INJECT" not in _get_script_contents(script)  # Performance problem?
 
 
-def _get_anim_data_gmls_needed_in_gml(anim: Anim):
+def _get_anim_data_gmls_needed_in_gml(anim: AnimRecord):
     if anim is None:
         return []
     window_gmls = [window.gml for window in anim.windows]
     return window_gmls
 
 
-def _get_anim_for_script(script: "Script", anims: List[Anim]) -> typing.Optional[Anim]:
-    # TODO If we have access to the dotfile here, we can look up in the anim hashes which aseprite an anim belongs to
-    #   and then we can only load that aseprite's anims
+def _get_anim_for_script(
+    script: "Script", anims: Mapping[str, AnimRecord]
+) -> typing.Optional[AnimRecord]:
     if script.path.parent.name != "attacks":
         return None
-    for anim in anims:
-        cleaned_name = anim.name.replace("HURTBOX", "").strip()
-        if cleaned_name == script.path.stem:
-            return anim
-    return None
+    return anims.get(script.path.stem, None)
 
 
 def _get_injects_needed_in_gml(
@@ -4,6 +4,7 @@ from pathlib import Path
 from typing import List, Tuple
 
 import rivals_workshop_assistant.paths
+from rivals_workshop_assistant.file_index import FileIndex
 from .dependency_handling import (
     GmlInjection,
     INJECT_TYPES,
@@ -12,13 +13,15 @@ from .dependency_handling import (
 )
 
 
-def read_injection_library(root_dir: Path) -> List[GmlInjection]:
+def read_injection_library(
+    root_dir: Path, file_index: FileIndex = None
+) -> List[GmlInjection]:
     """Controller"""
-    inject_gml_paths = list(
-        (root_dir / rivals_workshop_assistant.paths.INJECT_FOLDER).rglob("*.gml")
-    ) + list(
-        (root_dir / rivals_workshop_assistant.paths.USER_INJECT_FOLDER).rglob("*.gml")
-    )
+    if file_index is None:
+        file_index = FileIndex(root_dir)
+    inject_gml_paths = file_index.get_paths(
+        rivals_workshop_assistant.paths.INJECT_FOLDER, ".gml"
+    ) + file_index.get_paths(rivals_workshop_assistant.paths.USER_INJECT_FOLDER, ".gml")
 
     full_lib = []
     for file in inject_gml_paths:
@@ -6,11 +6,8 @@ from typing import List
 
 from loguru import logger
 
-from rivals_workshop_assistant.file_handling import (
-    File,
-    _get_modified_time,
-)
-from rivals_workshop_assistant.dotfile_mod import get_script_processed_time
+from rivals_workshop_assistant.file_handling import File
+from rivals_workshop_assistant.file_index import FileIndex
 
 from rivals_workshop_assistant.paths import (
     SCRIPTS_FOLDER,
@@ -28,8 +25,9 @@ class Script(File):
         original_content: str = None,
         working_content: str = None,
         processed_time: datetime = None,
+        is_fresh: bool = None,
     ):
-        super().__init__(path, modified_time, processed_time)
+        super().__init__(path, modified_time, processed_time, is_fresh)
         self._original_content = original_content
         self.working_content = working_content
 
@@ -51,10 +49,11 @@ class Script(File):
     def working_content(self, value):
         self._working_content = value
 
-    def save(self, root_dir: Path):
+    def save(self, root_dir: Path) -> bool:
+        """Returns if the file was written."""
         if self.working_content == "":
             logger.warning(f"Trying to save an empty file {self.path}")
-            return
+            return False
         if self.working_content != self.original_content:
             with open(
                 (root_dir / self.path),
@@ -64,6 +63,8 @@ class Script(File):
                 newline="\n",
             ) as f:
                 f.write(self.working_content)
+            return True
+        return False
 
     def __eq__(self, other: "Script"):
         return (
@@ -79,15 +80,15 @@ class Script(File):
 
 def read_scripts(run_context: RunContext, folder: str = SCRIPTS_FOLDER) -> List[Script]:
     """Returns all Scripts in a given directory (defaults to the scripts folder)."""
-    gml_paths = list((run_context.root_dir / folder).rglob("*.gml"))
-    processed_time = get_script_processed_time(dotfile=run_context.dotfile)
+    gml_paths = run_context.file_index.get_paths(folder, ".gml")
 
     scripts = []
     for path in gml_paths:
+        stat = run_context.file_index.stat(path)
         script = Script(
             path=path,
-            modified_time=_get_modified_time(path),
-            processed_time=processed_time,
+            modified_time=datetime.fromtimestamp(stat.st_mtime),
+            is_fresh=run_context.file_manifest.is_changed(path, stat),
         )
         scripts.append(script)
 
@@ -104,6 +105,8 @@ def read_lib_inject(run_context: RunContext) -> List[Script]:
     return read_scripts(run_context, folder=INJECT_FOLDER)
 
 
-def save_scripts(root_dir: Path, scripts: List["Script"]):
+def save_scripts(root_dir: Path, scripts: List["Script"], file_index: FileIndex = None):
+    """Save the scripts, adding those that were written to the file index."""
     for script in scripts:
-        script.save(root_dir)
+        if script.save(root_dir) and file_index is not None:
+            file_index.add(root_dir / script.path)
@@ -1,7 +1,6 @@
-from typing import List
+from typing import List, Mapping
 
-from rivals_workshop_assistant.aseprite_handling import Anim
-from rivals_workshop_assistant.aseprite_handling.anims import get_anims
+from rivals_workshop_assistant.aseprite_handling.anim_index import AnimRecord
 from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
 from rivals_workshop_assistant.run_context import RunContext
 from rivals_workshop_assistant.script_handling.code_generation import handle_codegen
@@ -13,22 +12,21 @@ from rivals_workshop_assistant.script_handling.warning_handling import handle_wa
 def update_scripts(
     run_context: RunContext, scripts: list[Script], aseprites: list[Aseprite]
 ):
-    # I don't like that we need to load all anims to update scripts.
-    # Instead, could save the attack timing info to the dotfile when animations run,
-    # and then propagate to scripts. That would require doing animations first each run.
-    anims = get_anims(aseprites)
+    # The windows of unchanged aseprite files come from the anim index,
+    # so only new or changed files are read.
+    anims = run_context.anim_index.get_script_anims(aseprites)
     handle_scripts(
         run_context=run_context,
         scripts=scripts,
         anims=anims,
     )
-    save_scripts(run_context.root_dir, scripts)
+    save_scripts(run_context.root_dir, scripts, run_context.file_index)
 
 
 def handle_scripts(
     run_context: RunContext,
     scripts: List[Script],
-    anims: List[Anim],
+    anims: Mapping[str, AnimRecord],
 ):
     handle_warning(assistant_config=run_context.assistant_config, scripts=scripts)
     handle_codegen(scripts)
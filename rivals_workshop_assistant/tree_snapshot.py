@@ -0,0 +1,203 @@
+"""A compact record of the size and modified time of every file a run reads,
+so a run can stop early when none of them changed since the last run.
+Checking it only lists folders, without reading configs or parsing files, and
+this module only imports the standard library, so the check starts quickly."""
+
+import datetime
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.modes import Mode
+
+FILENAME = ".tree_snapshot"
+PATH = paths.ASSISTANT_FOLDER / FILENAME
+
+MAGIC = b"RWAS"
+# Increment when the layout changes, to discard old snapshots.
+FORMAT_VERSION = 1
+HEADER_STRUCT = struct.Struct("<4sHII")  # magic, format version, day, file count
+ENTRY_STRUCT = struct.Struct("<HQq")  # path length, size, mtime_ns
+
+# Folders, with the suffixes of the files in them that runs read.
+# None watches every file, such as sprites that exports are checked against.
+WATCHED_FOLDERS = [
+    (paths.SCRIPTS_FOLDER, (".gml",)),
+    (paths.ANIMS_FOLDER, (".ase", ".aseprite")),
+    (paths.INJECT_FOLDER, (".gml",)),
+    (paths.USER_INJECT_FOLDER, (".gml",)),
+    (paths.SPRITES_FOLDER, None),
+]
+# The assistant config, character config and dotfile. Their modules aren't
+# imported, as they import the yaml library.
+WATCHED_FILES = [
+    paths.ASSISTANT_FOLDER / "assistant_config.yaml",
+    Path("config.ini"),
+    paths.ASSISTANT_FOLDER / ".assistant",
+]
+
+FileStats = Dict[str, Tuple[int, int]]
+
+
+@dataclass
+class TreeSnapshot:
+    assistant_version: str
+    mode: Mode
+    day: datetime.date  # Runs on a new day aren't skipped, so updates happen.
+    files: FileStats  # Relative path to size and mtime_ns.
+
+    def covers(self, assistant_version: str, mode: Mode, day: datetime.date):
+        """If a run with these would do nothing new after this snapshot's run."""
+        return (
+            self.assistant_version == assistant_version
+            and self.mode in (Mode.ALL, mode)
+            and self.day == day
+        )
+
+    def to_bytes(self) -> bytes:
+        parts = [
+            HEADER_STRUCT.pack(
+                MAGIC, FORMAT_VERSION, self.day.toordinal(), len(self.files)
+            ),
+            _pack_string(self.assistant_version),
+            _pack_string(self.mode.value),
+        ]
+        for path, (size, mtime_ns) in self.files.items():
+            encoded_path = path.encode("utf8", errors="surrogateescape")
+            parts.append(ENTRY_STRUCT.pack(len(encoded_path), size, mtime_ns))
+            parts.append(encoded_path)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["TreeSnapshot"]:
+        """None if the data isn't a snapshot of this format."""
+        try:
+            magic, format_version, day, file_count = HEADER_STRUCT.unpack_from(data)
+            if magic != MAGIC or format_version != FORMAT_VERSION:
+                return None
+            offset = HEADER_STRUCT.size
+            assistant_version, offset = _unpack_string(data, offset)
+            mode_value, offset = _unpack_string(data, offset)
+
+            files = {}
+            for _ in range(file_count):
+                path_length, size, mtime_ns = ENTRY_STRUCT.unpack_from(data, offset)
+                offset += ENTRY_STRUCT.size
+                path = data[offset : offset + path_length]
+                offset += path_length
+                files[path.decode("utf8", errors="surrogateescape")] = (
+                    size,
+                    mtime_ns,
+                )
+            return cls(
+                assistant_version=assistant_version,
+                mode=Mode(mode_value),
+                day=datetime.date.fromordinal(day),
+                files=files,
+            )
+        except (struct.error, ValueError):
+            return None
+
+
+def _pack_string(string: str) -> bytes:
+    encoded = string.encode("utf8")
+    return struct.pack("<H", len(encoded)) + encoded
+
+
+def _unpack_string(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    return data[offset : offset + length].decode("utf8"), offset + length
+
+
+def get_file_stats(root_dir: Path) -> FileStats:
+    """The size and mtime_ns of every watched file."""
+    files = {}
+    for folder, suffixes in WATCHED_FOLDERS:
+        _add_folder_stats(files, root_dir, root_dir / folder, suffixes)
+    for path in WATCHED_FILES:
+        try:
+            stat = (root_dir / path).stat()
+        except FileNotFoundError:
+            continue
+        files[path.as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def _add_folder_stats(
+    files: FileStats,
+    root_dir: Path,
+    folder: Path,
+    suffixes: Optional[Tuple[str, ...]],
+):
+    try:
+        entries = list(os.scandir(folder))
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for entry in entries:
+        if entry.is_dir():
+            _add_folder_stats(files, root_dir, Path(entry.path), suffixes)
+        elif suffixes is None or entry.name.lower().endswith(suffixes):
+            stat = entry.stat()
+            path = Path(entry.path).relative_to(root_dir).as_posix()
+            files[path] = (stat.st_size, stat.st_mtime_ns)
+
+
+def make_snapshot(
+    root_dir: Path,
+    assistant_version: str,
+    mode: Mode,
+    start_files: Optional[FileStats] = None,
+    written: Iterable[Path] = (),
+) -> TreeSnapshot:
+    """With start_files, the files as they were when the run started, only the
+    written files are taken as they are now. Files edited during the run keep
+    their state from the start, so the next run doesn't skip them."""
+    files = get_file_stats(root_dir)
+    if start_files is not None:
+        end_files = files
+        files = dict(start_files)
+        for path in written:
+            try:
+                key = path.relative_to(root_dir).as_posix()
+            except ValueError:
+                continue  # Outside the project, like lua scripts.
+            if key in end_files:
+                files[key] = end_files[key]
+            else:
+                files.pop(key, None)
+    return TreeSnapshot(
+        assistant_version=assistant_version,
+        mode=mode,
+        day=datetime.date.today(),
+        files=files,
+    )
+
+
+def get_is_unchanged(root_dir: Path, assistant_version: str, mode: Mode) -> bool:
+    """If nothing a run would read changed since the last run that did the same."""
+    snapshot = read_snapshot(root_dir)
+    return (
+        snapshot is not None
+        and snapshot.covers(assistant_version, mode, datetime.date.today())
+        and snapshot.files == get_file_stats(root_dir)
+    )
+
+
+def read_snapshot(root_dir: Path) -> Optional[TreeSnapshot]:
+    """Controller"""
+    try:
+        data = (root_dir / PATH).read_bytes()
+    except FileNotFoundError:
+        return None
+    # A malformed snapshot means a full run, which replaces it.
+    return TreeSnapshot.from_bytes(data)
+
+
+def save_snapshot(root_dir: Path, snapshot: TreeSnapshot):
+    """Controller"""
+    (root_dir / PATH).parent.mkdir(parents=True, exist_ok=True)
+    (root_dir / PATH).write_bytes(snapshot.to_bytes())
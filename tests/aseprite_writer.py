@@ -0,0 +1,302 @@
+"""Writes synthetic aseprite files, for tests and benchmarks that need files of
+any shape rather than only the small test sprites, and makes small edits to
+existing files.
+
+Files are RGBA, with one cel per layer per frame. Layers are split evenly
+between the groups, and the frames evenly between the anim tags."""
+
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+)
+
+HEADER_MAGIC = 0xA5E0
+FRAME_MAGIC = 0xF1FA
+RGBA_COLOR_DEPTH = 32
+LAYER_VISIBLE_FLAG = 1
+NORMAL_LAYER_TYPE = 0
+GROUP_LAYER_TYPE = 1
+TILEMAP_LAYER_TYPE = 2
+RAW_CEL_TYPE = 0
+LINKED_CEL_TYPE = 1
+COMPRESSED_CEL_TYPE = 2
+
+LAYER_CHUNK_TYPE = 0x2004
+CEL_CHUNK_TYPE = 0x2005
+FRAME_TAGS_CHUNK_TYPE = 0x2018
+
+ANIM_TAG_RGB = (87, 185, 242)  # blue
+WINDOW_TAG_RGB = (254, 91, 89)  # red
+
+HEADER_STRUCT = struct.Struct("<IHHHHHIHII B3xHBBhhHH84x")
+FRAME_STRUCT = struct.Struct("<IHHH2xI")
+CHUNK_STRUCT = struct.Struct("<IH")
+LAYER_STRUCT = struct.Struct("<HHHHHHB3x")
+CEL_STRUCT = struct.Struct("<HhhBHh5x")
+SIZE_STRUCT = struct.Struct("<HH")
+LINK_STRUCT = struct.Struct("<H")
+U32_STRUCT = struct.Struct("<I")
+TAGS_HEAD_STRUCT = struct.Struct("<H8x")
+TAG_STRUCT = struct.Struct("<HHBH6x3Bx")
+
+
+@dataclass
+class SyntheticAseprite:
+    """The shape of a generated file."""
+
+    frames: int = 8
+    layers: int = 4
+    groups: int = 0
+    # Top level tilemap layers after the others, without cels.
+    tilemaps: int = 0
+    anim_tags: int = 2
+    windows_per_tag: int = 1
+    cel_width: int = 64
+    cel_height: int = 64
+    # zlib level for the cels, or None to store them raw.
+    compression: Optional[int] = 6
+    # Every other frame's cels link to the frame before.
+    linked_cels: bool = False
+    cel_opacity: int = 255
+    seed: int = 0
+
+
+def write_aseprite(spec: SyntheticAseprite) -> bytes:
+    rng = random.Random(spec.seed)
+    cel_layer_indices = _get_cel_layer_indices(spec)
+    frames = []
+    for frame_index in range(spec.frames):
+        chunks = []
+        if frame_index == 0:
+            chunks += _make_layer_chunks(spec)
+            if spec.anim_tags > 0:
+                chunks.append(_make_tags_chunk(spec))
+        for layer_index in cel_layer_indices:
+            if spec.linked_cels and frame_index % 2 == 1:
+                chunks.append(_make_linked_cel_chunk(layer_index, frame_index - 1))
+            else:
+                chunks.append(_make_cel_chunk(spec, layer_index, rng))
+        frames.append(_make_frame(chunks))
+
+    body = b"".join(frames)
+    header = HEADER_STRUCT.pack(
+        HEADER_STRUCT.size + len(body),
+        HEADER_MAGIC,
+        spec.frames,
+        spec.cel_width,
+        spec.cel_height,
+        RGBA_COLOR_DEPTH,
+        1,  # layer opacity is valid
+        100,  # deprecated speed
+        0,
+        0,
+        0,  # transparent palette index
+        0,  # number of colors
+        1,  # pixel width
+        1,  # pixel height
+        0,  # grid x
+        0,  # grid y
+        16,  # grid width
+        16,  # grid height
+    )
+    return header + body
+
+
+def save_aseprite(path: Path, spec: SyntheticAseprite) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(write_aseprite(spec))
+    return path
+
+
+def get_layer_names(spec: SyntheticAseprite) -> List[str]:
+    """The names of the normal layers, in file order."""
+    return [f"layer{index}" for index in range(spec.layers)]
+
+
+def get_anim_tag_ranges(spec: SyntheticAseprite) -> List[Tuple[int, int]]:
+    """The inclusive frame range of each anim tag."""
+    tag_count = min(spec.anim_tags, spec.frames)
+    if tag_count == 0:
+        return []
+    bounds = [spec.frames * index // tag_count for index in range(tag_count + 1)]
+    return [(bounds[index], bounds[index + 1] - 1) for index in range(tag_count)]
+
+
+def _get_layer_entries(spec: SyntheticAseprite) -> List[Tuple[str, int, int]]:
+    """Each layer chunk's name, type and child level, in file order.
+    Groups come first, each followed by its share of the layers, then the
+    tilemaps."""
+    names = get_layer_names(spec)
+    if spec.groups == 0:
+        entries = [(name, NORMAL_LAYER_TYPE, 0) for name in names]
+    else:
+        entries = []
+        for group_index in range(spec.groups):
+            entries.append((f"group{group_index}", GROUP_LAYER_TYPE, 0))
+            entries += [
+                (name, NORMAL_LAYER_TYPE, 1)
+                for name in names[group_index :: spec.groups]
+            ]
+    entries += [
+        (f"tilemap{index}", TILEMAP_LAYER_TYPE, 0) for index in range(spec.tilemaps)
+    ]
+    return entries
+
+
+def _get_cel_layer_indices(spec: SyntheticAseprite) -> List[int]:
+    return [
+        index
+        for index, (_, layer_type, _) in enumerate(_get_layer_entries(spec))
+        if layer_type == NORMAL_LAYER_TYPE
+    ]
+
+
+def _make_frame(chunks: List[bytes]) -> bytes:
+    body = b"".join(chunks)
+    num_chunks = len(chunks)
+    return (
+        FRAME_STRUCT.pack(
+            FRAME_STRUCT.size + len(body),
+            FRAME_MAGIC,
+            min(num_chunks, 0xFFFF),
+            100,  # duration in ms
+            num_chunks,
+        )
+        + body
+    )
+
+
+def _make_chunk(chunk_type: int, content: bytes) -> bytes:
+    return CHUNK_STRUCT.pack(CHUNK_STRUCT.size + len(content), chunk_type) + content
+
+
+def _make_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    return LINK_STRUCT.pack(len(encoded)) + encoded
+
+
+def _make_layer_chunks(spec: SyntheticAseprite) -> List[bytes]:
+    return [
+        _make_chunk(
+            LAYER_CHUNK_TYPE,
+            LAYER_STRUCT.pack(
+                LAYER_VISIBLE_FLAG,
+                layer_type,
+                child_level,
+                0,  # ignored default width
+                0,  # ignored default height
+                0,  # normal blend mode
+                255,
+            )
+            + _make_string(name)
+            # The tileset index.
+            + (U32_STRUCT.pack(0) if layer_type == TILEMAP_LAYER_TYPE else b""),
+        )
+        for name, layer_type, child_level in _get_layer_entries(spec)
+    ]
+
+
+def _make_tags_chunk(spec: SyntheticAseprite) -> bytes:
+    tags = []
+    for tag_index, (start, end) in enumerate(get_anim_tag_ranges(spec)):
+        tags.append((f"anim{tag_index}", start, end, ANIM_TAG_RGB))
+        for window_index in range(min(spec.windows_per_tag, end - start + 1)):
+            window_frame = start + window_index
+            tags.append(
+                (
+                    f"anim{tag_index}_window{window_index}",
+                    window_frame,
+                    window_frame,
+                    WINDOW_TAG_RGB,
+                )
+            )
+
+    content = TAGS_HEAD_STRUCT.pack(len(tags))
+    for name, start, end, rgb in tags:
+        content += TAG_STRUCT.pack(start, end, 0, 1, *rgb) + _make_string(name)
+    return _make_chunk(FRAME_TAGS_CHUNK_TYPE, content)
+
+
+def _make_cel_chunk(spec: SyntheticAseprite, layer_index: int, rng) -> bytes:
+    pixels = _make_pixels(spec, rng)
+    if spec.compression is None:
+        cel_type = RAW_CEL_TYPE
+    else:
+        cel_type = COMPRESSED_CEL_TYPE
+        pixels = zlib.compress(pixels, spec.compression)
+    return _make_chunk(
+        CEL_CHUNK_TYPE,
+        CEL_STRUCT.pack(layer_index, 0, 0, spec.cel_opacity, cel_type, 0)
+        + SIZE_STRUCT.pack(spec.cel_width, spec.cel_height)
+        + pixels,
+    )
+
+
+def _make_pixels(spec: SyntheticAseprite, rng) -> bytes:
+    """Noise across the middle half of each row, transparent either side,
+    so the cels compress roughly as much as a sprite does."""
+    margin = spec.cel_width // 4
+    drawn = spec.cel_width - 2 * margin
+    transparent = bytes(margin * 4)
+    return b"".join(
+        transparent + rng.randbytes(drawn * 4) + transparent
+        for _ in range(spec.cel_height)
+    )
+
+
+def _make_linked_cel_chunk(layer_index: int, linked_frame_index: int) -> bytes:
+    return _make_chunk(
+        CEL_CHUNK_TYPE,
+        CEL_STRUCT.pack(layer_index, 0, 0, 255, LINKED_CEL_TYPE, 0)
+        + LINK_STRUCT.pack(linked_frame_index),
+    )
+
+
+def edit_tag_name(data: bytes, name: str, new_name: str) -> bytes:
+    """Rename a tag to a name of the same length."""
+    assert len(name) == len(new_name)
+    length = LINK_STRUCT.pack(len(name))
+    return data.replace(length + name.encode(), length + new_name.encode(), 1)
+
+
+def edit_cel_position(data: bytes, layer_index: int) -> bytes:
+    """Move the first frame's cel on the layer one pixel right."""
+    file = RawAsepriteFile(data)
+    edited = bytearray(data)
+    for entry in file.frames[0].chunk_table:
+        if entry.chunk_type == CEL_CHUNK_TYPE:
+            cel_layer_index, x_pos = struct.unpack_from("<Hh", data, entry.offset + 6)
+            if cel_layer_index == layer_index:
+                struct.pack_into("<h", edited, entry.offset + 8, x_pos + 1)
+    return bytes(edited)
+
+
+def link_cel(data: bytes, frame_index: int, linked_frame_index: int) -> bytes:
+    """Replace the frame's first cel with a link to the same layer's cel in
+    the linked frame."""
+    file = RawAsepriteFile(data)
+    frame = file.frames[frame_index]
+    cel_entry = next(
+        entry for entry in frame.chunk_table if entry.chunk_type == CEL_CHUNK_TYPE
+    )
+    layer_index, x_pos, y_pos, opacity = struct.unpack_from(
+        "<HhhB", data, cel_entry.offset + 6
+    )
+    linked_cel = _make_chunk(
+        CEL_CHUNK_TYPE,
+        CEL_STRUCT.pack(layer_index, x_pos, y_pos, opacity, LINKED_CEL_TYPE, 0)
+        + LINK_STRUCT.pack(linked_frame_index),
+    )
+    edited = bytearray(data[: cel_entry.offset])
+    edited += linked_cel
+    edited += data[cel_entry.offset + cel_entry.size :]
+    size_change = len(linked_cel) - cel_entry.size
+    struct.pack_into("<I", edited, 0, len(edited))
+    struct.pack_into("<I", edited, frame.offset, frame.size + size_change)
+    return bytes(edited)
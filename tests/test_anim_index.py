@@ -0,0 +1,254 @@
+import os
+from pathlib import Path
+
+import pytest
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import anim_index
+from rivals_workshop_assistant.aseprite_handling.aseprites import (
+    AsepriteFileContent,
+    read_aseprites,
+)
+from tests.aseprite_writer import SyntheticAseprite, save_aseprite
+from tests.testing_helpers import make_run_context
+
+SPEC = SyntheticAseprite(frames=4, anim_tags=2, windows_per_tag=1)
+
+
+def get_timings(anims):
+    return [
+        (
+            anim.name,
+            anim.start,
+            anim.end,
+            anim.num_frames,
+            [(window.name, window.start, window.end) for window in anim.windows],
+        )
+        for anim in anims
+    ]
+
+
+def make_root_dir(tmp: TempDirectory) -> Path:
+    root_dir = Path(tmp.path)
+    save_aseprite(root_dir / paths.ANIMS_FOLDER / "attacks.aseprite", SPEC)
+    return root_dir
+
+
+def fail_read(*args, **kwargs):
+    assert False, "Aseprite file was read"
+
+
+def test_anim_index_records_windows():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        run_context = make_run_context(root_dir=root_dir)
+
+        anims = run_context.anim_index.get_anims(read_aseprites(run_context))
+
+    assert get_timings(anims) == [
+        ("anim0", 0, 1, 2, [("anim0_window0", 1, 1)]),
+        ("anim1", 2, 3, 2, [("anim1_window0", 1, 1)]),
+    ]
+    assert [anim.aseprite_path.name for anim in anims] == ["attacks.aseprite"] * 2
+
+
+def test_anim_index_does_not_read_unchanged_file(monkeypatch):
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        run_context = make_run_context(root_dir=root_dir)
+        expected = get_timings(
+            run_context.anim_index.get_anims(read_aseprites(run_context))
+        )
+        anim_index.save_index(root_dir, run_context.anim_index)
+
+        monkeypatch.setattr(AsepriteFileContent, "from_path", fail_read)
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index = anim_index.read_index(root_dir)
+        anims = run_context.anim_index.get_anims(read_aseprites(run_context))
+
+    assert get_timings(anims) == expected
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        pytest.param("file", id="file_changed"),
+        pytest.param("colors", id="tag_colors_changed"),
+    ],
+)
+def test_anim_index_rereads_changed_file(change):
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index.get_anims(read_aseprites(run_context))
+
+        assistant_config = {}
+        path = root_dir / paths.ANIMS_FOLDER / "attacks.aseprite"
+        if change == "file":
+            save_aseprite(path, SyntheticAseprite(frames=3, anim_tags=1))
+            os.utime(path, ns=(0, 12345))
+        else:
+            assistant_config = {"window_tag_color": "green"}
+        index = run_context.anim_index
+        run_context = make_run_context(
+            root_dir=root_dir, assistant_config=assistant_config
+        )
+        run_context.anim_index = index
+        anims = run_context.anim_index.get_anims(read_aseprites(run_context))
+
+    if change == "file":
+        assert get_timings(anims) == [("anim0", 0, 2, 3, [("anim0_window0", 1, 1)])]
+    else:
+        assert get_timings(anims) == [
+            ("anim0", 0, 1, 2, []),
+            ("anim1", 2, 3, 2, []),
+        ]
+
+
+def test_anim_index_forgets_deleted_files():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index.get_anims(read_aseprites(run_context))
+
+        (root_dir / paths.ANIMS_FOLDER / "attacks.aseprite").unlink()
+        index = run_context.anim_index
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index = index
+        read_aseprites(run_context)
+
+    assert run_context.anim_index.entries == {}
+
+
+def test_anim_index_keeps_anim_freshness():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        dotfile = {}
+        run_context = make_run_context(root_dir=root_dir, dotfile=dotfile)
+        first_anims = run_context.anim_index.get_anims(read_aseprites(run_context))
+        index = run_context.anim_index
+
+        # The file is still newer than the last run, but its frames are the same.
+        run_context = make_run_context(root_dir=root_dir, dotfile=dotfile)
+        run_context.anim_index = index
+        second_anims = run_context.anim_index.get_anims(read_aseprites(run_context))
+
+    assert [anim.is_fresh for anim in first_anims] == [True, True]
+    assert [anim.is_fresh for anim in second_anims] == [False, False]
+
+
+def make_entry(*anim_names: str) -> dict:
+    return {
+        "anims": [
+            {"name": name, "start": start, "end": start, "windows": []}
+            for start, name in enumerate(anim_names)
+        ]
+    }
+
+
+def test_anim_index_names_strip_hurtbox():
+    index = anim_index.AnimIndex(
+        entries={
+            "anims/a.aseprite": make_entry("HURTBOX fair", "idle"),
+            "anims/b.aseprite": make_entry("bair"),
+        }
+    )
+
+    assert index.names == {
+        "fair": {
+            "path": "anims/a.aseprite",
+            "name": "HURTBOX fair",
+            "start": 0,
+            "end": 0,
+        },
+        "idle": {"path": "anims/a.aseprite", "name": "idle", "start": 1, "end": 1},
+        "bair": {"path": "anims/b.aseprite", "name": "bair", "start": 0, "end": 0},
+    }
+
+    index.prune(keep=[Path("anims/b.aseprite")])
+    assert list(index.names) == ["bair"]
+
+
+def test_anim_index_names_fall_back_to_other_file_when_pruned():
+    index = anim_index.AnimIndex(
+        entries={
+            "anims/a.aseprite": make_entry("nair"),
+            "anims/b.aseprite": make_entry("idle", "nair"),
+        }
+    )
+    assert index.names["nair"]["path"] == "anims/a.aseprite"
+
+    index.prune(keep=[Path("anims/b.aseprite")])
+
+    assert index.names["nair"] == {
+        "path": "anims/b.aseprite",
+        "name": "nair",
+        "start": 1,
+        "end": 1,
+    }
+
+
+def test_anim_index_names_follow_changed_file():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index.update(read_aseprites(run_context))
+        assert sorted(run_context.anim_index.names) == ["anim0", "anim1"]
+
+        path = root_dir / paths.ANIMS_FOLDER / "attacks.aseprite"
+        save_aseprite(path, SyntheticAseprite(frames=3, anim_tags=1))
+        os.utime(path, ns=(0, 12345))
+        index = run_context.anim_index
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index = index
+        run_context.anim_index.update(read_aseprites(run_context))
+
+    assert sorted(run_context.anim_index.names) == ["anim0"]
+
+
+def test_anim_index_names_follow_moved_anim():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        save_aseprite(
+            root_dir / paths.ANIMS_FOLDER / "other.aseprite",
+            SyntheticAseprite(frames=3, anim_tags=1),
+        )
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index.update(read_aseprites(run_context))
+        first_path = Path(run_context.anim_index.names["anim0"]["path"])
+
+        # The anim is only left in the other file.
+        save_aseprite(first_path, SyntheticAseprite(frames=2, anim_tags=0))
+        os.utime(first_path, ns=(0, 12345))
+        index = run_context.anim_index
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index = index
+        anims = run_context.anim_index.get_script_anims(read_aseprites(run_context))
+
+        assert "anim0" in anims
+        assert anims["anim0"].aseprite_path.exists()
+        assert anims["anim0"].aseprite_path != first_path
+
+
+def test_script_anims_do_not_read_unchanged_files(monkeypatch):
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        save_aseprite(
+            root_dir / paths.ANIMS_FOLDER / "other.aseprite",
+            SyntheticAseprite(frames=2, anim_tags=0),
+        )
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index.update(read_aseprites(run_context))
+        anim_index.save_index(root_dir, run_context.anim_index)
+
+        monkeypatch.setattr(AsepriteFileContent, "from_path", fail_read)
+        run_context = make_run_context(root_dir=root_dir)
+        run_context.anim_index = anim_index.read_index(root_dir)
+        anims = run_context.anim_index.get_script_anims(read_aseprites(run_context))
+
+        assert sorted(anims) == ["anim0", "anim1", "other"]
+        assert get_timings([anims["anim1"]]) == [
+            ("anim1", 2, 3, 2, [("anim1_window0", 1, 1)])
+        ]
+        assert anims.get("missing") is None
@@ -0,0 +1,261 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from loguru import logger
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+    exporting,
+    native_rendering,
+)
+from rivals_workshop_assistant.aseprite_handling.anims import save_anims
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.scheduling import ExportScheduler
+from rivals_workshop_assistant.aseprite_handling.export_cache import (
+    ExportCache,
+    read_cache,
+    save_cache,
+)
+from tests.aseprite_writer import edit_cel_position, edit_tag_name
+from tests.testing_helpers import make_run_context
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+class RenderCounter:
+    def __init__(self, monkeypatch):
+        self.rendered = []
+        render_export_job = native_rendering.render_export_job
+
+        def counting_render_export_job(job, file_data):
+            self.rendered.append(job.dest_name)
+            return render_export_job(job, file_data)
+
+        monkeypatch.setattr(
+            native_rendering, "render_export_job", counting_render_export_job
+        )
+
+
+async def export(root_dir: Path, cache: ExportCache, name="2frame", **config_params):
+    aseprite = read_aseprite(
+        run_context=make_run_context(root_dir=root_dir),
+        path=root_dir / paths.ANIMS_FOLDER / f"{name}.aseprite",
+    )
+    await save_anims(
+        path_params=AsepritePathParams(
+            exe_dir=root_dir,
+            root_dir=root_dir,
+            aseprite_program_path=Path("no_aseprite_when_testing_native_exports"),
+        ),
+        config_params=AsepriteConfigParams(**{"native_exports": True, **config_params}),
+        aseprites=[aseprite],
+        export_cache=cache,
+    )
+
+
+def supply_root_dir(tmp: TempDirectory, name="2frame") -> Path:
+    root_dir = Path(tmp.path)
+    (root_dir / paths.ANIMS_FOLDER).mkdir()
+    shutil.copy(TEST_SPRITES_PATH / f"{name}.aseprite", root_dir / paths.ANIMS_FOLDER)
+    return root_dir
+
+
+def get_strip_path(root_dir: Path) -> Path:
+    return root_dir / paths.SPRITES_FOLDER / "2frame_strip2.png"
+
+
+@pytest.mark.asyncio
+async def test_unchanged_export_is_skipped(monkeypatch):
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp)
+
+        await export(root_dir, cache)
+        await export(root_dir, cache)
+
+    assert counter.rendered == ["2frame_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_deleted_export_is_redone(monkeypatch):
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp)
+
+        await export(root_dir, cache)
+        get_strip_path(root_dir).unlink()
+        await export(root_dir, cache)
+
+        assert get_strip_path(root_dir).exists()
+    assert counter.rendered == ["2frame_strip2.png", "2frame_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_export_with_new_params_is_redone(monkeypatch):
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp)
+
+        await export(root_dir, cache)
+        await export(root_dir, cache, is_ssl=True)
+
+    assert counter.rendered == ["2frame_strip2.png", "2frame_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_touched_export_is_rehashed(monkeypatch):
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp)
+
+        await export(root_dir, cache)
+        os.utime(get_strip_path(root_dir), ns=(0, 0))
+        await export(root_dir, cache)
+        assert counter.rendered == ["2frame_strip2.png"]
+
+        get_strip_path(root_dir).write_bytes(b"not the export")
+        await export(root_dir, cache)
+    assert counter.rendered == ["2frame_strip2.png", "2frame_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_only_exports_using_edited_layer_are_redone(monkeypatch):
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp, name="split_blah1")
+        await export(root_dir, cache, name="split_blah1")
+        first_rendered = sorted(counter.rendered)
+
+        path = root_dir / paths.ANIMS_FOLDER / "split_blah1.aseprite"
+        path.write_bytes(edit_cel_position(path.read_bytes(), layer_index=1))
+        await export(root_dir, cache, name="split_blah1")
+
+    assert first_rendered == ["split_blah1_blah_strip1.png", "split_blah1_strip1.png"]
+    assert counter.rendered[2:] == ["split_blah1_blah_strip1.png"]
+
+
+@pytest.mark.asyncio
+async def test_retagging_an_anim_keeps_other_anims_cached(monkeypatch):
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    name = "1blah_2uair_1blah"
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp, name=name)
+        await export(root_dir, cache, name=name)
+        first_rendered = sorted(counter.rendered)
+
+        path = root_dir / paths.ANIMS_FOLDER / f"{name}.aseprite"
+        path.write_bytes(edit_tag_name(path.read_bytes(), "uair", "fair"))
+        await export(root_dir, cache, name=name)
+
+    assert first_rendered == [
+        "blah2_strip1.png",
+        "blah_strip1.png",
+        "uair_strip2.png",
+    ]
+    assert counter.rendered[3:] == ["fair_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_drawn_file_is_closed_after_exports():
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp)
+        aseprite = read_aseprite(
+            run_context=make_run_context(root_dir=root_dir),
+            path=root_dir / paths.ANIMS_FOLDER / "2frame.aseprite",
+        )
+        # Read, as drawing the anims does.
+        mapping = aseprite.content.file_with_pixels._mmap
+
+        await save_anims(
+            path_params=AsepritePathParams(
+                exe_dir=root_dir,
+                root_dir=root_dir,
+                aseprite_program_path=Path("no_aseprite_when_testing_native_exports"),
+            ),
+            config_params=AsepriteConfigParams(native_exports=True),
+            aseprites=[aseprite],
+            export_cache=ExportCache(),
+        )
+
+        assert get_strip_path(root_dir).exists()
+    assert mapping.closed
+    assert aseprite.content._file_with_pixels is None
+
+
+@pytest.mark.asyncio
+async def test_export_with_other_renderer_is_redone(monkeypatch):
+    aseprite_exported = []
+
+    async def run_lua_exports(jobs, path_params, scheduler):
+        for job in jobs:
+            aseprite_exported.append(job.dest_name)
+            job.get_dest(path_params.root_dir).write_bytes(b"aseprite export")
+
+    monkeypatch.setattr(exporting, "_run_lua_exports", run_lua_exports)
+    counter = RenderCounter(monkeypatch)
+    cache = ExportCache()
+    with TempDirectory() as tmp:
+        root_dir = supply_root_dir(tmp)
+
+        await export(root_dir, cache)
+        await export(root_dir, cache, native_exports=False)
+        await export(root_dir, cache, native_exports=False)
+        await export(root_dir, cache)
+
+    assert counter.rendered == ["2frame_strip2.png", "2frame_strip2.png"]
+    assert aseprite_exported == ["2frame_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_missing_aseprite_export_is_an_error_and_not_cached(monkeypatch):
+    async def run_all_without_output(self, runs):
+        return [True for _ in runs]
+
+    monkeypatch.setattr(ExportScheduler, "run_all", run_all_without_output)
+    errors = []
+    handler_id = logger.add(errors.append, level="ERROR")
+    cache = ExportCache()
+    try:
+        with TempDirectory() as tmp:
+            root_dir = supply_root_dir(tmp)
+            await export(root_dir, cache, native_exports=False)
+    finally:
+        logger.remove(handler_id)
+
+    assert [error.record["message"] for error in errors] == [
+        "Exported spritesheet 2frame_strip2.png not found, "
+        "although no error from aseprite."
+    ]
+    assert cache.entries == {}
+
+
+def test_cache_round_trip():
+    cache = ExportCache(
+        entries={
+            "a_strip1.png": {
+                "key": "abc",
+                "output_hash": "def",
+                "size": 1,
+                "mtime_ns": 2,
+            }
+        }
+    )
+    with TempDirectory() as tmp:
+        save_cache(Path(tmp.path), cache)
+        assert read_cache(Path(tmp.path)).entries == cache.entries
+
+
+def test_missing_cache_is_empty():
+    with TempDirectory() as tmp:
+        assert read_cache(Path(tmp.path)).entries == {}
@@ -0,0 +1,148 @@
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.exporting import (
+    ExportJob,
+    make_manifest,
+    shard_jobs,
+)
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    EXPORT_ASEPRITE_LUA_PATH,
+    CREATE_HURTBOX_LUA_PATH,
+)
+from rivals_workshop_assistant.aseprite_handling.scheduling import format_param_value
+from tests.testing_helpers import make_run_context
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+PATH_PARAMS = AsepritePathParams(
+    exe_dir=Path("exe_dir"),
+    root_dir=Path("root_dir"),
+    aseprite_program_path=Path("aseprite"),
+)
+
+
+def make_job(file_name="a", base_name="a", start=0, end=0, script_name=None):
+    if script_name is None:
+        script_name = EXPORT_ASEPRITE_LUA_PATH
+    return ExportJob(
+        aseprite_file_path=Path(f"anims/{file_name}.aseprite"),
+        base_name=base_name,
+        start=start,
+        end=end,
+        script_name=script_name,
+        lua_params={"scale": 2, "targetLayers": [1, 3]},
+    )
+
+
+def test_make_manifest_groups_jobs_by_file():
+    jobs = [
+        make_job(file_name="a", base_name="a"),
+        make_job(file_name="b", base_name="b", start=1, end=2),
+        make_job(
+            file_name="a", base_name="a_hurt", script_name=CREATE_HURTBOX_LUA_PATH
+        ),
+    ]
+
+    manifest = make_manifest(jobs, PATH_PARAMS)
+
+    assert [file["filename"] for file in manifest["files"]] == [
+        str(Path("anims/a.aseprite")),
+        str(Path("anims/b.aseprite")),
+    ]
+    a_jobs = manifest["files"][0]["jobs"]
+    assert [Path(job["script"]).name for job in a_jobs] == [
+        EXPORT_ASEPRITE_LUA_PATH,
+        CREATE_HURTBOX_LUA_PATH,
+    ]
+    assert manifest["files"][1]["jobs"][0]["params"] == {
+        "filename": str(Path("anims/b.aseprite")),
+        "dest": str(Path("root_dir/sprites/b_strip2.png")),
+        "startFrame": "2",
+        "endFrame": "3",
+        "scale": "2",
+        "targetLayers": "1,3",
+    }
+
+
+@pytest.mark.parametrize(
+    "frame_counts, num_shards, expected_shard_files",
+    [
+        pytest.param({"a": 1}, 4, [["a"]]),
+        pytest.param({"a": 5, "b": 1, "c": 1, "d": 3}, 2, [["a"], ["d", "b", "c"]]),
+        pytest.param({"a": 1, "b": 1, "c": 1}, 1, [["a", "b", "c"]]),
+    ],
+)
+def test_shard_jobs(frame_counts, num_shards, expected_shard_files):
+    jobs = [
+        make_job(file_name=name, base_name=name, end=frame_count - 1)
+        for name, frame_count in frame_counts.items()
+    ]
+
+    shards = shard_jobs(jobs, num_shards)
+
+    assert [
+        [job.aseprite_file_path.stem for job in shard] for shard in shards
+    ] == expected_shard_files
+
+
+def test_shard_jobs_keeps_files_together():
+    jobs = [
+        make_job(file_name="a", base_name="a"),
+        make_job(file_name="b", base_name="b"),
+        make_job(file_name="a", base_name="a_hurt"),
+    ]
+
+    shards = shard_jobs(jobs, num_shards=2)
+
+    assert sorted(len(shard) for shard in shards) == [1, 2]
+    for shard in shards:
+        assert len({job.aseprite_file_path for job in shard}) == 1
+
+
+@pytest.mark.parametrize(
+    "name, expected_hurtbox_layer, expected_hurtmask_layer",
+    [
+        pytest.param("1blah_2uair_1blah_with_hurtbox_layer", "3", "2"),
+        pytest.param("2uair_2dair_hurtmask", "None", "2"),
+    ],
+)
+def test_hurtbox_jobs_get_lua_layer_indices(
+    name, expected_hurtbox_layer, expected_hurtmask_layer
+):
+    """The hurtbox script is given the HURTBOX and HURTMASK layers' lua indices,
+    which tonumber reads, and which count layers like its getLayers does."""
+    aseprite = read_aseprite(
+        run_context=make_run_context(root_dir=TEST_SPRITES_PATH),
+        path=TEST_SPRITES_PATH / f"{name}.aseprite",
+    )
+    uair = next(anim for anim in aseprite.anims if anim.name == "uair")
+
+    jobs = uair.get_export_jobs(
+        path_params=PATH_PARAMS,
+        config_params=AsepriteConfigParams(hurtboxes_enabled=True),
+        aseprite_file_path=aseprite.path,
+    )
+
+    hurtbox_job = next(
+        job for job in jobs if job.script_name == CREATE_HURTBOX_LUA_PATH
+    )
+    hurtbox_layer = hurtbox_job.lua_params["hurtboxLayer"]
+    hurtmask_layer = hurtbox_job.lua_params["hurtmaskLayer"]
+    assert format_param_value(hurtbox_layer) == expected_hurtbox_layer
+    assert format_param_value(hurtmask_layer) == expected_hurtmask_layer
+
+    indexed_layers = aseprite.content.layers.indexed_layers
+    assert [
+        layer.name for layer in indexed_layers.from_lua_indices([hurtmask_layer])
+    ] == ["HURTMASK"]
+    if hurtbox_layer is not None:
+        assert [
+            layer.name for layer in indexed_layers.from_lua_indices([hurtbox_layer])
+        ] == ["HURTBOX"]
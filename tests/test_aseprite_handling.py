@@ -243,3 +243,18 @@ def test_anim_with_different_previous_hash_is_fresh():
 def test_anim_with_matching_previous_hash_is_not_fresh():
     anim = make_anim(name="name", anim_hashes={"name": MY_HASH}, frame_hash=MY_HASH)
     assert not anim.is_fresh
+
+
+def test_anim_of_unchanged_file_is_not_hashed():
+    anim_hashes = {"name": MY_HASH}
+    anim = Anim(
+        name="name",
+        start=1,
+        end=2,
+        content=None,
+        file_is_fresh=False,
+        anim_hashes=anim_hashes,
+    )
+    assert not anim.is_fresh
+    assert anim._frame_hash is None
+    assert anim_hashes == {"name": MY_HASH}
@@ -9,8 +9,17 @@ from rivals_workshop_assistant.aseprite_handling import (
     AsepritePathParams,
     AsepriteConfigParams,
 )
+from rivals_workshop_assistant.aseprite_handling import native_rendering
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+)
 from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.exporting import ExportJob
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    EXPORT_ASEPRITE_LUA_PATH,
+)
 from rivals_workshop_assistant.assistant_config_mod import ANIM_TAG_COLOR_FIELD
+from tests.aseprite_writer import SyntheticAseprite, write_aseprite, link_cel
 from tests.testing_helpers import (
     get_aseprite_path,
     assert_images_equal,
@@ -38,6 +47,7 @@ async def assert_aseprite_saves_right_anims(
     assistant_config: dict = None,
     has_small_sprites: bool = False,
     hurtboxes_enabled: bool = False,
+    native_exports: bool = False,
 ):
     if expected_missing_file_names is None:
         expected_missing_file_names = []
@@ -46,7 +56,11 @@ async def assert_aseprite_saves_right_anims(
     if assistant_config is None:
         assistant_config = {}
 
-    aseprite_path = get_aseprite_path()
+    if native_exports:
+        # Falling back to aseprite would fail to make the files.
+        aseprite_path = Path("no_aseprite_when_testing_native_exports")
+    else:
+        aseprite_path = get_aseprite_path()
 
     path = TEST_SPRITES_PATH / f"{aseprite_file_name}.aseprite"
     aseprite = read_aseprite(
@@ -66,6 +80,7 @@ async def assert_aseprite_saves_right_anims(
             config_params=AsepriteConfigParams(
                 has_small_sprites=has_small_sprites,
                 hurtboxes_enabled=hurtboxes_enabled,
+                native_exports=native_exports,
             ),
         )
 
@@ -443,3 +458,191 @@ async def test_aseprite_export__with_opts(
         expected_missing_file_names=expected_missing_file_names,
         hurtboxes_enabled=True,
     )
+
+
+@pytest.mark.parametrize(
+    "aseprite_file_name, save_file_names, expected_file_names",
+    [
+        pytest.param("1frame", ["1frame_strip1"], ["1frame"]),
+        pytest.param("2frame", ["2frame_strip2"], ["2frame"]),
+        pytest.param("2frame_with_groups", ["2frame_with_groups_strip2"], ["2frame"]),
+        pytest.param(
+            "1frame_2frame", ["1frame_strip1", "2frame_strip2"], ["1frame", "2frame"]
+        ),
+        pytest.param(
+            "1frame_1bair",
+            ["1frame_strip1", "bair_strip1"],
+            ["1frame", "bair_big"],
+        ),
+        pytest.param("1frame_hurtmask", ["1frame_hurtmask_strip1"], ["1frame"]),
+        pytest.param(
+            "1frame_hurtbox_layer", ["1frame_hurtbox_layer_strip1"], ["1frame"]
+        ),
+        pytest.param("1has_flattened", ["1has_flattened_strip1"], ["1has_flattened"]),
+        pytest.param(
+            "1frame_with_hidden_above", ["1frame_with_hidden_above_strip1"], ["1frame"]
+        ),
+        pytest.param(
+            "1frame_with_hidden_below", ["1frame_with_hidden_below_strip1"], ["1frame"]
+        ),
+        pytest.param(
+            "split_blah1",
+            ["split_blah1_strip1", "split_blah1_blah_strip1"],
+            ["split_blah1_normal", "split_blah1_blah"],
+        ),
+        pytest.param(
+            "split_blah1_2layers",
+            ["split_blah1_2layers_strip1", "split_blah1_2layers_blah_strip1"],
+            ["split_blah1_normal", "split_blah1_blahleftright"],
+        ),
+        pytest.param(
+            "split_foobar1_groups",
+            [
+                "split_foobar1_groups_strip1",
+                "split_foobar1_groups_foo_strip1",
+                "split_foobar1_groups_bar_strip1",
+            ],
+            ["split_blah1_normal", "split_blah1_blah", "split_foobar_bar"],
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_native_export(aseprite_file_name, save_file_names, expected_file_names):
+    await assert_aseprite_saves_right_anims(
+        aseprite_file_name=aseprite_file_name,
+        save_file_names=save_file_names,
+        expected_file_names=expected_file_names,
+        native_exports=True,
+    )
+
+
+def test_native_export__indexed_sprite_is_left_to_aseprite():
+    job = ExportJob(
+        aseprite_file_path=TEST_SPRITES_PATH / "opt_hat.aseprite",
+        base_name="opt_hat",
+        start=0,
+        end=0,
+        script_name=EXPORT_ASEPRITE_LUA_PATH,
+        lua_params={"scale": 2, "targetLayers": [1]},
+    )
+    with pytest.raises(native_rendering.UnsupportedByNativeRenderer):
+        native_rendering.render_export_job(
+            job, RawAsepriteFile.from_path(job.aseprite_file_path)
+        )
+
+
+def test_native_export__partial_opacity_is_left_to_aseprite():
+    file = RawAsepriteFile(write_aseprite(SyntheticAseprite(frames=1, cel_opacity=128)))
+
+    with pytest.raises(native_rendering.UnsupportedByNativeRenderer):
+        native_rendering.render_strip(
+            file_data=file, start=0, end=0, target_layers=file.layers, scale=1
+        )
+
+
+def test_native_export__transparent_cels_arent_drawn():
+    file = RawAsepriteFile(write_aseprite(SyntheticAseprite(frames=1, cel_opacity=0)))
+
+    strip = native_rendering.render_strip(
+        file_data=file, start=0, end=0, target_layers=file.layers, scale=1
+    )
+
+    assert strip.getchannel("A").getextrema() == (0, 0)
+
+
+@pytest.mark.parametrize(
+    "render",
+    [
+        pytest.param(native_rendering.render_strip),
+        pytest.param(native_rendering.render_hurtbox_strip),
+    ],
+)
+def test_native_export__linked_frames_are_drawn_once(monkeypatch, render):
+    data = (TEST_SPRITES_PATH / "2frame.aseprite").read_bytes()
+    linked = RawAsepriteFile(link_cel(data, frame_index=1, linked_frame_index=0))
+    drawn_frames = []
+    add_cel_mask = native_rendering._add_cel_mask
+    render_frame = native_rendering.render_frame
+
+    def counting_add_cel_mask(file_data, mask, layer, frame_index):
+        drawn_frames.append(frame_index)
+        return add_cel_mask(file_data, mask, layer, frame_index)
+
+    def counting_render_frame(file_data, frame_index, drawn_layers):
+        drawn_frames.append(frame_index)
+        return render_frame(file_data, frame_index, drawn_layers)
+
+    monkeypatch.setattr(native_rendering, "_add_cel_mask", counting_add_cel_mask)
+    monkeypatch.setattr(native_rendering, "render_frame", counting_render_frame)
+
+    strip = render(
+        file_data=linked, start=0, end=1, target_layers=linked.layers, scale=1
+    )
+
+    assert drawn_frames == [0]
+    width = linked.header.width
+    assert strip.crop((0, 0, width, strip.height)).tobytes() == (
+        strip.crop((width, 0, width * 2, strip.height)).tobytes()
+    )
+
+
+@pytest.mark.parametrize(
+    "aseprite_file_name, "
+    "save_file_names, "
+    "expected_file_names, "
+    "expected_missing_file_names",
+    [
+        pytest.param("1frame", [], [], ["1frame_hurt_strip1"]),
+        pytest.param(
+            "1frame_1bair", ["bair_hurt_strip1"], ["bair_hurt"], ["1frame_hurt_strip1"]
+        ),
+        pytest.param(
+            "wrong_color_type", ["fair_hurt_strip1"], ["wrong_color_type"], []
+        ),
+        pytest.param("with_hidden_layer", ["bair_hurt_strip1"], ["bair_hurt"], []),
+        pytest.param("fair", ["fair_hurt_strip1"], ["fair_hurt"], []),
+        pytest.param("dair", ["dair_hurt_strip1"], ["fair_hurt"], []),
+        pytest.param(
+            "1blah_2uair_1blah",
+            ["uair_hurt_strip2"],
+            ["uair_hurt"],
+            ["blah_hurt_strip1", "blah2_hurt_strip1"],
+        ),
+        pytest.param(
+            "2uair_2dair_hurtmask",
+            ["uair_hurt_strip2", "dair_hurt_strip2"],
+            ["uair_hurt", "dair_hurt"],
+            [],
+        ),
+        pytest.param(
+            "1blah_1ftilt", ["ftilt_hurt_strip1"], ["ftilt_hurt"], ["blah_hurt_strip1"]
+        ),
+        pytest.param(
+            "1blah_1ftilt_with_mask",
+            ["ftilt_hurt_strip1"],
+            ["ftilt_hurt_with_mask"],
+            ["blah_hurt_strip1"],
+        ),
+        pytest.param(
+            "hurt_layers_fair", ["fair_hurt_strip1"], ["hurt_layers_fair"], []
+        ),
+        pytest.param(
+            "nohurt_meta_fair", ["fair_hurt_strip1"], ["nohurt_meta_fair"], []
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_native_export_hurtbox(
+    aseprite_file_name,
+    save_file_names,
+    expected_file_names,
+    expected_missing_file_names,
+):
+    await assert_aseprite_saves_right_anims(
+        aseprite_file_name=aseprite_file_name,
+        save_file_names=save_file_names,
+        expected_file_names=expected_file_names,
+        expected_missing_file_names=expected_missing_file_names,
+        hurtboxes_enabled=True,
+        native_exports=True,
+    )
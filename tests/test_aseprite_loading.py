@@ -0,0 +1,545 @@
+import mmap
+import pickle
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+    CelChunk,
+    combine_structure_hashes,
+    LayerChunk,
+    LazyCelData,
+    ParseProfile,
+    RawCelData,
+    decode_pixels,
+    GRAYSCALE_COLOR_DEPTH,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    chunk_registry,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.chunk_registry import (
+    CHUNK_PARSERS,
+    COLOR_PROFILE_CHUNK_TYPE,
+    PROFILE_MODES,
+    ParseMode,
+    register_chunk_type,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.chunks import (
+    InflatedCelCache,
+    ColorProfileChunk,
+    FrameTagsChunk,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.layer_index import (
+    LayerRole,
+)
+from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
+from rivals_workshop_assistant.aseprite_handling.metadata import read_metadata
+from tests.aseprite_writer import (
+    SyntheticAseprite,
+    write_aseprite,
+    edit_cel_position,
+    edit_tag_name,
+    link_cel,
+)
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def read_test_aseprite(name: str, **kwargs) -> RawAsepriteFile:
+    return RawAsepriteFile(
+        (TEST_SPRITES_PATH / f"{name}.aseprite").read_bytes(), **kwargs
+    )
+
+
+def get_cels(file: RawAsepriteFile):
+    return [
+        chunk
+        for frame in file.frames
+        for chunk in frame.chunks
+        if isinstance(chunk, CelChunk)
+    ]
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        pytest.param("nair"),
+        pytest.param("1blah_2uair_1blah"),
+        pytest.param("2frame_with_groups"),
+        pytest.param("split_foobar1_groups"),
+    ],
+)
+def test_metadata_only_matches_full_parse(name):
+    full = read_test_aseprite(name)
+    metadata = read_test_aseprite(name, profile=ParseProfile.SCRIPTS)
+
+    assert metadata.get_num_frames() == full.get_num_frames()
+    assert metadata.get_tags() == full.get_tags()
+    assert [layer.name for layer in metadata.layers] == [
+        layer.name for layer in full.layers
+    ]
+    assert [layer.name for layer in metadata.layer_tree] == [
+        layer.name for layer in full.layer_tree
+    ]
+
+
+def test_metadata_only_skips_cels():
+    assert get_cels(read_test_aseprite("nair"))
+    assert not get_cels(read_test_aseprite("nair", profile=ParseProfile.SCRIPTS))
+
+
+def test_from_path_matches_parsing_bytes():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    mapped = RawAsepriteFile.from_path(path)
+    read = RawAsepriteFile(path.read_bytes())
+
+    assert isinstance(mapped.data, memoryview)
+    assert mapped.get_num_frames() == read.get_num_frames()
+    assert [bytes(cel.data["data"]) for cel in get_cels(mapped)] == [
+        bytes(cel.data["data"]) for cel in get_cels(read)
+    ]
+
+
+def test_from_path_frames_can_be_pickled():
+    mapped = RawAsepriteFile.from_path(TEST_SPRITES_PATH / "nair.aseprite")
+    read = RawAsepriteFile((TEST_SPRITES_PATH / "nair.aseprite").read_bytes())
+
+    assert pickle.dumps(mapped.frames) == pickle.dumps(read.frames)
+
+
+def test_closed_file_is_unmapped_and_keeps_what_was_read():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    with RawAsepriteFile.from_path(path) as mapped:
+        mapping = mapped._mmap
+        mapped.cel_pixels(mapped.layers[0], 0)
+        tags = mapped.get_tags()
+
+    assert mapping.closed
+    assert [tag.name for tag in tags] == ["blah", "uair", "blah2"]
+    assert [layer.name for layer in mapped.layers] == [
+        layer.name for layer in RawAsepriteFile(path.read_bytes()).layers
+    ]
+
+
+def test_closed_file_keeps_tags_it_didnt_read_yet():
+    with RawAsepriteFile.from_path(
+        TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    ) as mapped:
+        pass
+
+    assert [tag.name for tag in mapped.get_tags()] == ["blah", "uair", "blah2"]
+
+
+def test_closing_a_file_keeps_other_files_cels_cached():
+    other = read_test_aseprite("1frame")
+    other_pixels = other.cel_pixels(other.layers[0], 0)
+    with RawAsepriteFile.from_path(TEST_SPRITES_PATH / "2frame.aseprite") as mapped:
+        mapped.cel_pixels(mapped.layers[0], 0)
+
+    assert other.cel_pixels(other.layers[0], 0) is other_pixels
+
+
+def track_mmaps(monkeypatch) -> list:
+    mappings = []
+    real_mmap = mmap.mmap
+
+    def tracking_mmap(*args, **kwargs):
+        mappings.append(real_mmap(*args, **kwargs))
+        return mappings[-1]
+
+    monkeypatch.setattr(mmap, "mmap", tracking_mmap)
+    return mappings
+
+
+def test_truncated_file_is_unmapped(monkeypatch, tmp_path):
+    data = (TEST_SPRITES_PATH / "2frame_with_groups.aseprite").read_bytes()
+    path = tmp_path / "truncated.aseprite"
+    path.write_bytes(data[: len(data) // 2])
+    mappings = track_mmaps(monkeypatch)
+
+    with pytest.raises(struct.error):
+        RawAsepriteFile.from_path(path)
+
+    assert [mapping.closed for mapping in mappings] == [True]
+
+
+def test_read_metadata_unmaps_file(monkeypatch):
+    mappings = track_mmaps(monkeypatch)
+    metadata = read_metadata(TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite")
+
+    assert metadata.get_num_frames() == 4
+    assert [mapping.closed for mapping in mappings] == [True]
+
+
+def test_compressed_cels_inflate_on_access():
+    cel = get_cels(read_test_aseprite("1frame"))[0]
+    assert isinstance(cel.data, LazyCelData)
+
+    pixels = cel.data["data"]
+    assert len(pixels) == cel.data["width"] * cel.data["height"] * 4
+    assert pixels == zlib.decompress(cel.data.compressed)
+
+
+def test_inflated_cel_cache_reuses_recent_cels():
+    cache = InflatedCelCache(max_size=1)
+    first, second = get_cels(read_test_aseprite("2frame"))
+
+    assert cache.get(first.data) is cache.get(first.data)
+    first_pixels = cache.get(first.data)
+    cache.get(second.data)
+    assert cache.get(first.data) is not first_pixels
+    assert cache.get(first.data) == first_pixels
+
+
+def test_inflated_cel_cache_can_be_disabled():
+    cache = InflatedCelCache(max_size=0)
+    cel = get_cels(read_test_aseprite("1frame"))[0]
+
+    assert cache.get(cel.data) is not cache.get(cel.data)
+
+
+def test_frame_bytes_cover_the_whole_file():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    file = RawAsepriteFile.from_path(path, profile=ParseProfile.SCRIPTS)
+
+    frame_bytes = b"".join(
+        bytes(file.get_frame_bytes(i)) for i in range(file.get_num_frames())
+    )
+    assert frame_bytes == path.read_bytes()[file.frames[0].offset :]
+
+
+def test_frames_hash_ignores_parse_mode():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    full = RawAsepriteFile(path.read_bytes())
+    metadata = RawAsepriteFile.from_path(path, profile=ParseProfile.SCRIPTS)
+
+    assert full.get_frames_hash(1, 2) == metadata.get_frames_hash(1, 2)
+    assert full.get_frames_hash(1, 2) != full.get_frames_hash(1, 3)
+
+
+def test_frames_hash_only_changes_with_its_frames():
+    path = TEST_SPRITES_PATH / "2frame.aseprite"
+    original = RawAsepriteFile(path.read_bytes())
+
+    edited_data = bytearray(path.read_bytes())
+    last_frame = original.frames[1]
+    last_byte = last_frame.offset + last_frame.size - 1
+    edited_data[last_byte] ^= 0xFF
+    edited = RawAsepriteFile(bytes(edited_data))
+
+    assert edited.get_frames_hash(0, 0) == original.get_frames_hash(0, 0)
+    assert edited.get_frames_hash(1, 1) != original.get_frames_hash(1, 1)
+
+
+@pytest.mark.parametrize("profile", [pytest.param(profile) for profile in ParseProfile])
+def test_layer_user_data(profile):
+    file = read_test_aseprite("nohurt_meta_fair", profile=profile)
+
+    assert [layer.user_data for layer in file.layers] == ["NOHURT", ""]
+
+
+def test_structure_hash_ignores_cels():
+    path = TEST_SPRITES_PATH / "2frame.aseprite"
+    original = RawAsepriteFile(path.read_bytes())
+
+    edited_data = bytearray(path.read_bytes())
+    last_frame = original.frames[1]
+    edited_data[last_frame.offset + last_frame.size - 1] ^= 0xFF
+    edited = RawAsepriteFile(bytes(edited_data))
+
+    assert edited.get_structure_hash(edited.layers) == original.get_structure_hash(
+        original.layers
+    )
+    hurtmask = read_test_aseprite("1frame_hurtmask")
+    normal = read_test_aseprite("1frame")
+    assert hurtmask.get_structure_hash(hurtmask.layers) != normal.get_structure_hash(
+        normal.layers
+    )
+
+
+def test_structure_hash_ignores_tags():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    original = RawAsepriteFile(path.read_bytes())
+    edited = RawAsepriteFile(edit_tag_name(path.read_bytes(), "uair", "fair"))
+
+    assert [tag.name for tag in edited.get_tags()] == ["blah", "fair", "blah2"]
+    assert edited.get_structure_hash(edited.layers) == original.get_structure_hash(
+        original.layers
+    )
+
+
+def test_structure_hash_only_covers_the_layers_and_their_groups():
+    file = read_test_aseprite("split_foobar1_groups")
+    group_2, foo, regular, group_1, bar = file.layers
+
+    def get_hash(layers):
+        return file.get_structure_hash(layers)
+
+    assert get_hash([foo]) != get_hash([bar])
+    assert get_hash([foo]) != get_hash([regular])
+    assert get_hash([foo, regular]) == get_hash([regular, foo])
+    assert get_hash([foo]) == combine_structure_hashes(
+        *file.get_structure_hashes(), file.indexed_layers, [group_2, foo]
+    )
+
+
+def test_cel_hashes_only_change_for_edited_layer():
+    path = TEST_SPRITES_PATH / "split_blah1.aseprite"
+    original = RawAsepriteFile(path.read_bytes())
+    edited = RawAsepriteFile(edit_cel_position(path.read_bytes(), layer_index=1))
+    normal_layer, split_layer = original.layers
+
+    assert original.get_cel_hashes(0)[0] == edited.get_cel_hashes(0)[0]
+    assert original.get_cel_hashes(0)[1] != edited.get_cel_hashes(0)[1]
+    assert original.get_layers_hash(0, 0, [normal_layer]) == edited.get_layers_hash(
+        0, 0, [edited.layers[0]]
+    )
+    assert original.get_layers_hash(0, 0, [split_layer]) != edited.get_layers_hash(
+        0, 0, [edited.layers[1]]
+    )
+
+
+def test_layers_hash_same_without_pixels():
+    full = read_test_aseprite("split_blah1")
+    metadata_only = read_test_aseprite("split_blah1", profile=ParseProfile.SCRIPTS)
+
+    assert full.get_layers_hash(0, 0, full.layers) == metadata_only.get_layers_hash(
+        0, 0, metadata_only.layers
+    )
+
+
+def test_frames_are_parsed_on_demand():
+    file = read_test_aseprite("1frame_2frame")
+    assert file.get_num_frames() == 3
+    assert [frame.is_parsed for frame in file.frames] == [False, False, False]
+
+    frames = file.frames_in_range(1, 1)
+
+    assert frames == [file.frames[1]]
+    assert [frame.is_parsed for frame in file.frames] == [False, True, False]
+    assert [(cel.layer_index, cel.x_pos, cel.y_pos) for cel in get_cels(file)] == [
+        (cel.layer_index, cel.x_pos, cel.y_pos)
+        for cel in get_cels(read_test_aseprite("1frame_2frame"))
+    ]
+
+
+def test_chunks_are_slotted():
+    file = read_test_aseprite("2frame_with_groups")
+    chunks = [chunk for frame in file.frames for chunk in frame.chunks]
+
+    assert chunks
+    assert not any(hasattr(chunk, "__dict__") for chunk in chunks)
+
+
+def test_pickled_chunks_keep_their_values():
+    file = read_test_aseprite("1frame_2frame_red_tag")
+
+    unpickled = pickle.loads(pickle.dumps(file.frames))
+
+    unpickled_layers = [
+        chunk for chunk in unpickled[0].chunks if isinstance(chunk, LayerChunk)
+    ]
+    assert [layer.name for layer in unpickled_layers] == [
+        layer.name for layer in file.layers
+    ]
+    assert [bytes(cel.data.pixels) for cel in get_cels(file)] == [
+        bytes(chunk.data.pixels)
+        for frame in unpickled
+        for chunk in frame.chunks
+        if isinstance(chunk, CelChunk)
+    ]
+
+
+def get_chunk_types(file: RawAsepriteFile):
+    return [type(chunk) for chunk in file.frames[0].chunks]
+
+
+def test_profiles_only_parse_their_chunk_types():
+    scripts = read_test_aseprite("nair", profile=ParseProfile.SCRIPTS)
+    rendering = read_test_aseprite("nair", profile=ParseProfile.RENDERING)
+
+    assert get_chunk_types(scripts) == [LayerChunk, FrameTagsChunk]
+    assert ColorProfileChunk in get_chunk_types(rendering)
+    assert CelChunk in get_chunk_types(rendering)
+
+
+def test_registered_chunk_type_is_parsed(monkeypatch):
+    monkeypatch.setattr(chunk_registry, "CHUNK_PARSERS", dict(CHUNK_PARSERS))
+    monkeypatch.setattr(
+        chunk_registry,
+        "PROFILE_MODES",
+        {profile: dict(modes) for profile, modes in PROFILE_MODES.items()},
+    )
+
+    register_chunk_type(
+        COLOR_PROFILE_CHUNK_TYPE,
+        ColorProfileChunk,
+        modes={ParseProfile.SCRIPTS: ParseMode.LAZY},
+    )
+
+    scripts = read_test_aseprite("nair", profile=ParseProfile.SCRIPTS)
+    assert ColorProfileChunk in get_chunk_types(scripts)
+    rendering = read_test_aseprite("nair", profile=ParseProfile.RENDERING)
+    assert ColorProfileChunk not in get_chunk_types(rendering)
+
+
+def test_cel_pixels_are_a_view_of_rgba_data():
+    file = read_test_aseprite("1frame")
+    layer = file.layers[0]
+
+    pixels = file.cel_pixels(layer, 0)
+
+    cel = file.get_cel(layer, 0)
+    assert pixels.shape == (cel.data.height, cel.data.width, 4)
+    assert not pixels.flags.owndata
+    assert not pixels.flags.writeable
+    assert pixels.tobytes() == bytes(cel.data.pixels)
+
+
+def test_cel_pixels_of_layer_without_cel():
+    file = read_test_aseprite("1blah_1ftilt")
+    assert file.cel_pixels(file.layers[1], 0) is None
+
+
+def test_indexed_cel_pixels_use_palette():
+    file = read_test_aseprite("opt_hat")
+    layer = file.layers[0]
+    cel = file.get_cel(layer, 0)
+    indices = np.frombuffer(cel.data.pixels, dtype=np.uint8).reshape(
+        cel.data.height, cel.data.width
+    )
+
+    pixels = file.cel_pixels(layer, 0)
+
+    expected = file.get_palette()[indices]
+    expected[indices == file.header.palette_mask] = 0
+    assert (pixels == expected).all()
+    assert pixels[:, :, 3].any()
+
+
+def test_grayscale_pixels_are_expanded():
+    cel_data = RawCelData(width=2, height=1, raw_pixels=bytes([10, 255, 20, 0]))
+
+    pixels = decode_pixels(cel_data, color_depth=GRAYSCALE_COLOR_DEPTH)
+
+    assert pixels.tolist() == [[[10, 10, 10, 255], [20, 20, 20, 0]]]
+
+
+def test_linked_cel_pixels_share_source_array():
+    data = (TEST_SPRITES_PATH / "2frame.aseprite").read_bytes()
+    file = RawAsepriteFile(link_cel(data, frame_index=1, linked_frame_index=0))
+    layer = file.layers[0]
+
+    assert file.get_cel(layer, 1).cel_type == 1
+    assert file.cel_pixels(layer, 1) is file.cel_pixels(layer, 0)
+
+
+def test_linked_cel_hashes_like_its_source():
+    data = (TEST_SPRITES_PATH / "2frame.aseprite").read_bytes()
+    original = RawAsepriteFile(data)
+    linked = RawAsepriteFile(link_cel(data, frame_index=1, linked_frame_index=0))
+
+    assert original.get_cel_hashes(1) != original.get_cel_hashes(0)
+    assert linked.get_cel_hashes(1) == linked.get_cel_hashes(0)
+    assert linked.get_cel_hashes(0) == original.get_cel_hashes(0)
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        pytest.param(
+            "split_foobar1_groups",
+            [
+                ("Group 2", 0, None, (), LayerRole.GROUP, None),
+                ("SPLIT(foo)", 1, 1, ("Group 2",), LayerRole.SPLIT, "foo"),
+                ("regular", 2, 2, ("Group 2",), LayerRole.NORMAL, None),
+                ("Group 1", 3, None, (), LayerRole.GROUP, None),
+                ("SPLIT(bar)", 4, 3, ("Group 1",), LayerRole.SPLIT, "bar"),
+            ],
+        ),
+        pytest.param(
+            "2frame_with_groups",
+            [
+                ("Group 3", 0, None, (), LayerRole.GROUP, None),
+                ("Group 2", 1, None, ("Group 3",), LayerRole.GROUP, None),
+                ("Layer 1", 2, 1, ("Group 3", "Group 2"), LayerRole.NORMAL, None),
+                ("Group 1", 3, None, (), LayerRole.GROUP, None),
+            ],
+        ),
+        pytest.param(
+            "1blah_1ftilt_with_mask",
+            [
+                ("Layer 1", 0, 1, (), LayerRole.NORMAL, None),
+                ("HURTBOX", 1, 2, (), LayerRole.HURTBOX, None),
+                ("HURTMASK", 2, 3, (), LayerRole.HURTMASK, None),
+            ],
+        ),
+        pytest.param(
+            "nohurt_meta_fair",
+            [
+                ("has no hurt meta", 0, 1, (), LayerRole.NOHURT, None),
+                ("Layer 2", 1, 2, (), LayerRole.NORMAL, None),
+            ],
+        ),
+    ],
+)
+def test_indexed_layers(name, expected):
+    file = read_test_aseprite(name)
+
+    assert [
+        (
+            entry.layer.name,
+            entry.file_index,
+            entry.lua_index,
+            entry.group_path,
+            entry.role,
+            entry.role_name,
+        )
+        for entry in file.indexed_layers
+    ] == expected
+
+
+def test_tilemap_layers_arent_exported():
+    file = RawAsepriteFile(
+        write_aseprite(SyntheticAseprite(frames=1, layers=2, tilemaps=1, anim_tags=0))
+    )
+    layers = AsepriteLayers.from_file(file)
+
+    assert [
+        (entry.layer.name, entry.lua_index, entry.role) for entry in file.indexed_layers
+    ] == [
+        ("layer0", 1, LayerRole.NORMAL),
+        ("layer1", 2, LayerRole.NORMAL),
+        ("tilemap0", 3, LayerRole.OTHER),
+    ]
+    assert [layer.name for layer in layers.normals] == ["layer0", "layer1"]
+
+
+def test_indexed_layers_tree():
+    file = read_test_aseprite("2frame_with_groups")
+    group_3, group_2, layer_1, group_1 = file.layers
+
+    assert file.layer_tree == (group_3, group_1)
+    assert file.indexed_layers.get_children(group_3) == (group_2,)
+    assert file.indexed_layers.get_children(group_2) == (layer_1,)
+    assert file.indexed_layers.get_children(group_1) == ()
+
+
+def test_aseprite_layers_leave_layer_indices_alone():
+    file = read_test_aseprite("split_foobar1_groups")
+    file_indices = [layer.layer_index for layer in file.layers]
+
+    AsepriteLayers.from_file(file)
+    layers = AsepriteLayers.from_file(file)
+
+    assert [layer.layer_index for layer in file.layers] == file_indices
+    assert layers.indexed_layers is file.indexed_layers
+    assert layers.indexed_layers.get_lua_indices(layers.normals) == [2]
+    assert {
+        split_name: layers.indexed_layers.get_lua_indices(split_layers)
+        for split_name, split_layers in layers.splits.items()
+    } == {"foo": [1], "bar": [3]}
@@ -0,0 +1,118 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant.aseprite_handling import metadata
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+)
+from rivals_workshop_assistant.aseprite_handling.metadata import (
+    AsepriteMetadata,
+    AsepriteMetadataCache,
+)
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def assert_metadata_equal(actual: AsepriteMetadata, expected: AsepriteMetadata):
+    assert actual.get_num_frames() == expected.get_num_frames()
+    assert actual.get_tags() == expected.get_tags()
+    assert [
+        (layer.name, layer.flags, layer.layer_index) for layer in actual.layers
+    ] == [(layer.name, layer.flags, layer.layer_index) for layer in expected.layers]
+    assert [layer.name for layer in actual.layer_tree] == [
+        layer.name for layer in expected.layer_tree
+    ]
+    assert actual.frame_offsets == expected.frame_offsets
+    assert actual.get_frames_hash(0, actual.get_num_frames() - 1) == (
+        expected.get_frames_hash(0, expected.get_num_frames() - 1)
+    )
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        pytest.param("nair_multiple_colors"),
+        pytest.param("split_foobar1_groups"),
+    ],
+)
+def test_metadata_round_trips_through_dict(name):
+    original = metadata.read_metadata(TEST_SPRITES_PATH / f"{name}.aseprite")
+
+    assert_metadata_equal(AsepriteMetadata.from_dict(original.to_dict()), original)
+
+
+def test_metadata_hash_matches_file_hash():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    file_data = RawAsepriteFile.from_path(path)
+
+    assert metadata.read_metadata(path).get_frames_hash(1, 2) == (
+        file_data.get_frames_hash(1, 2)
+    )
+
+
+def test_cache_does_not_reread_unchanged_file(monkeypatch):
+    path = TEST_SPRITES_PATH / "nair.aseprite"
+    cache = AsepriteMetadataCache()
+    expected = cache.load(path)
+
+    def fail_read(_):
+        assert False, "Unchanged file was read"
+
+    monkeypatch.setattr(metadata, "read_metadata", fail_read)
+    assert_metadata_equal(cache.load(path), expected)
+
+
+def test_cache_rereads_changed_file():
+    with TempDirectory() as tmp:
+        path = Path(tmp.path) / "anim.aseprite"
+        shutil.copy(TEST_SPRITES_PATH / "1frame.aseprite", path)
+        cache = AsepriteMetadataCache()
+        assert cache.load(path).get_num_frames() == 1
+
+        shutil.copy(TEST_SPRITES_PATH / "2frame.aseprite", path)
+        os.utime(path, ns=(0, 12345))
+        assert cache.load(path).get_num_frames() == 2
+
+
+def test_cache_round_trips_through_file():
+    path = TEST_SPRITES_PATH / "nair.aseprite"
+    with TempDirectory() as tmp:
+        root_dir = Path(tmp.path)
+        cache = AsepriteMetadataCache()
+        expected = cache.load(path)
+        metadata.save_cache(root_dir, cache)
+
+        loaded_cache = metadata.read_cache(root_dir)
+        assert_metadata_equal(loaded_cache.get(path, path.stat()), expected)
+
+
+def test_cache_prune_forgets_other_files():
+    cache = AsepriteMetadataCache()
+    kept = TEST_SPRITES_PATH / "nair.aseprite"
+    forgotten = TEST_SPRITES_PATH / "1frame.aseprite"
+    cache.load(kept)
+    cache.load(forgotten)
+
+    cache.prune(keep=[kept])
+
+    assert cache.get(kept, kept.stat()) is not None
+    assert cache.get(forgotten, forgotten.stat()) is None
+
+
+def test_cache_preload_reads_missing_files_in_parallel():
+    paths = [
+        TEST_SPRITES_PATH / "nair.aseprite",
+        TEST_SPRITES_PATH / "1frame.aseprite",
+        TEST_SPRITES_PATH / "split_foobar1_groups.aseprite",
+    ]
+    stats = [path.stat() for path in paths]
+    cache = AsepriteMetadataCache()
+
+    cache.preload(paths=paths, stats=stats, workers=2)
+
+    for path, stat in zip(paths, stats):
+        assert_metadata_equal(cache.get(path, stat), metadata.read_metadata(path))
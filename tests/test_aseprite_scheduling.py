@@ -0,0 +1,133 @@
+import asyncio
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant.aseprite_handling.scheduling import (
+    ExportScheduler,
+    ScriptRun,
+    get_aseprite_args,
+)
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="The fake aseprite is a shebang script"
+)
+
+# Stands in for aseprite. Logs when it starts and ends, then sleeps and exits
+# according to its script params.
+FAKE_ASEPRITE = textwrap.dedent(f"""\
+    #!{sys.executable}
+    import sys, time
+    params = dict(
+        arg.split("=", 1) for arg in sys.argv[1:] if "=" in arg and "-" not in arg[:1]
+    )
+    with open(params["log"], "a") as log:
+        log.write(f"start {{params['name']}}\\n")
+    time.sleep(float(params.get("sleep", 0)))
+    with open(params["log"], "a") as log:
+        log.write(f"end {{params['name']}}\\n")
+    sys.exit(int(params.get("exit", 0)))
+    """)
+
+
+def make_fake_aseprite(tmp: TempDirectory) -> Path:
+    path = Path(tmp.path) / "aseprite"
+    path.write_text(FAKE_ASEPRITE)
+    path.chmod(0o755)
+    return path
+
+
+def make_run(log: Path, name: str, size: int = 1, **lua_params) -> ScriptRun:
+    return ScriptRun(
+        script_path=Path("script.lua"),
+        description=name,
+        lua_params={"log": log, "name": name, **lua_params},
+        size=size,
+    )
+
+
+def read_log(log: Path):
+    return log.read_text().splitlines()
+
+
+def test_get_aseprite_args():
+    run = ScriptRun(
+        script_path=Path("lua scripts/export.lua"),
+        description="",
+        lua_params={"dest": Path("my sprites/a.png"), "targetLayers": [1, 2]},
+    )
+
+    assert get_aseprite_args(Path("aseprite"), run) == [
+        "aseprite",
+        "-b",
+        "-script-param",
+        f"dest={Path('my sprites/a.png')}",
+        "-script-param",
+        "targetLayers=1,2",
+        "-script",
+        str(Path("lua scripts/export.lua")),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_all__limits_parallelism_and_starts_largest_first():
+    with TempDirectory() as tmp:
+        log = Path(tmp.path) / "log.txt"
+        scheduler = ExportScheduler(
+            make_fake_aseprite(tmp), max_parallel=1, timeout=10, retries=0
+        )
+
+        results = await scheduler.run_all(
+            [
+                make_run(log, "small", size=1),
+                make_run(log, "big", size=3),
+                make_run(log, "medium", size=2),
+            ]
+        )
+
+        assert results == [True, True, True]
+        assert read_log(log) == [
+            "start big",
+            "end big",
+            "start medium",
+            "end medium",
+            "start small",
+            "end small",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_run__failure_is_not_retried():
+    with TempDirectory() as tmp:
+        log = Path(tmp.path) / "log.txt"
+        scheduler = ExportScheduler(
+            make_fake_aseprite(tmp), max_parallel=1, timeout=10, retries=2
+        )
+
+        assert not await scheduler.run(make_run(log, "a", exit=1))
+        assert read_log(log) == ["start a", "end a"]
+
+
+@pytest.mark.asyncio
+async def test_run__hung_aseprite_is_stopped_and_retried():
+    with TempDirectory() as tmp:
+        log = Path(tmp.path) / "log.txt"
+        scheduler = ExportScheduler(
+            make_fake_aseprite(tmp), max_parallel=1, timeout=0.5, retries=1
+        )
+
+        assert not await scheduler.run(make_run(log, "a", sleep=5))
+        await asyncio.sleep(0.1)
+        assert read_log(log) == ["start a", "start a"]
+
+
+@pytest.mark.asyncio
+async def test_run__missing_aseprite_fails():
+    scheduler = ExportScheduler(
+        Path("no_aseprite_here"), max_parallel=1, timeout=10, retries=1
+    )
+
+    assert not await scheduler.run(make_run(Path("log.txt"), "a"))
@@ -0,0 +1,115 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from testfixtures import TempDirectory
+
+from benchmarks.exporting import ANIM_NAMES, export_all, make_root_dir
+from benchmarks.fake_aseprite import FAKE_VERSION, install_fake_aseprite, read_log
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import AsepriteConfigParams
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+)
+from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
+from tests.aseprite_writer import (
+    SyntheticAseprite,
+    write_aseprite,
+    get_layer_names,
+)
+from tests.testing_helpers import make_run_context
+
+skip_on_windows = pytest.mark.skipif(
+    sys.platform == "win32", reason="The fake aseprite is a shebang script"
+)
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        pytest.param(SyntheticAseprite(), id="default"),
+        pytest.param(SyntheticAseprite(layers=5, groups=2), id="groups"),
+        pytest.param(SyntheticAseprite(compression=None), id="raw"),
+        pytest.param(SyntheticAseprite(frames=5, linked_cels=True), id="linked"),
+    ],
+)
+def test_synthetic_aseprite_is_parsed(spec):
+    file = RawAsepriteFile(write_aseprite(spec))
+
+    assert file.get_num_frames() == spec.frames
+    layers = AsepriteLayers.from_file(file)
+    assert sorted(layer.name for layer in layers.normals) == sorted(
+        get_layer_names(spec)
+    )
+    for layer in layers.normals:
+        for frame_index in range(spec.frames):
+            pixels = file.cel_pixels(layer, frame_index)
+            assert pixels.shape == (spec.cel_height, spec.cel_width, 4)
+
+
+def test_synthetic_aseprite_tags():
+    file = RawAsepriteFile(
+        write_aseprite(SyntheticAseprite(frames=5, anim_tags=2, windows_per_tag=1))
+    )
+
+    assert [(tag.name, tag.start, tag.end, tag.color) for tag in file.get_tags()] == [
+        ("anim0", 0, 1, "blue"),
+        ("anim0_window0", 0, 0, "red"),
+        ("anim1", 2, 4, "blue"),
+        ("anim1_window0", 2, 2, "red"),
+    ]
+
+
+def test_synthetic_aseprite_linked_cels_share_pixels():
+    file = RawAsepriteFile(write_aseprite(SyntheticAseprite(linked_cels=True)))
+    layer = file.layers[0]
+
+    assert file.cel_pixels(layer, 1) is file.cel_pixels(layer, 0)
+    assert file.cel_pixels(layer, 2) is not file.cel_pixels(layer, 0)
+
+
+@skip_on_windows
+def test_fake_aseprite_version():
+    with TempDirectory() as tmp:
+        fake_aseprite = install_fake_aseprite(Path(tmp.path))
+
+        output = subprocess.check_output([str(fake_aseprite), "--version"])
+
+    assert output.decode("utf8").strip() == FAKE_VERSION
+
+
+@skip_on_windows
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "batch_exports, expected_runs",
+    [
+        # Each anim and its hurtbox.
+        pytest.param(False, 2 * len(ANIM_NAMES), id="per_job"),
+        pytest.param(True, 2, id="batched"),
+    ],
+)
+async def test_export_all_with_fake_aseprite(batch_exports, expected_runs):
+    with TempDirectory() as tmp:
+        root_dir = Path(tmp.path)
+        make_root_dir(root_dir)
+        log_path = root_dir / "log.txt"
+        fake_aseprite = install_fake_aseprite(
+            root_dir / "fake_aseprite", log_path=log_path
+        )
+
+        await export_all(
+            make_run_context(exe_dir=root_dir, root_dir=root_dir),
+            fake_aseprite,
+            AsepriteConfigParams(
+                hurtboxes_enabled=True,
+                batch_exports=batch_exports,
+                export_parallelism=2,
+            ),
+        )
+
+        assert len(read_log(log_path)) == expected_runs
+        strip = Image.open(root_dir / paths.SPRITES_FOLDER / "jab_strip8.png")
+        assert strip.size == (64 * 2 * 8, 64 * 2)
+        assert (root_dir / paths.SPRITES_FOLDER / "jab_hurt_strip8.png").exists()
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant import file_index as file_index_mod
+from rivals_workshop_assistant.file_index import FileIndex
+
+
+def make_tree(tmp: TempDirectory) -> Path:
+    for path in [
+        "scripts/init.gml",
+        "scripts/notes.txt",
+        "scripts/attacks/fair.gml",
+        "scripts/attacks/bair.gml",
+        "scripts/attacks/deep/nair.gml",
+        "sprites/fair_strip4.png",
+        "sprites/fair_hurt_strip4.png",
+        "sprites/bair_strip2.png",
+    ]:
+        tmp.write(path, b"content")
+    return Path(tmp.path)
+
+
+def test_get_paths_matches_rglob():
+    with TempDirectory() as tmp:
+        root_dir = make_tree(tmp)
+
+        paths = FileIndex(root_dir).get_paths(Path("scripts"), ".gml")
+
+        assert paths == list((root_dir / "scripts").rglob("*.gml"))
+
+
+def test_get_paths_of_missing_folder():
+    with TempDirectory() as tmp:
+        root_dir = make_tree(tmp)
+
+        assert FileIndex(root_dir).get_paths(Path("anims"), ".aseprite") == []
+
+
+def test_folders_are_listed_once(monkeypatch):
+    listed = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        if isinstance(path, Path):  # Not the cleanup of the temp directory.
+            listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(file_index_mod.os, "scandir", counting_scandir)
+    with TempDirectory() as tmp:
+        root_dir = make_tree(tmp)
+        file_index = FileIndex(root_dir)
+
+        file_index.get_paths(Path("scripts"), ".gml")
+        file_index.get_paths(Path("scripts"), ".txt")
+        file_index.get_paths(Path("scripts/attacks"), ".gml")
+        file_index.exists(root_dir / "scripts/attacks/fair.gml")
+
+    assert sorted(listed) == sorted(
+        [
+            root_dir / "scripts",
+            root_dir / "scripts/attacks",
+            root_dir / "scripts/attacks/deep",
+        ]
+    )
+
+
+def test_stat():
+    with TempDirectory() as tmp:
+        root_dir = make_tree(tmp)
+        path = root_dir / "scripts/init.gml"
+        file_index = FileIndex(root_dir)
+        file_index.get_paths(Path("scripts"), ".gml")
+
+        stat = file_index.stat(path)
+
+        assert stat.st_size == path.stat().st_size
+        assert stat.st_mtime_ns == path.stat().st_mtime_ns
+        assert file_index.stat(path) is stat
+
+
+def test_glob_and_delete():
+    with TempDirectory() as tmp:
+        root_dir = make_tree(tmp)
+        file_index = FileIndex(root_dir)
+
+        old_paths = file_index.glob(Path("sprites"), "fair_strip*.png")
+        assert old_paths == [root_dir / "sprites/fair_strip4.png"]
+
+        file_index.delete(old_paths[0])
+
+        assert not old_paths[0].exists()
+        assert file_index.glob(Path("sprites"), "fair_strip*.png") == []
+        assert not file_index.exists(old_paths[0])
+
+
+def test_exists_and_add():
+    with TempDirectory() as tmp:
+        root_dir = make_tree(tmp)
+        file_index = FileIndex(root_dir)
+        path = root_dir / "sprites/red_circle_4.png"
+        assert file_index.exists(root_dir / "sprites/bair_strip2.png")
+        assert not file_index.exists(path)
+
+        path.write_bytes(b"png")
+        file_index.add(path)
+
+        assert file_index.exists(path)
+        assert file_index.stat(path).st_size == 3
+        assert path in file_index.glob(Path("sprites"), "*.png")
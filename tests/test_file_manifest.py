@@ -0,0 +1,172 @@
+import os
+from pathlib import Path
+
+import pytest
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant import file_manifest
+from rivals_workshop_assistant.file_manifest import FileManifest
+from rivals_workshop_assistant.script_handling.script_mod import (
+    read_scripts,
+    save_scripts,
+)
+from tests.testing_helpers import make_run_context
+
+
+def write(path: Path, content: str, mtime_ns: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def process(manifest: FileManifest, paths, written=()):
+    """Read the files, like a run does, then record them as processed."""
+    for path in paths:
+        manifest.is_changed(path)
+    manifest.record(paths, written=written)
+
+
+@pytest.mark.parametrize(
+    "content, mtime_ns, expected",
+    [
+        pytest.param("content", 1_000, False, id="unchanged"),
+        pytest.param("content", 2_000, False, id="touched"),
+        pytest.param("CONTENT", 2_000, True, id="same_size_changed"),
+        pytest.param("longer content", 2_000, True, id="size_changed"),
+        # Like a checkout restoring an older file.
+        pytest.param("CONTENT", 500, True, id="older_changed"),
+    ],
+)
+def test_manifest_is_changed(content, mtime_ns, expected):
+    with TempDirectory() as tmp:
+        path = Path(tmp.path) / "script.gml"
+        write(path, "content", 1_000)
+        manifest = FileManifest()
+        manifest.put(path)
+
+        write(path, content, mtime_ns)
+
+        assert manifest.is_changed(path) == expected
+
+
+def test_manifest_new_file_is_changed():
+    with TempDirectory() as tmp:
+        path = Path(tmp.path) / "script.gml"
+        write(path, "content", 1_000)
+
+        assert FileManifest().is_changed(path)
+
+
+def test_manifest_touched_file_is_not_hashed_again(monkeypatch):
+    with TempDirectory() as tmp:
+        path = Path(tmp.path) / "script.gml"
+        write(path, "content", 1_000)
+        manifest = FileManifest()
+        manifest.put(path)
+        write(path, "content", 2_000)
+        assert not manifest.is_changed(path)
+
+        def fail_hash(_):
+            assert False, "File was hashed"
+
+        monkeypatch.setattr(file_manifest, "hash_file", fail_hash)
+        assert not manifest.is_changed(path)
+
+
+def test_manifest_record_forgets_other_files():
+    with TempDirectory() as tmp:
+        kept = Path(tmp.path) / "kept.gml"
+        deleted = Path(tmp.path) / "deleted.gml"
+        write(kept, "kept", 1_000)
+        write(deleted, "deleted", 1_000)
+        manifest = FileManifest()
+        process(manifest, [kept, deleted])
+
+        deleted.unlink()
+        process(manifest, [kept])
+
+    assert list(manifest.entries) == [kept.as_posix()]
+
+
+def test_manifest_records_files_as_they_were_read():
+    with TempDirectory() as tmp:
+        path = Path(tmp.path) / "script.gml"
+        write(path, "content", 1_000)
+        manifest = FileManifest()
+        assert manifest.is_changed(path)
+
+        # Edited while the run was processing it.
+        write(path, "edited", 2_000)
+        manifest.record([path])
+
+        assert manifest.is_changed(path)
+
+
+def test_manifest_records_written_files_as_they_are_now():
+    with TempDirectory() as tmp:
+        path = Path(tmp.path) / "script.gml"
+        write(path, "content", 1_000)
+        manifest = FileManifest()
+        assert manifest.is_changed(path)
+
+        # Injected into by the run.
+        write(path, "injected", 2_000)
+        manifest.record([path], written=[path])
+
+        assert not manifest.is_changed(path)
+
+
+def test_manifest_round_trips():
+    with TempDirectory() as tmp:
+        root_dir = Path(tmp.path)
+        path = root_dir / "script.gml"
+        write(path, "content", 1_000)
+        manifest = FileManifest()
+        process(manifest, [path])
+        assert manifest.entries
+
+        file_manifest.save_manifest(root_dir, manifest)
+
+        assert file_manifest.read_manifest(root_dir).entries == manifest.entries
+
+
+def test_read_scripts_freshness_from_manifest():
+    with TempDirectory() as tmp:
+        root_dir = Path(tmp.path)
+        unchanged = root_dir / "scripts" / "unchanged.gml"
+        touched = root_dir / "scripts" / "touched.gml"
+        changed = root_dir / "scripts" / "changed.gml"
+        for path in (unchanged, touched, changed):
+            write(path, "content", 1_000)
+        run_context = make_run_context(root_dir=root_dir)
+        process(run_context.file_manifest, [unchanged, touched, changed])
+
+        write(touched, "content", 2_000)
+        write(changed, "changed", 2_000)
+        write(root_dir / "scripts" / "new.gml", "new", 1_000)
+        scripts = read_scripts(run_context)
+
+    assert {script.path.name: script.is_fresh for script in scripts} == {
+        "unchanged.gml": False,
+        "touched.gml": False,
+        "changed.gml": True,
+        "new.gml": True,
+    }
+
+
+def test_saved_scripts_are_written_in_the_file_index():
+    with TempDirectory() as tmp:
+        root_dir = Path(tmp.path)
+        injected = root_dir / "scripts" / "injected.gml"
+        unchanged = root_dir / "scripts" / "unchanged.gml"
+        for path in (injected, unchanged):
+            write(path, "content", 1_000)
+        run_context = make_run_context(root_dir=root_dir)
+        scripts = read_scripts(run_context)
+        for script in scripts:
+            if script.path == injected:
+                script.working_content = "injected"
+
+        save_scripts(root_dir, scripts, run_context.file_index)
+
+    assert run_context.file_index.written == {injected}
@@ -25,7 +25,7 @@ def test_apply_injection_no_injections():
     orig_scripts = [make_script(PATH_A, "content")]
     scripts = deepcopy(orig_scripts)
 
-    application.apply_injection(scripts=scripts, injection_library=[], anims=[])
+    application.apply_injection(scripts=scripts, injection_library=[], anims={})
     assert scripts == orig_scripts
 
 
@@ -34,7 +34,7 @@ def test_apply_injection_irrelevant_injection():
     scripts = deepcopy(orig_scripts)
     define = Define(name="irrelevant", version=0, docs="", content="")
 
-    application.apply_injection(scripts=scripts, injection_library=[define], anims=[])
+    application.apply_injection(scripts=scripts, injection_library=[define], anims={})
     assert orig_scripts == scripts
 
 
@@ -66,7 +66,7 @@ define2()""",
 def test_apply_injection_makes_injection(script, define):
     scripts = [make_script(PATH_A, script)]
 
-    application.apply_injection(scripts=scripts, injection_library=[define], anims=[])
+    application.apply_injection(scripts=scripts, injection_library=[define], anims={})
     assert scripts == [
         make_script(
             PATH_A,
@@ -91,7 +91,7 @@ content"""
     scripts = [make_script(PATH_A, script)]
     library = [define1, define2]
 
-    application.apply_injection(scripts=scripts, injection_library=library, anims=[])
+    application.apply_injection(scripts=scripts, injection_library=library, anims={})
     assert scripts == [
         make_script(
             PATH_A,
@@ -129,7 +129,7 @@ def test_replace_existing_library_dependencies(header):
     actual_scripts = [make_script(PATH_A, script)]
     library = [define1]
     application.apply_injection(
-        scripts=actual_scripts, injection_library=library, anims=[]
+        scripts=actual_scripts, injection_library=library, anims={}
     )
 
     expected_scripts = [
@@ -160,7 +160,7 @@ def test_removes_injection_when_not_needed():
 {application.INJECTION_END_HEADER}"""
 
     scripts = [make_script(PATH_A, script)]
-    application.apply_injection(scripts=scripts, injection_library=[define1], anims=[])
+    application.apply_injection(scripts=scripts, injection_library=[define1], anims={})
     assert scripts == [
         make_script(PATH_A, original_content=script, working_content=script_content)
     ]
@@ -181,7 +181,7 @@ define1()
     orig_scripts = [make_script(PATH_A, script)]
     scripts = deepcopy(orig_scripts)
 
-    application.apply_injection(scripts, [define1], anims=[])
+    application.apply_injection(scripts, [define1], anims={})
     assert scripts == orig_scripts
 
 
@@ -195,7 +195,7 @@ define_recursive()"""
     )
     library = [recursive_define, define1]
 
-    application.apply_injection(scripts, library, anims=[])
+    application.apply_injection(scripts, library, anims={})
 
     assert scripts == [
         make_script(
@@ -223,7 +223,7 @@ blah"""
     some_macro = Macro(name="some_macro", value="value")
     library = [some_macro]
 
-    application.apply_injection(scripts, library, anims=[])
+    application.apply_injection(scripts, library, anims={})
     assert scripts == [
         make_script(
             PATH_A,
@@ -251,7 +251,7 @@ my_define()
     my_define_library_version = Define(name="my_define", content="library version")
     library = [my_define_library_version]
 
-    application.apply_injection(scripts, library, anims=[])
+    application.apply_injection(scripts, library, anims={})
     assert scripts == [
         make_script(PATH_A, original_content=script, working_content=script.rstrip())
     ]
@@ -268,7 +268,7 @@ define1()
     scripts = deepcopy(orig_scripts)
 
     library = [define1]
-    application.apply_injection(scripts, library, anims=[])
+    application.apply_injection(scripts, library, anims={})
     assert scripts == orig_scripts
 
 
@@ -282,7 +282,7 @@ print(my_macro)
     my_macro_library_version = Macro(name="my_macro", value="3")
     library = [my_macro_library_version]
 
-    application.apply_injection(scripts, library, anims=[])
+    application.apply_injection(scripts, library, anims={})
     assert scripts == [
         make_script(PATH_A, original_content=script, working_content=script.rstrip())
     ]
@@ -301,7 +301,7 @@ define1()"""
     ]
     scripts = deepcopy(orig_scripts)
 
-    application.apply_injection(scripts=scripts, injection_library=[define], anims=[])
+    application.apply_injection(scripts=scripts, injection_library=[define], anims={})
     assert scripts == orig_scripts
 
 
@@ -313,7 +313,7 @@ def test_get_anim_data_gmls_needed_in_gml():
 
     anim = make_anim(name="dattack", start=0, end=4)
     anim.windows = [Window("window", 2, 3)]
-    anims = [anim]
+    anims = {"dattack": anim}
 
     application.apply_injection(scripts=scripts, injection_library=[], anims=anims)
 
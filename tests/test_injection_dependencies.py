@@ -52,7 +52,7 @@ def test_define_gml_parameters():
 def test_apply_injection_nothing():
     orig_scripts = []
     scripts = deepcopy(orig_scripts)
-    application.apply_injection(scripts=scripts, injection_library=[], anims=[])
+    application.apply_injection(scripts=scripts, injection_library=[], anims={})
     assert scripts == orig_scripts
 
 
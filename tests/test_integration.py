@@ -159,7 +159,7 @@ async def test_full_injection():
         scripts = read_scripts(make_run_context(root_dir=Path(tmp.path)))
         library = injection.read_injection_library(Path(tmp.path))
 
-        apply_injection(scripts=scripts, injection_library=library, anims=[])
+        apply_injection(scripts=scripts, injection_library=library, anims={})
 
         expected_script_1 = f"""\
 {script_1.content}
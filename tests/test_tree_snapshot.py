@@ -0,0 +1,227 @@
+import datetime
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+from testfixtures import TempDirectory
+
+from rivals_workshop_assistant import main, paths, tree_snapshot
+from rivals_workshop_assistant.modes import Mode
+from rivals_workshop_assistant.tree_snapshot import TreeSnapshot
+
+VERSION = "1.2.3"
+
+
+def make_root_dir(tmp: TempDirectory) -> Path:
+    root_dir = Path(tmp.path)
+    tmp.write("config.ini", b"[general]")
+    tmp.write("scripts/attacks/fair.gml", b"content")
+    tmp.write("anims/fair.aseprite", b"aseprite")
+    tmp.write("sprites/fair_strip2.png", b"png")
+    tmp.write("assistant/user_inject/inject.gml", b"inject")
+    return root_dir
+
+
+def save_snapshot(root_dir: Path, mode: Mode = Mode.ALL):
+    tree_snapshot.save_snapshot(
+        root_dir, tree_snapshot.make_snapshot(root_dir, VERSION, mode)
+    )
+
+
+def test_snapshot_round_trips_through_bytes():
+    snapshot = TreeSnapshot(
+        assistant_version=VERSION,
+        mode=Mode.SCRIPTS,
+        day=datetime.date(2021, 3, 4),
+        files={"scripts/a.gml": (12, 1_234_567_890_123), "anims/é.ase": (0, -5)},
+    )
+
+    assert TreeSnapshot.from_bytes(snapshot.to_bytes()) == snapshot
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        pytest.param(b"", id="empty"),
+        pytest.param(b"not a snapshot at all", id="wrong_magic"),
+    ],
+)
+def test_malformed_snapshot_is_ignored(data):
+    assert TreeSnapshot.from_bytes(data) is None
+
+
+def test_file_stats_only_include_watched_files():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        tmp.write("scripts/notes.txt", b"notes")
+        tmp.write("unrelated/file.gml", b"unrelated")
+
+        files = tree_snapshot.get_file_stats(root_dir)
+
+    assert sorted(files) == [
+        "anims/fair.aseprite",
+        "assistant/user_inject/inject.gml",
+        "config.ini",
+        "scripts/attacks/fair.gml",
+        "sprites/fair_strip2.png",
+    ]
+
+
+def test_unchanged_tree():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        save_snapshot(root_dir)
+        tmp.write("unrelated/file.gml", b"unrelated")
+
+        assert tree_snapshot.get_is_unchanged(root_dir, VERSION, Mode.SCRIPTS)
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        pytest.param(lambda root_dir: (root_dir / "scripts/new.gml").write_text("new")),
+        pytest.param(lambda root_dir: (root_dir / "anims/fair.aseprite").unlink()),
+        pytest.param(
+            lambda root_dir: os.utime(root_dir / "scripts/attacks/fair.gml", ns=(0, 1))
+        ),
+        pytest.param(lambda root_dir: (root_dir / "config.ini").write_text("[a]")),
+    ],
+)
+def test_changed_tree(change):
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        save_snapshot(root_dir)
+        change(root_dir)
+
+        assert not tree_snapshot.get_is_unchanged(root_dir, VERSION, Mode.ALL)
+
+
+@pytest.mark.parametrize(
+    "snapshot_mode, version, mode, expected",
+    [
+        pytest.param(Mode.ALL, VERSION, Mode.ANIMS, True),
+        pytest.param(Mode.SCRIPTS, VERSION, Mode.SCRIPTS, True),
+        pytest.param(Mode.SCRIPTS, VERSION, Mode.ANIMS, False),
+        pytest.param(Mode.ANIMS, VERSION, Mode.ALL, False),
+        pytest.param(Mode.ALL, "1.2.4", Mode.ALL, False),
+    ],
+)
+def test_snapshot_covers_run(snapshot_mode, version, mode, expected):
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        save_snapshot(root_dir, mode=snapshot_mode)
+
+        assert tree_snapshot.get_is_unchanged(root_dir, version, mode) == expected
+
+
+def test_snapshot_keeps_edits_made_during_the_run():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        start_files = tree_snapshot.get_file_stats(root_dir)
+        written = root_dir / "sprites/fair_strip2.png"
+        edited = root_dir / "scripts/attacks/fair.gml"
+        written.write_bytes(b"new export")
+        edited.write_bytes(b"edited while the run was going")
+
+        tree_snapshot.save_snapshot(
+            root_dir,
+            tree_snapshot.make_snapshot(
+                root_dir, VERSION, Mode.ALL, start_files=start_files, written=[written]
+            ),
+        )
+        assert not tree_snapshot.get_is_unchanged(root_dir, VERSION, Mode.ALL)
+
+        # The next run doesn't write anything new.
+        save_snapshot(root_dir)
+        assert tree_snapshot.get_is_unchanged(root_dir, VERSION, Mode.ALL)
+
+
+def test_snapshot_takes_written_files_as_they_are_now():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        start_files = tree_snapshot.get_file_stats(root_dir)
+        written = root_dir / "sprites/fair_strip2.png"
+        deleted = root_dir / "anims/fair.aseprite"
+        created = root_dir / "sprites/bair_strip3.png"
+        written.write_bytes(b"new export")
+        deleted.unlink()
+        created.write_bytes(b"created")
+
+        snapshot = tree_snapshot.make_snapshot(
+            root_dir,
+            VERSION,
+            Mode.ALL,
+            start_files=start_files,
+            written=[written, deleted, created],
+        )
+
+        assert snapshot.files == tree_snapshot.get_file_stats(root_dir)
+
+
+def test_snapshot_from_another_day_is_not_unchanged():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        snapshot = tree_snapshot.make_snapshot(root_dir, VERSION, Mode.ALL)
+        snapshot.day -= datetime.timedelta(days=1)
+        tree_snapshot.save_snapshot(root_dir, snapshot)
+
+        assert not tree_snapshot.get_is_unchanged(root_dir, VERSION, Mode.ALL)
+
+
+@pytest.mark.asyncio
+async def test_main_stops_when_unchanged(monkeypatch):
+    async def fail_update_files(**kwargs):
+        assert False, "Files were updated"
+
+    monkeypatch.setattr(main, "update_files", fail_update_files)
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        (root_dir / paths.ASSISTANT_FOLDER).mkdir(exist_ok=True)
+        tree_snapshot.save_snapshot(
+            root_dir,
+            tree_snapshot.make_snapshot(root_dir, main.__version__, Mode.ALL),
+        )
+
+        await main.main(exe_dir=root_dir, given_dir=root_dir, mode=Mode.SCRIPTS)
+
+
+def test_unchanged_run_skips_heavy_imports():
+    with TempDirectory() as tmp:
+        root_dir = make_root_dir(tmp)
+        (root_dir / paths.ASSISTANT_FOLDER).mkdir(exist_ok=True)
+        tree_snapshot.save_snapshot(
+            root_dir,
+            tree_snapshot.make_snapshot(root_dir, main.__version__, Mode.ALL),
+        )
+        code = textwrap.dedent(f"""\
+            import asyncio, sys
+            from pathlib import Path
+            from rivals_workshop_assistant import main
+            root_dir = Path({str(root_dir)!r})
+            asyncio.run(main.main(exe_dir=root_dir, given_dir=root_dir))
+            print([name for name in ("PIL", "numpy", "ruamel") if name in sys.modules])
+            """)
+
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+
+    assert "Nothing changed since the last run." in result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_watched_files_are_the_config_paths():
+    from rivals_workshop_assistant import (
+        assistant_config_mod,
+        character_config_mod,
+        dotfile_mod,
+    )
+
+    assert tree_snapshot.WATCHED_FILES == [
+        Path(assistant_config_mod.PATH),
+        Path(character_config_mod.PATH),
+        Path(dotfile_mod.PATH),
+    ]